@@ -0,0 +1,146 @@
+"""
+Benchmark of the selection of the best endpoint of a WireGuard peer.
+Local UDP servers stand in for the WireGuard servers: each one checks the mac1 of the handshake
+initiations it receives and answers them with a handshake response after a configured delay,
+and one of them never answers. The candidates are probed concurrently, then one after the
+other, then again through the cache. The selection itself stops at the first answer.
+
+Usage:
+    python benchmarks/endpoint_probe_benchmark.py [--delays 0.05,0.2,0.1] [--timeout 1.0]
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+from plugins.vpn.wireguard import endpoint_prober, wg_config, wg_handshake
+
+
+def generate_key_pair():
+    """
+    :return: A tuple (private key, public key) encoded in base64.
+    """
+    private_key = X25519PrivateKey.generate()
+    private_bytes = private_key.private_bytes_raw()
+    return base64.b64encode(private_bytes).decode(), base64.b64encode(wg_handshake.public_bytes(private_key)).decode()
+
+
+class StandInServer(threading.Thread):
+    """
+    UDP server answering the handshake initiations sent to a public key after a delay.
+    """
+
+    def __init__(self, public_key, delay):
+        """
+        Initialize the StandInServer on a free local port.
+
+        :param public_key: The public key of the server, in base64.
+        :param delay: The time in seconds before answering, None to never answer.
+        """
+        super().__init__(daemon=True)
+        self.mac1_key = wg_handshake.blake2s(wg_handshake.LABEL_MAC1, wg_handshake.decode_key(public_key))
+        self.delay = delay
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.endpoint = f"127.0.0.1:{self.sock.getsockname()[1]}"
+
+    def run(self):
+        while True:
+            data, address = self.sock.recvfrom(2048)
+            if self.delay is None or len(data) != wg_handshake.INITIATION_SIZE or data[0] != wg_handshake.MESSAGE_INITIATION:
+                continue
+            mac1 = hashlib.blake2s(data[:116], digest_size=16, key=self.mac1_key).digest()
+            if mac1 != data[116:132]:
+                continue
+            sender_index = struct.unpack_from("<I", data, 4)[0]
+            response = struct.pack("<BxxxII", wg_handshake.MESSAGE_RESPONSE, 1, sender_index) + b"\0" * 80
+            threading.Timer(self.delay, self.sock.sendto, (response, address)).start()
+
+
+def build_config(private_key, public_key, endpoints):
+    """
+    :return: A WireGuardConfig whose peer lists the endpoints as candidates.
+    """
+    return wg_config.parse_config(
+        "[Interface]\n"
+        f"PrivateKey = {private_key}\n"
+        "Address = 10.0.0.2/32\n\n"
+        "[Peer]\n"
+        f"PublicKey = {public_key}\n"
+        "AllowedIPs = 0.0.0.0/0\n"
+        f"Endpoint = {endpoints[0]}\n"
+        f"#@ Endpoints = {', '.join(endpoints)}\n"
+    )
+
+
+def run_benchmark(delays, timeout):
+    """
+    Start the stand-in servers, probe them and print a summary.
+
+    :param delays: The answer delay of each server in seconds, None for a silent server.
+    :param timeout: The probe timeout in seconds.
+    """
+    client_private, _ = generate_key_pair()
+    _, server_public = generate_key_pair()
+    servers = [StandInServer(server_public, delay) for delay in delays]
+    for server in servers:
+        server.start()
+    endpoints = [server.endpoint for server in servers]
+    config = build_config(client_private, server_public, endpoints)
+    peer = config.peers[0]
+
+    start = time.perf_counter()
+    _, chosen, _ = endpoint_prober.choose_endpoints(config, timeout, endpoint_cache=None)[0]
+    selection_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = asyncio.run(endpoint_prober.probe_candidates(endpoints, client_private, peer.public_key, timeout=timeout))
+    concurrent_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for endpoint in endpoints:
+        asyncio.run(endpoint_prober.probe_handshake(endpoint, client_private, peer.public_key, timeout))
+    sequential_time = time.perf_counter() - start
+
+    cache = endpoint_prober.EndpointCache(ttl=60)
+    endpoint_prober.choose_endpoints(config, timeout, endpoint_cache=cache)
+    start = time.perf_counter()
+    endpoint_prober.choose_endpoints(config, timeout, endpoint_cache=cache)
+    cached_time = time.perf_counter() - start
+
+    print(f"{'Endpoint':<22}{'Delay (ms)':>12}{'Result':>22}")
+    for server, result in zip(servers, results):
+        delay = "silent" if server.delay is None else f"{server.delay * 1000:.0f}"
+        outcome = f"{result.latency * 1000:.1f} ms" if result.healthy else result.error
+        print(f"{server.endpoint:<22}{delay:>12}{outcome:>22}")
+    print(f"\nChosen endpoint: {chosen}")
+    print(f"Selection (first answer): {selection_time * 1000:8.1f} ms")
+    print(f"Concurrent probe (all):   {concurrent_time * 1000:8.1f} ms")
+    print(f"Sequential probe (all):   {sequential_time * 1000:8.1f} ms")
+    print(f"Cached choice:            {cached_time * 1000:8.3f} ms")
+
+
+def parse_delays(value):
+    return [None if item.strip() == "silent" else float(item) for item in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--delays", type=parse_delays, default=parse_delays("0.15,0.05,0.3,silent"),
+                        help="Comma-separated answer delays in seconds, 'silent' for a server that never answers")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Probe timeout in seconds")
+    arguments = parser.parse_args()
+    run_benchmark(arguments.delays, arguments.timeout)
@@ -0,0 +1,133 @@
+"""
+Benchmark of the time to bring a WireGuard interface up on Linux, with netlink and with wg-quick.
+A temporary tunnel to a local endpoint is brought up and down several times with each path.
+Its AllowedIPs hold a configurable number of ranges inside 10.0.0.0/8, wg-quick installs one
+route per range with a separate ip command while netlink sends them in batches of
+netlink_linux.BATCH_MESSAGES messages. By default 1, 100, 1000 and 5000 ranges are measured,
+the last two need several batches, up to 65535 ranges can be given.
+It must run as root on a kernel with WireGuard, and changes the interfaces of the machine
+for the duration of the benchmark.
+
+Usage:
+    sudo python benchmarks/interface_up_benchmark.py [--runs 10] [--ranges 1,100,1000,5000]
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import argparse
+import base64
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from plugins.vpn.wireguard import netlink_linux
+
+INTERFACE_NAME = "rsbench0"
+
+
+def generate_key():
+    """
+    :return: A random key in base64, WireGuard clamps private keys itself.
+    """
+    return base64.b64encode(os.urandom(32)).decode()
+
+
+def write_config(directory, ranges):
+    """
+    :param directory: The directory of the configuration file.
+    :param ranges: The number of /24 ranges of AllowedIPs.
+    :return: The path to the configuration file.
+    """
+    allowed_ips = ", ".join(f"10.{index >> 8 & 255}.{index & 255}.0/24" for index in range(1, ranges + 1))
+    path = os.path.join(directory, f"{INTERFACE_NAME}.conf")
+    with open(path, "w") as conf_file:
+        conf_file.write(
+            "[Interface]\n"
+            f"PrivateKey = {generate_key()}\n"
+            "Address = 172.31.255.2/32\n"
+            "MTU = 1420\n\n"
+            "[Peer]\n"
+            f"PublicKey = {generate_key()}\n"
+            f"AllowedIPs = {allowed_ips}\n"
+            "Endpoint = 127.0.0.1:51820\n"
+        )
+    return path
+
+
+def netlink_up(path):
+    netlink_linux.bring_up(path)
+
+
+def netlink_down(path):
+    netlink_linux.bring_down(path)
+
+
+def wg_quick_up(path):
+    subprocess.run(["wg-quick", "up", path], capture_output=True, check=True)
+
+
+def wg_quick_down(path):
+    subprocess.run(["wg-quick", "down", path], capture_output=True, check=True)
+
+
+def measure(up, down, path, runs):
+    """
+    :return: The list of times in milliseconds until the interface is up.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        up(path)
+        times.append((time.perf_counter() - start) * 1000)
+        socket.if_nametoindex(INTERFACE_NAME)
+        down(path)
+    return times
+
+
+def run_benchmark(runs, range_counts):
+    """
+    Bring the tunnel up with each path and print a summary.
+
+    :param runs: The number of runs of each path.
+    :param range_counts: The numbers of AllowedIPs ranges to test.
+    """
+    paths = [("netlink", netlink_up, netlink_down)]
+    if shutil.which("wg-quick"):
+        paths.append(("wg-quick", wg_quick_up, wg_quick_down))
+    else:
+        print("wg-quick is not installed, only netlink is measured")
+    directory = tempfile.mkdtemp()
+    try:
+        print(f"{'Ranges':>8}{'Path':>10}{'Median (ms)':>14}{'Min (ms)':>12}{'Max (ms)':>12}")
+        for ranges in range_counts:
+            path = write_config(directory, ranges)
+            for name, up, down in paths:
+                times = measure(up, down, path, runs)
+                print(f"{ranges:>8}{name:>10}{statistics.median(times):>14.1f}{min(times):>12.1f}{max(times):>12.1f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+def parse_counts(value):
+    return [int(item) for item in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10, help="Number of runs of each path")
+    parser.add_argument("--ranges", type=parse_counts, default=parse_counts("1,100,1000,5000"), help="Comma-separated numbers of AllowedIPs ranges")
+    arguments = parser.parse_args()
+    if os.geteuid() != 0:
+        sys.exit("The benchmark must run as root")
+    try:
+        run_benchmark(arguments.runs, arguments.ranges)
+    except OSError as e:
+        sys.exit(f"WireGuard is not available: {e}")
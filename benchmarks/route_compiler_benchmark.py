@@ -0,0 +1,117 @@
+"""
+Benchmark of the split-tunnel route compiler on large exclusion lists.
+Every address is routed except a list of networks, such as the ranges of a country.
+The ranges are generated at random, or read from a file with one CIDR range per line
+(e.g. a country zone file). The compiler is compared with excluding the ranges one by one
+with ipaddress.address_exclude then collapsing the result, which is only run on the smaller lists.
+
+Usage:
+    python benchmarks/route_compiler_benchmark.py [--sizes 100,1000,10000] [--file ranges.zone]
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from plugins.vpn.wireguard import route_compiler
+
+BASELINE_MAX = 2000
+
+
+def generate_ranges(count, seed=0):
+    """
+    Generate ranges shaped like a country allocation list: /12 to /24 blocks, some adjacent.
+
+    :param count: The number of ranges.
+    :param seed: The seed of the generator.
+    :return: The list of ipaddress networks.
+    """
+    generator = random.Random(seed)
+    ranges = []
+    while len(ranges) < count:
+        prefix_length = generator.choice((12, 14, 16, 18, 19, 20, 21, 22, 22, 23, 24, 24, 24))
+        first = generator.randrange(1 << 24, 224 << 24) >> (32 - prefix_length) << (32 - prefix_length)
+        # Allocations often come in runs of neighbouring blocks
+        for index in range(generator.choice((1, 1, 2, 4))):
+            ranges.append(ipaddress.IPv4Network((first + (index << (32 - prefix_length)), prefix_length)))
+    return ranges[:count]
+
+
+def read_ranges(path):
+    """
+    :param path: The path to a file with one CIDR range per line.
+    :return: The list of ipaddress networks.
+    """
+    with open(path) as ranges_file:
+        return route_compiler.parse_list(",".join(line.split("#")[0] for line in ranges_file))
+
+
+def exclude_one_by_one(exclude):
+    """
+    Route every IPv4 address except the ranges, excluding them one at a time.
+
+    :param exclude: The ipaddress networks not to route.
+    :return: The list of ipaddress networks.
+    """
+    result = [ipaddress.ip_network("0.0.0.0/0")]
+    for excluded in exclude:
+        remaining = []
+        for network in result:
+            if excluded.subnet_of(network):
+                remaining.extend(network.address_exclude(excluded))
+            elif not network.subnet_of(excluded):
+                remaining.append(network)
+        result = remaining
+    return list(ipaddress.collapse_addresses(result))
+
+
+def measure(function, *args):
+    """
+    :return: A tuple (result, elapsed time in milliseconds).
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_benchmark(lists):
+    """
+    Compile every list and print a summary.
+
+    :param lists: A list of (name, list of ipaddress networks).
+    """
+    include = [ipaddress.ip_network("0.0.0.0/0")]
+    print(f"{'Exclusions':<22}{'Routes':>10}{'Compiler (ms)':>16}{'One by one (ms)':>18}")
+    for name, exclude in lists:
+        routes, compile_time = measure(route_compiler.compile_routes, include, exclude)
+        if len(exclude) <= BASELINE_MAX:
+            baseline, baseline_time = measure(exclude_one_by_one, exclude)
+            if sorted(baseline) != sorted(routes):
+                print(f"Warning: the results differ for {name}")
+            baseline_text = f"{baseline_time:.1f}"
+        else:
+            baseline_text = "skipped"
+        print(f"{name:<22}{len(routes):>10}{compile_time:>16.1f}{baseline_text:>18}")
+
+
+def parse_sizes(value):
+    return [int(item) for item in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=parse_sizes("100,1000,2000,10000,50000"), help="Comma-separated numbers of generated ranges")
+    parser.add_argument("--file", help="File with one CIDR range per line, used instead of generated ranges")
+    arguments = parser.parse_args()
+    if arguments.file:
+        run_benchmark([(os.path.basename(arguments.file), read_ranges(arguments.file))])
+    else:
+        run_benchmark([(f"{size} generated", generate_ranges(size, seed=size)) for size in arguments.sizes])
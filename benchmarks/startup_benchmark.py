@@ -0,0 +1,72 @@
+"""
+Benchmark of the cold-start time to first paint of App.create_dashboard.
+Each run starts a fresh interpreter so that module imports are not shared between runs,
+and compares manifest-driven lazy plugin loading with importing every plugin up front.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs N]
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def measure_once(lazy):
+    """
+    Build the main window and return the time in milliseconds until the dashboard is painted.
+
+    :param lazy: True to use lazy plugin loading, False to import every plugin up front.
+    :return: The elapsed time in milliseconds.
+    """
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT_DIR)
+    import main
+    from plugins import plugin_manager
+
+    if not lazy:
+        original_init = plugin_manager.PluginManager.__init__
+        plugin_manager.PluginManager.__init__ = lambda self, app, lazy=True: original_init(self, app, lazy=False)
+        main.PluginManager = plugin_manager.PluginManager
+
+    main.App.is_email_registered = lambda self: True
+    app = main.App()
+    app.update()
+    elapsed = (time.perf_counter() - start) * 1000
+    app.destroy()
+    return elapsed
+
+
+def run_benchmark(runs):
+    """
+    Run both loading modes in fresh interpreters and print a summary.
+
+    :param runs: The number of runs for each mode.
+    """
+    for mode in ("eager", "lazy"):
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, os.path.realpath(__file__), "--single", mode],
+                capture_output=True, text=True, check=True, cwd=ROOT_DIR
+            ).stdout
+            samples.append(float(output.strip().splitlines()[-1]))
+        print(f"{mode:>5}: median {statistics.median(samples):8.1f} ms  min {min(samples):8.1f} ms  ({runs} runs)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--single", choices=("eager", "lazy"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.single:
+        print(measure_once(args.single == "lazy"))
+    else:
+        run_benchmark(args.runs)
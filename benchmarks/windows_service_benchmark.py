@@ -0,0 +1,106 @@
+"""
+Benchmark of the time to notice that a Windows tunnel service started or stopped.
+The services are simulated by the FakeServiceControlManager, so it runs on any system. The
+ServiceController waits for the notifications of the state changes, the polling loop queries
+the state and sleeps between the queries like stop_vpn and start_vpn did with sc query. The lag
+is the time between the state change and the moment it is noticed.
+With --spawn, every poll also starts a process as a stand-in for sc query.
+
+Usage:
+    python benchmarks/windows_service_benchmark.py [--runs 10] [--delay 0.25] [--intervals 1,0.1] [--spawn]
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from plugins.vpn.wireguard import windows_service
+
+SERVICE_NAME = windows_service.get_service_name("rsbench")
+TIMEOUT = 5
+
+
+def wait_polling(scm, name, target, interval, spawn):
+    """
+    Wait for a state by querying it every interval, as the sc query loop did.
+    """
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        if spawn:
+            subprocess.run([sys.executable, "-c", "pass"])
+        if scm.query(name) == target:
+            return True
+        time.sleep(interval)
+    return False
+
+
+def measure(scm, change, runs):
+    """
+    :param scm: The FakeServiceControlManager.
+    :param change: A function changing the state of the service and waiting for it, given the target state.
+    :param runs: The number of starts and stops.
+    :return: The list of lags in milliseconds and the number of queries per change.
+    """
+    lags = []
+    scm.queries = 0
+    for _ in range(runs):
+        for target in (windows_service.SERVICE_RUNNING, windows_service.SERVICE_STOPPED):
+            if not change(target):
+                raise RuntimeError(f"The service did not reach the state {windows_service.STATE_NAMES[target]}")
+            noticed = time.perf_counter()
+            lags.append((noticed - scm.changed_at[SERVICE_NAME]) * 1000)
+    return lags, scm.queries / (2 * runs)
+
+
+def run_benchmark(runs, delay, intervals, spawn):
+    """
+    Start and stop the simulated service with each method and print a summary.
+
+    :param runs: The number of starts and stops with each method.
+    :param delay: The time in seconds the service stays pending.
+    :param intervals: The intervals in seconds of the polling loop.
+    :param spawn: True to start a process at every poll.
+    """
+    scm = windows_service.FakeServiceControlManager(start_delay=delay, stop_delay=delay)
+    scm.install(SERVICE_NAME)
+    controller = windows_service.ServiceController(scm)
+
+    def notified(target):
+        return controller.change(SERVICE_NAME, target, TIMEOUT) == target
+
+    methods = [("notify", notified)]
+    for interval in intervals:
+        def polled(target, interval=interval):
+            if target == windows_service.SERVICE_RUNNING:
+                scm.start(SERVICE_NAME)
+            else:
+                scm.stop(SERVICE_NAME)
+            return wait_polling(scm, SERVICE_NAME, target, interval, spawn)
+        methods.append((f"poll {interval:g}s", polled))
+
+    print(f"{'Method':<12}{'Median lag (ms)':>17}{'Max lag (ms)':>14}{'Queries':>9}")
+    for name, change in methods:
+        lags, queries = measure(scm, change, runs)
+        print(f"{name:<12}{statistics.median(lags):>17.2f}{max(lags):>14.2f}{queries:>9.1f}")
+
+
+def parse_intervals(value):
+    return [float(item) for item in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10, help="Number of starts and stops with each method")
+    parser.add_argument("--delay", type=float, default=0.25, help="Time in seconds the service stays pending")
+    parser.add_argument("--intervals", type=parse_intervals, default=parse_intervals("1,0.1"), help="Comma-separated intervals of the polling loop, in seconds")
+    parser.add_argument("--spawn", action="store_true", help="Start a process at every poll, like sc query")
+    arguments = parser.parse_args()
+    run_benchmark(arguments.runs, arguments.delay, arguments.intervals, arguments.spawn)
@@ -118,6 +118,10 @@ def main():
         sys.exit(1)
     
     print("📋 Using existing resistine_simple.spec file")
+
+    # Pack the icons into a single memory-mapped bundle
+    if not run_command([sys.executable, os.path.join("utils", "icon_bundle.py")], "Packing icon bundle"):
+        sys.exit(1)
     
     # Build with PyInstaller
     if not run_command(["pyinstaller", "resistine_simple.spec"], "Building with PyInstaller"):
@@ -15,7 +15,28 @@ import customtkinter
 from PIL import Image
 from plugins.plugin_manager import PluginManager
 from utils import functions as myfunctions
+from utils.tk_dispatcher import TkDispatcher
+from utils.tk_executor import TkExecutor
+from utils.frame_lifecycle import FrameLifecycleManager
+from utils.startup_timeline import timeline
+from utils.status_snapshot import StatusSnapshot
+from utils import capabilities
 import re
+import time
+
+
+def get_env_int(name, default=None):
+    """
+    Read an integer setting from the environment.
+
+    :param name: The name of the environment variable.
+    :param default: The value returned when the variable is not set or invalid.
+    :return: The integer value.
+    """
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return default
 
 
 class App(customtkinter.CTk):
@@ -39,6 +60,26 @@ class App(customtkinter.CTk):
         position_right = int(screen_width / 2 - window_width / 2)
         position_down = int(screen_height / 2 - window_height / 2)
         self.geometry(f"{window_width}x{window_height}+{position_right}+{position_down}")
+        self.dispatcher = TkDispatcher(self)
+        # Long operations of the plugins run on workers and report back through the dispatcher
+        self.executor = TkExecutor(self.dispatcher, max_workers=4)
+        self.background_started = False
+        self.plugin_manager = None
+        # Last known statuses, shown as stale until the background probes publish fresh ones
+        self.status_snapshot = StatusSnapshot(os.path.join(myfunctions.get_app_data_dir(), "status.json"))
+        self.status_snapshot.load()
+        self.status_snapshot.attach(self)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        # Plugin screens are cached under a budget, RESISTINE_FRAME_DEBUG=1 reports their growth
+        # and enforces RESISTINE_MAX_MEMORY, which compares the memory of the whole process
+        self.frame_manager = FrameLifecycleManager(
+            self,
+            max_frames=get_env_int("RESISTINE_MAX_FRAMES"),
+            max_widgets=get_env_int("RESISTINE_MAX_WIDGETS", 4000),
+            max_memory=get_env_int("RESISTINE_MAX_MEMORY"),
+            debug=os.environ.get("RESISTINE_FRAME_DEBUG") == "1",
+            report_every=get_env_int("RESISTINE_FRAME_REPORT_EVERY", 20),
+        )
 
         if not self.is_email_registered():
             self.create_registration_screen()
@@ -116,62 +157,202 @@ class App(customtkinter.CTk):
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=1)
         #Getting the plugin list from the PluginManager located in plugins folder. 
-        if not hasattr(App, 'plugin_list'):
-            App.plugin_list = PluginManager(self).plugins
-        else:
-            if len(App.plugin_list) < len(PluginManager(self).plugins):
-                App.plugin_list = PluginManager(self).plugins
-        self.plugin_list = App.plugin_list
-        number_plugins = len(self.plugin_list) + 1
+        #The App owns a single PluginManager, plugins installed later are added incrementally.
+        if self.plugin_manager is None:
+            self.plugin_manager = PluginManager(self)
+            self.plugin_manager.add_listener(self.add_plugin)
+            for plugin in self.plugin_manager.plugins:
+                self.restore_status(plugin)
+        self.plugin_list = self.plugin_manager.plugins
 
+        if hasattr(self, 'navigation_frame'):
+            self.navigation_frame.destroy()
         self.navigation_frame = customtkinter.CTkFrame(self, corner_radius=0)
         self.navigation_frame.grid(row=0, column=0, sticky="nsew")
-        self.navigation_frame.grid_rowconfigure(number_plugins, weight=1)
+        self.frame_manager.add_known_widget(self.navigation_frame)
+        self.navigation_spacer_row = None
 
         self.navigation_frame_label = customtkinter.CTkLabel(self.navigation_frame, text="Resistine", image=None,
                                                              compound="left", font=customtkinter.CTkFont(size=15, weight="bold"))
         self.navigation_frame_label.grid(row=0, column=0, padx=20, pady=20)
 
+        # Drop the screens built for a previous dashboard
+        self.frame_manager.destroy_all()
+        self.current_frame_name = None
         self.frames = {}
+        for plugin in self.plugin_list:
+            self.frames[f'frame_{plugin.get_name()}'] = plugin
+            self.create_plugin_button(plugin)
+        self.layout_navigation()
+
+        self.select_frame_by_name("frame_Dashboard", button = self.frames["frame_Dashboard"].get_button())
+        # Background tasks start once the window has been drawn
+        self.after(200, self.start_background_tasks)
+
+    def create_plugin_button(self, plugin):
+        """
+        Create the navigation button of a plugin. The button is placed by layout_navigation.
+        
+        :param plugin: The plugin to create the button for.
+        """
+        try:
+            # Create the buttons for each plugin
+            plugin.set_button(myfunctions.create_tab_button(
+                self.navigation_frame, 
+                plugin.get_name(), 
+                plugin.get_icon(), 
+                lambda p=plugin: self.select_frame_by_name(f'frame_{p.get_name()}', button = p.get_button()), 
+                0, 
+                0
+            ))
+        except Exception as e:
+            print(f"Error loading plugin button {plugin.get_name()}, Error: {e}")
+
+    def layout_navigation(self):
+        """
+        Place the navigation buttons in plugin order, followed by an expanding spacer row.
+        """
         row = 1
         for plugin in self.plugin_list:
-            frame_name = f'frame_{plugin.get_name()}'
-            self.frames[frame_name] = plugin
+            if plugin.get_button() is not None:
+                plugin.get_button().grid(row=row, column=0, sticky="ew")
+            row += 1
+        if self.navigation_spacer_row is not None:
+            self.navigation_frame.grid_rowconfigure(self.navigation_spacer_row, weight=0)
+        self.navigation_spacer_row = row
+        self.navigation_frame.grid_rowconfigure(row, weight=1)
+
+    def add_plugin(self, plugin):
+        """
+        Add a plugin installed after start-up: one navigation button is created,
+        the other plugins and the dashboard are left untouched.
+        
+        :param plugin: The new plugin, already added to the plugin registry.
+        """
+        self.frames[f'frame_{plugin.get_name()}'] = plugin
+        self.restore_status(plugin)
+        self.create_plugin_button(plugin)
+        self.layout_navigation()
+        if self.background_started:
+            plugin.start_background()
+
+    def restore_status(self, plugin):
+        """
+        Show the last known status of a plugin whose status is probed in the background,
+        and save every status it publishes from now on to the status snapshot.
+        
+        :param plugin: The plugin added to the registry.
+        """
+        saved_status = self.status_snapshot.get_status(plugin.get_name())
+        if saved_status is not None and plugin.has_background():
+            plugin.restore_status(saved_status)
+        self.status_snapshot.set_status(plugin.get_name(), plugin.get_status())
+        plugin.add_status_listener(self.remember_status)
+
+    def remember_status(self, plugin):
+        """
+        Save the status published by a plugin to the status snapshot.
+        
+        :param plugin: The plugin whose status changed.
+        """
+        if not plugin.is_stale():
+            self.status_snapshot.set_status(plugin.get_name(), plugin.get_status())
+
+    def on_close(self):
+        """
+        Save the status snapshot and close the application.
+        """
+        self.status_snapshot.save()
+        capabilities.registry.stop()
+        self.executor.shutdown()
+        self.destroy()
 
+    def start_background_tasks(self):
+        """
+        Preload the plugins in the background and start the background tasks of every plugin,
+        such as the VPN status prober. The tasks are started only once, even if the dashboard
+        is created again.
+        """
+        if self.background_started:
+            return
+        self.background_started = True
+        # Find the WireGuard tools and the platform flavor before the plugins need them
+        capabilities.registry.start()
+        # Import and initialize the remaining plugins in a thread pool
+        self.plugin_manager.preload(
+            timeout=get_env_int("RESISTINE_PLUGIN_TIMEOUT", 10),
+            on_finished=self.write_startup_timeline
+        )
+        for plugin in self.plugin_list:
             try:
-                # Create the buttons for each plugin
-                plugin.set_button(myfunctions.create_tab_button(
-                    self.navigation_frame, 
-                    plugin.get_name(), 
-                    plugin.get_icon(), 
-                    lambda p=plugin: self.select_frame_by_name(f'frame_{p.get_name()}', button = p.get_button()), 
-                    row, 
-                    0
-                ))
+                plugin.start_background()
             except Exception as e:
-                print(f"Error loading plugin button {plugin.get_name()}, Error: {e}")
-            row += 1
+                print(f"Error starting background tasks of plugin {plugin.get_name()}, Error: {e}")
 
-        self.select_frame_by_name("frame_Dashboard", button = self.frames["frame_Dashboard"].get_button())
+    def write_startup_timeline(self):
+        """
+        Write the start-up timeline to startup.log in the application data directory.
+        """
+        timeline.write(os.path.join(myfunctions.get_app_data_dir(), "startup.log"))
 
     def select_frame_by_name(self, name, button=None):
         """
         Select and display the specified frame, and update the button appearance.
+        The screen of each plugin is built on first selection and reused afterwards.
         
         :param name: The name of the frame to display.
         :param button: The button associated with the frame.
         """
         for frame_name, frame in self.frames.items():
+            frame_button = button if frame_name == name and button else frame.get_button()
             if frame_name == name:
-                if button:
-                    button.configure(fg_color=("gray75", "gray25"))
-                frame.create_main_screen().grid(row=0, column=1, sticky="nsew")
+                if frame_button:
+                    frame_button.configure(fg_color=("gray75", "gray25"))
+                self.get_view(frame_name).grid(row=0, column=1, sticky="nsew")
             else:
-                if button:
-                    button.configure(fg_color="transparent")
-                frame.create_main_screen().grid_forget()
+                if frame_button:
+                    frame_button.configure(fg_color="transparent")
+                view = self.frame_manager.get(frame_name)
+                if view is not None:
+                    view.grid_forget()
+        self.current_frame_name = name
+        self.frame_manager.show(name)
+
+    def get_view(self, name):
+        """
+        Get the cached screen of a plugin, building it if it does not exist yet.
+        
+        :param name: The name of the frame.
+        :return: The main screen of the plugin.
+        """
+        view = self.frame_manager.get(name)
+        if view is None:
+            plugin = self.frames[name]
+            start = time.perf_counter()
+            view = plugin.create_main_screen()
+            if not timeline.has(plugin.get_name(), "first_render"):
+                timeline.record(plugin.get_name(), "first_render", (time.perf_counter() - start) * 1000)
+            self.frame_manager.track(name, view)
+        return view
+
+    def invalidate_view(self, plugin):
+        """
+        Destroy the cached screen of a plugin so that it is rebuilt.
+        If the screen is currently displayed, it is rebuilt right away.
+        
+        :param plugin: The plugin whose screen is out of date.
+        """
+        name = f'frame_{plugin.get_name()}'
+        self.frame_manager.invalidate(name)
+        if name == self.current_frame_name:
+            self.select_frame_by_name(name)
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["--linux-helper"]:
+        # The frozen application is also the privileged helper of Linux, see linux_helper.start_helper
+        from plugins.vpn.wireguard import linux_helper
+        linux_helper.main(sys.argv[2:])
+        sys.exit(0)
     customtkinter.set_appearance_mode("system")
     customtkinter.set_default_color_theme(os.path.join(os.path.dirname(__file__), "resources", "themes", "custom_theme.json"))
     app = App()
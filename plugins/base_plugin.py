@@ -6,9 +6,8 @@ Copyright (c) Resistine 2025
 Licensed under the Apache License 2.0
 """
 
-from PIL import Image
-import customtkinter
 import os 
+from utils import image_cache
 
 class BasePlugin:
     """
@@ -38,9 +37,11 @@ class BasePlugin:
         self.translations = translations
         self.icon_light = icon_light_path
         self.icon_dark = icon_dark_path
-        self.icon = self.create_icon(size=(20, 20))
+        self.icon = self.create_icon(size=image_cache.NAV_ICON_SIZE)
         self.icon_alert = None
         self.button = None
+        self.status_listeners = []
+        self.stale = False
 
     def create_main_screen(self):
         """
@@ -83,11 +84,77 @@ class BasePlugin:
 
     def set_status(self, status):
         """
-        Set the status of the plugin.
+        Set the status of the plugin and notify the status listeners.
 
         :param status: The new status for the plugin.
         """
         self.status = status
+        self.stale = False
+        self.notify_status_listeners()
+
+    def restore_status(self, status):
+        """
+        Display a last known status, such as one saved in the status snapshot,
+        until the plugin publishes a fresh one with set_status.
+
+        :param status: The last known status of the plugin.
+        """
+        self.status = status
+        self.stale = True
+        self.notify_status_listeners()
+
+    def is_stale(self):
+        """
+        Check if the status of the plugin is a last known status that has not been confirmed yet.
+
+        :return: True if the status is stale, False otherwise.
+        """
+        return self.stale
+
+    def notify_status_listeners(self):
+        """
+        Call the status listeners with the plugin. A listener that raises an exception is removed.
+        """
+        for listener in list(self.status_listeners):
+            try:
+                listener(self)
+            except Exception as e:
+                print(f"Removing status listener of {self.name}: {e}")
+                self.status_listeners.remove(listener)
+
+    def add_status_listener(self, listener):
+        """
+        Register a function called with the plugin every time its status changes.
+        A listener that raises an exception is removed.
+
+        :param listener: The function to call.
+        """
+        self.status_listeners.append(listener)
+
+    def invalidate_view(self):
+        """
+        Ask the application to rebuild the main screen of the plugin.
+        The cached screen is destroyed and built again on the next selection.
+        """
+        app = getattr(self, 'app', None)
+        if app is not None and hasattr(app, 'invalidate_view'):
+            app.invalidate_view(self)
+
+    def has_background(self):
+        """
+        Check if the plugin probes its status in the background after start-up.
+        Only the statuses of these plugins are restored from the status snapshot.
+
+        :return: True if the status is published by a background task, False otherwise.
+        """
+        return False
+
+    def start_background(self):
+        """
+        Start the background tasks of the plugin once the main window is shown.
+        Subclasses can override this method, the default does nothing.
+        """
+        pass
 
     def get_status(self):
         """
@@ -116,13 +183,12 @@ class BasePlugin:
     def create_icon(self, size):
         """
         Create an icon for the plugin using the provided size.
+        The icon is shared through the process-wide image cache.
 
         :param size: The size of the icon.
         :return: The created icon.
         """
-        light_image = Image.open(self.icon_light)
-        dark_image = Image.open(self.icon_dark)
-        return customtkinter.CTkImage(light_image=dark_image, dark_image=light_image, size=size)
+        return image_cache.get_ctk_image(light_path=self.icon_dark, dark_path=self.icon_light, size=size)
 
     def get_icon(self):
         """
@@ -146,10 +212,9 @@ class BasePlugin:
             "Warning": "warning.png"
         }
         symbols_img_paths = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "resources", "icons")
-        icon_filename = icon_map.get(self.status)
-        self.icon_light = f"{symbols_img_paths}/{icon_filename}"
-        self.icon_dark = f"{symbols_img_paths}/{icon_filename}"
-        self.icon_alert = self.create_icon(size=(16, 16))
+        icon_filename = icon_map.get(self.get_status(), "info.png")
+        icon_path = os.path.join(symbols_img_paths, icon_filename)
+        self.icon_alert = image_cache.get_ctk_image(icon_path, icon_path, size=image_cache.STATUS_ICON_SIZE)
         return self.icon_alert
 
     def set_button(self, button):
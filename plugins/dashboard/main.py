@@ -15,7 +15,6 @@ from plugins.base_plugin import BasePlugin
 import customtkinter
 from PIL import Image
 import os
-from plugins.plugin_manager import PluginManager
 from utils import functions as myfunctions 
 
 class Plugin(BasePlugin):
@@ -60,22 +59,28 @@ class Plugin(BasePlugin):
         self.title_frame.grid_columnconfigure(0, weight=1)
         self.title_frame.grid_rowconfigure(0, weight=1)
 
+        # Plugins come from the registry owned by the application
+        self.plugin_list = self.app.plugin_manager.plugins
+        # Plugins installed from the Store get a tile without rebuilding the dashboard.
+        # Registered here, the plugins are built before the application holds the PluginManager
+        if self.add_tile not in self.app.plugin_manager.listeners:
+            self.app.plugin_manager.add_listener(self.add_tile)
+        self.plugins = [plugin for plugin in self.plugin_list if plugin.get_name() != self.name]
+
         self.title_label = customtkinter.CTkLabel(
             self.title_frame,
-            text="You are protected",
+            text=self.get_verdict(),
             font=customtkinter.CTkFont(size=30, weight="bold")
         )
         self.title_label.grid(row=0, column=0, padx=20, pady=20, sticky="nsew")
-
-        # Load plugins
-        if not hasattr(self.app, 'plugin_list') or not self.app.plugin_list:
-            self.plugin_list = PluginManager(self.app).plugins
-        else:
-            self.plugin_list = self.app.plugin_list
-        self.plugins = self.plugin_list[1:]
-        #self.plugins = PluginManager(self.app).plugins[1:]
+        # The verdict follows the statuses published by the plugins, the screen may be built
+        # several times but the listener is only added once
+        for plugin in self.plugins:
+            if self.update_verdict not in plugin.status_listeners:
+                plugin.add_status_listener(self.update_verdict)
         #gettings rows and columns
         rows, cols = myfunctions.calculate_rows_cols(len(self.plugins))
+        self.cols = cols
 
         # Add scroll if more than 2 rows
         if len(rows) > 2:
@@ -129,3 +134,44 @@ class Plugin(BasePlugin):
             myfunctions.create_option(row, col, self.grid_frame, plugin)      
 
         return self.main_frame
+
+    def get_verdict(self):
+        """
+        @brief Get the protection verdict.
+        Compute the title of the dashboard from the statuses of the plugins.
+        Statuses restored from the status snapshot are marked as last known until they are confirmed.
+        :return: The verdict text.
+        """
+        statuses = [plugin.get_status() for plugin in self.plugins]
+        if "Critical" in statuses or "Error" in statuses:
+            verdict = "Action required"
+        elif "Warning" in statuses:
+            verdict = "Some protections need attention"
+        else:
+            verdict = "You are protected"
+        if any(plugin.is_stale() for plugin in self.plugins):
+            verdict += " (last known)"
+        return verdict
+
+    def update_verdict(self, plugin):
+        """
+        @brief Update the protection verdict.
+        Update the title in place when a plugin publishes a new status.
+        :param plugin: The plugin whose status changed.
+        """
+        self.title_label.configure(text=self.get_verdict())
+
+    def add_tile(self, plugin):
+        """
+        @brief Add the tile of a newly installed plugin.
+        Add one tile after the existing ones, if the dashboard screen has been built.
+        :param plugin: The plugin added to the registry.
+        """
+        if not hasattr(self, 'grid_frame') or not self.grid_frame.winfo_exists():
+            return
+        index = len(self.plugins)
+        self.plugins.append(plugin)
+        myfunctions.create_option(index // len(self.cols), index % len(self.cols), self.grid_frame, plugin)
+        if self.update_verdict not in plugin.status_listeners:
+            plugin.add_status_listener(self.update_verdict)
+        self.update_verdict(plugin)
@@ -0,0 +1,220 @@
+"""
+This module contains the LazyPlugin class, a lightweight stand-in for a plugin.
+A LazyPlugin is built from the static manifest.json shipped in the plugin directory,
+so the navigation bar and the dashboard can be drawn without importing the plugin.
+The real plugin module is imported the first time its screen is requested.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import concurrent.futures
+import importlib
+import json
+import os
+import threading
+import time
+import customtkinter
+from plugins.base_plugin import BasePlugin
+from utils.startup_timeline import timeline
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def read_manifest(plugin_path):
+    """
+    Read the manifest of a plugin directory.
+
+    :param plugin_path: The path to the plugin directory.
+    :return: The manifest as a dictionary, or None if the plugin has no manifest.
+    """
+    manifest_path = os.path.join(plugin_path, MANIFEST_FILENAME)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+class LazyPlugin(BasePlugin):
+    """
+    Proxy for a plugin that is described by a manifest and imported on first use.
+    """
+
+    def __init__(self, app, module_name, plugin_path, manifest):
+        """
+        Initialize the LazyPlugin from the plugin manifest.
+
+        :param app: The application instance passed to the real plugin.
+        :param module_name: The module that contains the Plugin class, e.g. plugins.chat.main.
+        :param plugin_path: The path to the plugin directory.
+        :param manifest: The manifest of the plugin as a dictionary.
+        """
+        self.instance = None
+        self.future = None
+        self.timed_out = False
+        self.lock = threading.Lock()
+        super().__init__(
+            id=manifest["id"],
+            order=manifest["order"],
+            name=manifest["name"],
+            status="Ok",
+            description=manifest.get("description", ""),
+            supported_systems=manifest.get("supported_systems", []),
+            translations=manifest.get("translations", {}),
+            icon_light_path=os.path.join(plugin_path, manifest["icon_light"]),
+            icon_dark_path=os.path.join(plugin_path, manifest["icon_dark"]),
+        )
+        self.app = app
+        self.module_name = module_name
+        self.plugin_path = plugin_path
+        self.background_module = manifest.get("background")
+
+    def is_loaded(self):
+        """
+        Check if the real plugin has already been imported and instantiated.
+
+        :return: True if the plugin is loaded, False otherwise.
+        """
+        return self.instance is not None
+
+    def load(self, timeout=None):
+        """
+        Import the plugin module and instantiate its Plugin class, only once.
+        If the plugin is being loaded in the background, wait for it.
+
+        :param timeout: Maximum time in seconds to wait for a background load, None to wait forever.
+        :return: The real plugin instance.
+        :raises concurrent.futures.TimeoutError: If the background load did not finish in time.
+        """
+        future = self.future
+        if future is not None and self.instance is None:
+            future.result(timeout=timeout)
+        return self.load_now()
+
+    def load_now(self):
+        """
+        Import and instantiate the plugin in the calling thread, recording the time spent.
+        The constructor must not create widgets, it may run in a worker thread.
+
+        :return: The real plugin instance.
+        """
+        with self.lock:
+            if self.instance is None:
+                start = time.perf_counter()
+                module = importlib.import_module(self.module_name)
+                imported = time.perf_counter()
+                plugin_class = getattr(module, "Plugin")
+                instance = plugin_class(self.app)
+                timeline.record(self.name, "import", (imported - start) * 1000)
+                timeline.record(self.name, "init", (time.perf_counter() - imported) * 1000)
+                instance.set_status(self.status)
+                instance.set_button(self.button)
+                self.instance = instance
+        return self.instance
+
+    def create_main_screen(self):
+        """
+        Create the main screen of the real plugin, loading it if needed.
+
+        :return: The main frame of the plugin, or an error frame if the plugin failed to load.
+        """
+        try:
+            plugin = self.load(timeout=0.5)
+        except concurrent.futures.TimeoutError:
+            self.timed_out = True
+            self.set_status("Warning")
+            return self.create_error_screen(f"{self.name} is still loading...")
+        except Exception as e:
+            print(f"Failed to load plugin {self.module_name}: {e}")
+            self.set_status("Error")
+            return self.create_error_screen(f"{self.name} could not be loaded: {e}")
+        return plugin.create_main_screen()
+
+    def create_error_screen(self, message):
+        """
+        Create a frame that reports why the plugin screen is not available.
+
+        :param message: The message to display.
+        :return: The created frame.
+        """
+        frame = customtkinter.CTkFrame(self.app, corner_radius=0, fg_color="transparent")
+        frame.grid_columnconfigure(0, weight=1)
+        frame.grid_rowconfigure(0, weight=1)
+        label = customtkinter.CTkLabel(frame, text=message, font=customtkinter.CTkFont(size=16))
+        label.grid(row=0, column=0, padx=20, pady=20)
+        return frame
+
+    def set_status(self, status):
+        """
+        Set the status of the plugin, forwarding it to the real plugin when loaded.
+
+        :param status: The new status for the plugin.
+        """
+        super().set_status(status)
+        if self.instance is not None:
+            self.instance.set_status(status)
+
+    def restore_status(self, status):
+        """
+        Display a last known status, forwarding it to the real plugin when loaded.
+
+        :param status: The last known status of the plugin.
+        """
+        super().restore_status(status)
+        if self.instance is not None:
+            self.instance.status = status
+
+    def get_status(self):
+        """
+        Get the status of the plugin, as reported by the real plugin when loaded.
+
+        :return: The status of the plugin.
+        """
+        if self.instance is not None:
+            return self.instance.get_status()
+        return self.status
+
+    def has_background(self):
+        """
+        Check if the plugin declares a background task in its manifest, or if the
+        real plugin has one when it is loaded.
+
+        :return: True if the status is published by a background task, False otherwise.
+        """
+        if self.background_module:
+            return True
+        return self.instance is not None and self.instance.has_background()
+
+    def start_background(self):
+        """
+        Start the background tasks declared in the manifest, without importing the plugin itself.
+        The manifest "background" entry names a module exposing start(app, plugin).
+        """
+        if self.instance is not None:
+            self.instance.start_background()
+        if self.background_module:
+            try:
+                module = importlib.import_module(self.background_module)
+                module.start(self.app, self)
+            except Exception as e:
+                print(f"Failed to start background tasks of {self.name}: {e}")
+
+    def set_button(self, button):
+        """
+        Set the navigation button of the plugin, forwarding it to the real plugin when loaded.
+
+        :param button: The new button for the plugin.
+        """
+        self.button = button
+        if self.instance is not None:
+            self.instance.set_button(button)
+
+    def __getattr__(self, name):
+        """
+        Delegate attributes that only exist on the real plugin, loading it if needed.
+
+        :param name: The name of the attribute.
+        :return: The attribute of the real plugin.
+        """
+        if name.startswith("_") or name == "instance":
+            raise AttributeError(name)
+        return getattr(self.load(), name)
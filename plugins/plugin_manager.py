@@ -11,63 +11,239 @@ import requests
 import zipfile
 import io
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from plugins.lazy_plugin import LazyPlugin, read_manifest
+from utils.startup_timeline import timeline
+from utils.platform_info import get_supported_system_name
 
 class PluginManager:
     """
     A class to manage the loading and downloading of plugins.
     """
-    def __init__(self, app):
+    def __init__(self, app, lazy=True):
         """
         Initialize the PluginManager with the given application instance.
+        The application owns a single PluginManager that acts as the plugin registry.
         
         :param app: The application instance to which the plugins will be attached.
+        :param lazy: If False, every plugin module is imported up front instead of on first use.
         """
         self.app = app
+        self.lazy = lazy
+        self.plugin_dirs = set()
+        self.listeners = []
+        self.pending = {}
+        self.on_preload_finished = None
+        self.system_name = get_supported_system_name()
+        self.skipped = []
         self.plugins = sorted(self.load_plugins(), key=lambda x: x.order)
 
+    def add_listener(self, listener):
+        """
+        Register a function called with each plugin added to the registry after start-up.
+        
+        :param listener: The function to call.
+        """
+        self.listeners.append(listener)
+
     def download_plugin(self, url):
         """
         Download a plugin from the specified URL and extract it to the plugins directory.
+        Only the plugins that were not loaded yet are loaded and added to the registry.
         
         :param url: The URL from which to download the plugin.
         :return: A message indicating the success or failure of the download and extraction process.
         """
-        plugins_path = os.path.join(os.path.dirname(os.path.realpath(__file__)))
+        plugins_path = self.get_plugins_path()
         try:
             response = requests.get(url, allow_redirects=True)
             response.raise_for_status()
             with zipfile.ZipFile(io.BytesIO(response.content)) as zip_ref:
                 zip_ref.extractall(os.path.join(plugins_path))
-            self.plugins = self.load_plugins()
-            self.app.create_dashboard()
-            return "Plugin downloaded and extracted successfully."
+            new_plugins = self.load_new_plugins()
+            return f"Plugin downloaded and extracted successfully, {len(new_plugins)} new plugin(s) loaded."
         except requests.RequestException as e:
             return f"Failed to download plugin from {url}: {e}"
         except zipfile.BadZipFile as e:
             return f"Failed to extract plugin: {e}"
 
+    def load_new_plugins(self):
+        """
+        Load the plugins of the plugins directory that are not in the registry yet
+        and notify the listeners of each one.
+        
+        :return: A list of the newly loaded plugin instances.
+        """
+        importlib.invalidate_caches()
+        new_plugins = []
+        for plugin_dir in self.list_plugin_dirs():
+            if plugin_dir in self.plugin_dirs:
+                continue
+            plugin_instance = self.load_plugin(plugin_dir)
+            if plugin_instance is None:
+                continue
+            self.plugins.append(plugin_instance)
+            self.plugins.sort(key=lambda x: x.order)
+            new_plugins.append(plugin_instance)
+            for listener in list(self.listeners):
+                try:
+                    listener(plugin_instance)
+                except Exception as e:
+                    print(f"Error adding plugin {plugin_instance.get_name()}: {e}")
+        return new_plugins
+
+    def list_plugin_dirs(self):
+        """
+        List the plugin directories of the plugins directory.
+        
+        :return: A list of directory names.
+        """
+        plugins_path = self.get_plugins_path()
+        return [d for d in os.listdir(plugins_path) if os.path.isdir(os.path.join(plugins_path, d)) and not d.startswith('_')]
+
     def load_plugins(self):
         """
         Load all plugins from the plugins directory.
+        Plugins that ship a manifest.json are returned as LazyPlugin proxies and imported
+        the first time their screen is selected. Plugins without a manifest are imported right away.
         
         :return: A list of loaded plugin instances.
         """
-        plugins_path = self.get_plugins_path()
-        plugin_dirs = [d for d in os.listdir(plugins_path) if os.path.isdir(os.path.join(plugins_path, d)) and not d.startswith('_')]
         plugins = []
+        for plugin_dir in self.list_plugin_dirs():
+            plugin_instance = self.load_plugin(plugin_dir)
+            if plugin_instance is not None:
+                plugins.append(plugin_instance)
+        return plugins
+
+    def load_plugin(self, plugin_dir):
+        """
+        Load a single plugin from its directory.
         
-        for plugin_dir in plugin_dirs:
-            module_name = f"plugins.{plugin_dir}.main"
-            try:
+        :param plugin_dir: The name of the plugin directory.
+        :return: The plugin instance, or None if the plugin failed to load.
+        """
+        module_name = f"plugins.{plugin_dir}.main"
+        plugin_path = os.path.join(self.get_plugins_path(), plugin_dir)
+        self.plugin_dirs.add(plugin_dir)
+        try:
+            manifest = read_manifest(plugin_path)
+            if manifest is not None:
+                # Unsupported plugins are skipped before their module is imported
+                if not self.is_supported(manifest.get("supported_systems")):
+                    self.skip_plugin(manifest.get("name", plugin_dir), manifest.get("supported_systems"))
+                    return None
+                plugin_instance = LazyPlugin(self.app, module_name, plugin_path, manifest)
+                if not self.lazy:
+                    plugin_instance.load()
+            else:
+                start = time.perf_counter()
                 module = importlib.import_module(module_name)
+                imported = time.perf_counter()
                 plugin_class = getattr(module, "Plugin")  # Adjust this if your plugin class names are different
                 plugin_instance = plugin_class(self.app)
-                plugins.append(plugin_instance)
-                plugin_instance.set_status("Ok")  # Set the status of the plugin to "Ok"
-            except Exception as e:
-                plugin_instance.set_status("Error")  # Set the status of the plugin to "Error"
-                print(f"Failed to load plugin {module_name}: {e}")
-        return plugins
+                timeline.record(plugin_instance.get_name(), "import", (imported - start) * 1000)
+                timeline.record(plugin_instance.get_name(), "init", (time.perf_counter() - imported) * 1000)
+                # Without a manifest the supported systems are only known after the import
+                if not self.is_supported(plugin_instance.get_supported_systems()):
+                    self.skip_plugin(plugin_instance.get_name(), plugin_instance.get_supported_systems())
+                    return None
+            plugin_instance.set_status("Ok")  # Set the status of the plugin to "Ok"
+            return plugin_instance
+        except Exception as e:
+            print(f"Failed to load plugin {module_name}: {e}")
+            return None
+
+    def is_supported(self, supported_systems):
+        """
+        Check if a plugin supports the current system.
+        
+        :param supported_systems: The list of systems declared by the plugin, e.g. ["Windows", "Linux"].
+        :return: True if the plugin can run on the current system, False otherwise.
+        """
+        if not supported_systems:
+            return True
+        return self.system_name in supported_systems
+
+    def skip_plugin(self, name, supported_systems):
+        """
+        Record a plugin that is not loaded because it does not support the current system.
+        
+        :param name: The name of the plugin.
+        :param supported_systems: The list of systems declared by the plugin.
+        """
+        reason = f"supports {', '.join(supported_systems)}, current system is {self.system_name or 'unknown'}"
+        self.skipped.append((name, reason))
+        print(f"Skipping plugin {name}: {reason}")
+        timeline.event(name, f"skipped, {reason}")
+
+    def preload(self, timeout=10, max_workers=4, on_finished=None):
+        """
+        Import and initialize the lazy plugins in a thread pool, after the window is shown.
+        A plugin that is not ready when the deadline expires is marked "Warning" and start-up
+        continues, it is marked "Ok" again if it finishes later or "Error" if it fails.
+        Must be called on the Tk thread.
+        
+        :param timeout: The per-plugin deadline in seconds.
+        :param max_workers: The number of worker threads.
+        :param on_finished: Optional function called on the Tk thread once every plugin is settled.
+        """
+        plugins = [plugin for plugin in self.plugins if isinstance(plugin, LazyPlugin) and not plugin.is_loaded()]
+        self.on_preload_finished = on_finished
+        if not plugins:
+            if on_finished:
+                on_finished()
+            return
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plugin-loader")
+        for plugin in plugins:
+            future = executor.submit(plugin.load_now)
+            plugin.future = future
+            self.pending[plugin] = future
+            future.add_done_callback(lambda f, p=plugin: self.app.dispatcher.post(self.on_preloaded, p, f))
+        executor.shutdown(wait=False)
+        self.app.after(int(timeout * 1000), self.check_deadlines)
+
+    def check_deadlines(self):
+        """
+        Mark the plugins that missed their start-up deadline.
+        """
+        for plugin, future in self.pending.items():
+            if not future.done():
+                print(f"Plugin {plugin.get_name()} did not finish loading in time")
+                timeline.event(plugin.get_name(), "missed the start-up deadline")
+                plugin.timed_out = True
+                plugin.set_status("Warning")
+        self.finish_preload()
+
+    def on_preloaded(self, plugin, future):
+        """
+        Handle the end of the background load of a plugin, on the Tk thread.
+        
+        :param plugin: The plugin that was loaded.
+        :param future: The future of the load.
+        """
+        error = future.exception()
+        if error is not None:
+            print(f"Failed to load plugin {plugin.module_name}: {error}")
+            timeline.event(plugin.get_name(), f"failed to load: {error}")
+            plugin.set_status("Error")
+        elif plugin.timed_out:
+            # The plugin was reported late, show its real screen now
+            plugin.timed_out = False
+            timeline.event(plugin.get_name(), "loaded after the deadline")
+            plugin.set_status("Ok")
+            self.app.invalidate_view(plugin)
+        self.pending.pop(plugin, None)
+        self.finish_preload()
+
+    def finish_preload(self):
+        """
+        Call the preload completion callback once no plugin is still loading.
+        """
+        if self.on_preload_finished and all(future.done() for future in self.pending.values()):
+            callback, self.on_preload_finished = self.on_preload_finished, None
+            callback()
 
     def get_plugins_path(self):
         """
@@ -14,6 +14,8 @@ Licensed under the Apache License 2.0
 from plugins.base_plugin import BasePlugin
 import customtkinter
 import os 
+from utils.startup_timeline import timeline
+from utils.command_runner import runner
 
 class Plugin(BasePlugin):
     """
@@ -46,7 +48,8 @@ class Plugin(BasePlugin):
         """
         self.frame_5 = customtkinter.CTkFrame(self.app, corner_radius=0, fg_color="transparent")
         self.frame_5.grid_columnconfigure(0, weight=1)
-        self.frame_5.grid_rowconfigure((0, 1, 2), weight=1)
+        self.frame_5.grid_rowconfigure((0, 1), weight=1)
+        self.frame_5.grid_rowconfigure(2, weight=3)
 
         self.profile_name_label = customtkinter.CTkLabel(self.frame_5, text="Name: Javier Peres", font=customtkinter.CTkFont(size=20))
         self.profile_name_label.grid(row=0, column=0, padx=20, pady=10)
@@ -58,6 +61,32 @@ class Plugin(BasePlugin):
         self.profile_email_label = customtkinter.CTkLabel(self.frame_5, text=f"Email: {email}", font=customtkinter.CTkFont(size=20))
         self.profile_email_label.grid(row=1, column=0, padx=20, pady=10)
 
+        # Start-up timeline of the plugins
+        self.timeline_frame = customtkinter.CTkFrame(self.frame_5, corner_radius=0, fg_color="transparent")
+        self.timeline_frame.grid(row=2, column=0, padx=20, pady=10, sticky="nsew")
+        self.timeline_frame.grid_columnconfigure(0, weight=1)
+        self.timeline_frame.grid_rowconfigure(1, weight=1)
+
+        self.timeline_label = customtkinter.CTkLabel(self.timeline_frame, text="Start-up timeline", font=customtkinter.CTkFont(size=16))
+        self.timeline_label.grid(row=0, column=0, padx=0, pady=5, sticky="w")
+
+        self.timeline_refresh_button = customtkinter.CTkButton(self.timeline_frame, text="Refresh", command=self.refresh_timeline)
+        self.timeline_refresh_button.grid(row=0, column=1, padx=0, pady=5, sticky="e")
+
+        self.timeline_textbox = customtkinter.CTkTextbox(self.timeline_frame, wrap="none", font=customtkinter.CTkFont(family="Courier", size=12))
+        self.timeline_textbox.grid(row=1, column=0, columnspan=2, sticky="nsew")
+        self.refresh_timeline()
+
         return self.frame_5
 
+    def refresh_timeline(self):
+        """
+        @brief Refresh the start-up timeline.
+        Display the current start-up timeline and the latency of the external commands in the Settings screen.
+        """
+        self.timeline_textbox.configure(state="normal")
+        self.timeline_textbox.delete("1.0", "end")
+        self.timeline_textbox.insert("1.0", timeline.format() + "\n\n" + runner.format())
+        self.timeline_textbox.configure(state="disabled")
+
   
\ No newline at end of file
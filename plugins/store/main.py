@@ -12,10 +12,9 @@ Licensed under the Apache License 2.0
 
 from plugins.base_plugin import BasePlugin
 import customtkinter
-from PIL import Image
 import os
 import webbrowser
-from plugins.plugin_manager import PluginManager
+from utils import image_cache
 
 class Plugin(BasePlugin):
     """
@@ -69,18 +68,6 @@ class Plugin(BasePlugin):
         self.grid_frame.grid_columnconfigure((0, 1, 2), weight=1)
         self.grid_frame.grid_rowconfigure((0, 1, 2), weight=1)
 
-        def resize_image(image_path, size):
-            """
-            Resize an image to the specified size.
-            
-            :param image_path: Path to the image file.
-            :param size: Tuple specifying the new size (width, height).
-            :return: Resized image.
-            """
-            image = Image.open(image_path)
-            resized_image = image.resize(size, Image.Resampling.LANCZOS)
-            return resized_image
-
         def create_option(row, column, main_icon_light_path, main_icon_dark_path, title, main_event):
             """
             Create an option in the grid with an icon and title.
@@ -107,16 +94,8 @@ class Plugin(BasePlugin):
             icon_title_frame.grid_rowconfigure(0, weight=1)
             icon_title_frame.grid_rowconfigure(1, weight=1)
 
-            # Resize the main icon
-            resized_main_icon_light = resize_image(main_icon_light_path, (90, 90))
-            resized_main_icon_dark = resize_image(main_icon_dark_path, (90, 90))
-
-            # Main icon
-            main_icon_image = customtkinter.CTkImage(
-            light_image=Image.open(main_icon_light_path),
-            dark_image=Image.open(main_icon_dark_path),
-            size=(30, 30)
-            )
+            # Main icon, shared between all the options
+            main_icon_image = image_cache.get_ctk_image(main_icon_light_path, main_icon_dark_path, size=image_cache.TILE_ICON_SIZE)
             main_icon_label = customtkinter.CTkLabel(icon_title_frame, image=main_icon_image, text="")
             main_icon_label.grid(row=0, column=0, padx=(10, 10), pady=(30, 10))
 
@@ -148,7 +127,7 @@ class Plugin(BasePlugin):
             
             :param url: URL to download the plugin from.
             """
-            PluginManager(self.app).download_plugin(url)
+            print(self.app.plugin_manager.download_plugin(url))
 
         
         product_image_light_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "store_dark.png")
@@ -15,13 +15,29 @@ import customtkinter
 import os 
 import tkinter as tk
 import platform
+import bisect
 from utils.encryption import *  # Ensure this module is correctly installed or replace with the correct one
 from tkinter import filedialog
-from PIL import Image
+from utils import image_cache
+from utils.tk_executor import TaskCancelled
+from plugins.vpn.wireguard import wg_config
+from plugins.vpn.wireguard import endpoint_prober
+from plugins.vpn.wireguard import route_compiler
+from plugins.vpn.tunnel_index import TunnelIndex
+from plugins.vpn import route_validator
+
+_wireguard_dir = None
 
 # Function to get writable WireGuard directory
 def get_writable_wireguard_dir():
-    """Get a writable directory for WireGuard configuration files"""
+    """Get a writable directory for WireGuard configuration files, created on first use"""
+    global _wireguard_dir
+    if _wireguard_dir is None:
+        _wireguard_dir = create_writable_wireguard_dir()
+    return _wireguard_dir
+
+def create_writable_wireguard_dir():
+    """Create the writable directory for WireGuard configuration files"""
     if platform.system() == "Darwin":
         # Use ~/Library/Application Support/Resistine AI/wireguard for macOS
         home_dir = os.path.expanduser("~")
@@ -43,31 +59,44 @@ def get_writable_wireguard_dir():
         os.makedirs(wireguard_dir, exist_ok=True)
         return wireguard_dir
 
-# Define the global variable and initialize vpn status
-active_client_name = None
 if platform.system() == "Windows":
     from plugins.vpn.wireguard.vpn_functions_windows import *
-    existing_interfaces = subprocess.run(['wg', 'show', 'interfaces'], capture_output=True, text=True, check=True).stdout.split()
 elif platform.system() == "Linux":
     from plugins.vpn.wireguard.vpn_functions_linux import *
     from python_wireguard import Client, ServerConnection, Key
-    existing_interfaces = os.popen('wg show interfaces').read().split()
 elif platform.system() == "Darwin":
     from plugins.vpn.wireguard.vpn_functions_darwin import *
     #from python_wireguard import Client, ServerConnection, Key
-    existing_interfaces = os.popen('wg show interfaces').read().split()
 else:
     raise NotImplementedError("Unsupported platform")
 
-
-for interface in existing_interfaces:
-        status = check_service_status(interface, "10.49.64.53")
-        if status == "Running":
-            active_client_name = interface
-            break
-
-my_vpn_status = check_service_status(active_client_name, "10.49.64.53") if active_client_name else "Stopped"
-print(f"VPN Status in the init function : {my_vpn_status}")
+# The VPN status is probed in the background, see plugins/vpn/vpn_state.py
+from plugins.vpn import vpn_state
+from plugins.vpn.vpn_state import TEST_IP
+# Each tunnel has its own state, several tunnels can be up or toggled at the same time
+from plugins.vpn import tunnel_state
+from plugins.vpn.tunnel_state import STOPPED, STARTING, RUNNING, STOPPING, FAILED
+# Traffic and handshake history of the running tunnels
+from plugins.vpn import telemetry
+
+# Size of the throughput graph in pixels
+SPARKLINE_WIDTH = 240
+SPARKLINE_HEIGHT = 48
+
+# Text and listbox color of each tunnel state
+TUNNEL_STATE_TEXT = {
+    STOPPED: "Inactive",
+    STARTING: "Activating...",
+    RUNNING: "Active",
+    STOPPING: "Deactivating...",
+    FAILED: "Failed",
+}
+TUNNEL_STATE_COLORS = {
+    STARTING: "orange",
+    RUNNING: "green",
+    STOPPING: "orange",
+    FAILED: "red",
+}
 
 # Function to update listbox colors based on theme
 def update_listbox_colors(listbox):
@@ -76,6 +105,23 @@ def update_listbox_colors(listbox):
     else:
         listbox.config(fg="black", bg="lightgray")
 
+# Function to update the throughput graph background based on theme
+def update_canvas_colors(canvas):
+    canvas.config(bg="#2e2e2e" if customtkinter.get_appearance_mode() == "Dark" else "lightgray")
+
+def format_rate(rate):
+    """
+    Format a throughput for display.
+
+    :param rate: The throughput in bytes per second.
+    :return: The throughput with its unit, e.g. "1.2 MB/s".
+    """
+    for unit in ("B/s", "KB/s", "MB/s"):
+        if rate < 1024:
+            return f"{rate:.0f} {unit}" if unit == "B/s" else f"{rate:.1f} {unit}"
+        rate /= 1024
+    return f"{rate:.1f} GB/s"
+
 #Define the plugin class
 class Plugin(BasePlugin):
     """
@@ -94,14 +140,50 @@ class Plugin(BasePlugin):
             order=8,
             name="VPN",
             description="VPN for windows",
-            supported_systems=["Windows"],
+            supported_systems=["Windows", "Linux", "Mac"],
             status="OK",
             translations={"US": "VPN", "ES": "VPN", "FR": "VPN"},
             icon_light_path=os.path.join(os.path.dirname(os.path.realpath(__file__)), "vpn_light.png"),
             icon_dark_path=os.path.join(os.path.dirname(os.path.realpath(__file__)), "vpn_dark.png"),
         )
         self.app = app
+        self.toggle_tasks = {}
+        self.progress_states = {}
+        vpn_state.add_listener(self.on_vpn_state_changed)
+        tunnel_state.registry.add_listener(self.on_tunnel_state_changed)
+        # Tunnels are listed once and then followed through the changes of the directory
+        self.tunnel_index = TunnelIndex(get_writable_wireguard_dir())
+        self.tunnel_index.add_listener(self.on_tunnels_changed)
+        self.tunnel_index.start(self.app.dispatcher)
+        # The running tunnels are sampled in the background for the throughput graph
+        self.telemetry = telemetry.TelemetrySampler(self.app.dispatcher, reader=read_all_dump if platform.system() in ("Linux", "Darwin") else None)
+        self.telemetry.add_listener(self.on_telemetry_sampled)
+        self.telemetry.start()
+
+    def on_vpn_state_changed(self, client_name, status):
+        """
+        Refresh the status of the selected tunnel when a new VPN state is published,
+        e.g. once the first probe replaced the last known state.
 
+        :param client_name: The name of the first running interface, or None.
+        :param status: The status of the VPN.
+        """
+        if self.has_tunnel_list():
+            self.display_tunnel_status(self.get_selected_tunnel())
+
+    def on_tunnel_state_changed(self, machine):
+        """
+        Update the row of a tunnel, and its status if it is selected, when its state changes.
+
+        :param machine: The TunnelStateMachine of the tunnel.
+        """
+        if not self.has_tunnel_list():
+            return
+        position = bisect.bisect_left(self.tunnel_index.names, machine.name)
+        if position < len(self.tunnel_index.names) and self.tunnel_index.names[position] == machine.name:
+            self.display_tunnel_row(position)
+        if machine.name == self.get_selected_tunnel():
+            self.display_tunnel_status(machine.name)
 
     #Create the main screen
     def create_main_screen(self):
@@ -233,9 +315,9 @@ class Plugin(BasePlugin):
 
 
         # Populate the listbox with configuration files without the .conf extension
-        for conf_file in conf_files:
-            interface_name = os.path.splitext(conf_file)[0]
-            self.conf_files_listbox.insert(tk.END, interface_name)
+        for position, conf_file in enumerate(conf_files):
+            self.conf_files_listbox.insert(tk.END, os.path.splitext(conf_file)[0])
+            self.display_tunnel_row(position)
 
         # Select the first item by default if the listbox is not empty
         if conf_files:
@@ -243,11 +325,7 @@ class Plugin(BasePlugin):
 
         # Function to get the selected configuration file
         def get_selected_conf_file():
-            selected_index = self.conf_files_listbox.curselection()
-            if selected_index:
-                selected_file = self.conf_files_listbox.get(selected_index)
-                return os.path.splitext(selected_file)[0]
-            return None
+            return self.get_selected_tunnel()
 
 
         # Second container in column 0 (5% height)
@@ -280,26 +358,19 @@ class Plugin(BasePlugin):
         print(f"Interface name: {interface_name}")
         selected_conf_file = get_selected_conf_file()
         data = self.get_configuration_values(selected_conf_file)
-        global my_vpn_status
-        print(f"VPN Status in display vpn info : {my_vpn_status}")
+        print(f"Tunnel state in display vpn info : {tunnel_state.registry.get_state(interface_name)}")
 
         self.interface_label = customtkinter.CTkLabel(self.vpn_info_frame, text=f"Interface: {interface_name}", justify="center")
         self.interface_label.grid(row=0, column=0, padx=10, pady=5, sticky="nw")
-
-        shield_image_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "active_shield.png" if my_vpn_status == "Running" else "inactive_shield.png")
-        status_text = "Active" if my_vpn_status == "Running" else "Inactive"
         
         self.status_frame = customtkinter.CTkFrame(self.vpn_info_frame, corner_radius=3, fg_color="transparent")
         self.status_frame.grid(row=1, column=0, padx=1, pady=0, sticky="nw")
         self.status_frame.grid_columnconfigure(0, weight=0)
         self.status_frame.grid_columnconfigure(1, weight=1)
 
-        # Load images using PIL
-        shield_image = Image.open(shield_image_path)
-        self.shield_image = customtkinter.CTkImage(light_image=shield_image, dark_image=shield_image)
         self.status_label = customtkinter.CTkLabel(self.status_frame, text="Status: ", justify="left")
         self.status_label.grid(row=0, column=0, padx=10, pady=5, sticky="nw")
-        self.status_image_label = customtkinter.CTkLabel(self.status_frame, image=self.shield_image, text=status_text, compound="left", justify="left")
+        self.status_image_label = customtkinter.CTkLabel(self.status_frame, text="", compound="left", justify="left")
         self.status_image_label.grid(row=0, column=1, padx=5, pady=5, sticky="nw")
 
         self.public_key_label = customtkinter.CTkLabel(self.vpn_info_frame, text=f"Public Key: {data.get('public_key')}", justify="left")
@@ -308,28 +379,33 @@ class Plugin(BasePlugin):
         self.addresses_label = customtkinter.CTkLabel(self.vpn_info_frame, text=f"Addresses: {data.get('client_ip_address')}", justify="left")
         self.addresses_label.grid(row=3, column=0, padx=10, pady=5, sticky="nw")
 
-        # Activate/Deactivate Button
-        button_text = "Deactivate" if my_vpn_status == "Running" else "Activate"
-        button_color = "red" if my_vpn_status == "Running" else "green"
-        self.activate_button = customtkinter.CTkButton(self.vpn_info_frame, text=button_text, fg_color=button_color, command=lambda: self.activate_tunnel(get_selected_conf_file()))
+        # Activate/Deactivate Button, Cancel while a toggle is in flight
+        self.activate_button = customtkinter.CTkButton(self.vpn_info_frame, text="", command=lambda: self.activate_tunnel(get_selected_conf_file()))
         self.activate_button.grid(row=4, column=0, padx=10, pady=5, sticky="nw")
 
+        # Progress of the last toggle of the selected tunnel
+        self.progress_label = customtkinter.CTkLabel(self.vpn_info_frame, text="", justify="left")
+        self.progress_label.grid(row=5, column=0, padx=10, pady=5, sticky="nw")
+
+        # Throughput of the selected tunnel over the last samples
+        self.sparkline_canvas = tk.Canvas(self.vpn_info_frame, width=SPARKLINE_WIDTH, height=SPARKLINE_HEIGHT, highlightthickness=0, bd=0)
+        self.sparkline_canvas.grid(row=6, column=0, padx=10, pady=(5, 0), sticky="nw")
+        update_canvas_colors(self.sparkline_canvas)
+        self.app.bind("<<ThemeChanged>>", lambda e: update_canvas_colors(self.sparkline_canvas), add="+")
+        self.telemetry_label = customtkinter.CTkLabel(self.vpn_info_frame, text="", justify="left")
+        self.telemetry_label.grid(row=7, column=0, padx=10, pady=(0, 5), sticky="nw")
+        self.display_tunnel_status(interface_name)
+
         # Peer Information Frame 2
         self.vpn_info_frame_peer = customtkinter.CTkFrame(self.first_container_col1, corner_radius=3, fg_color=("lightgray", "#2e2e2e"), border_color="darkgray", border_width=1)
         self.vpn_info_frame_peer.grid(row=1, column=0, padx=10, pady=(5, 10), sticky="nswe")
         self.vpn_info_frame_peer.grid_columnconfigure(0, weight=1)
 
-        self.peer_label = customtkinter.CTkLabel(self.vpn_info_frame_peer, text="Peer:", justify="center")
-        self.peer_label.grid(row=0, column=0, padx=10, pady=5, sticky="nw")
+        # One block of labels per [Peer] section
+        self.display_peers(self.get_tunnel_config(selected_conf_file))
 
-        self.peer_public_key_label = customtkinter.CTkLabel(self.vpn_info_frame_peer, text=f"Public Key: {data.get('public_key')}", justify="left")
-        self.peer_public_key_label.grid(row=1, column=0, padx=10, pady=5, sticky="nw")
-
-        self.peer_allowed_ips_label = customtkinter.CTkLabel(self.vpn_info_frame_peer, text=f"Allowed IPs: {data.get('allowed_ips')}", justify="left")
-        self.peer_allowed_ips_label.grid(row=2, column=0, padx=10, pady=5, sticky="nw")
-
-        self.peer_endpoint_label = customtkinter.CTkLabel(self.vpn_info_frame_peer, text=f"Endpoint: {data.get('endpoint')}:{data.get('port')}", justify="left")
-        self.peer_endpoint_label.grid(row=3, column=0, padx=10, pady=5, sticky="nw")
+        # Switching tunnels updates the labels in place from the parsed configurations
+        self.conf_files_listbox.bind("<<ListboxSelect>>", lambda e: self.display_tunnel_details(get_selected_conf_file()))
 
         # Second container in column 1 (5% height)
         self.second_container_col1 = customtkinter.CTkFrame(self.sub_frame_container, corner_radius=0, fg_color="transparent")
@@ -344,6 +420,183 @@ class Plugin(BasePlugin):
         return self.main_container
 
 
+    def get_selected_tunnel(self):
+        """
+        @brief get_selected_tunnel vpn plugin.
+        Get the name of the tunnel selected in the listbox.
+        Returns:
+            str: The name of the selected tunnel, or None.
+        """
+        selected_index = self.conf_files_listbox.curselection()
+        if selected_index:
+            return self.tunnel_index.names[selected_index[0]]
+        return None
+
+    def has_tunnel_list(self):
+        """
+        @brief has_tunnel_list vpn plugin.
+        Returns:
+            bool: True if the screen with the list of tunnels is displayed, False otherwise.
+        """
+        return hasattr(self, 'conf_files_listbox') and self.conf_files_listbox.winfo_exists()
+
+    def display_tunnel_row(self, position):
+        """
+        @brief display_tunnel_row vpn plugin.
+        Display the name and the state of a tunnel in its row of the listbox.
+        Args:
+            position (int): The position of the tunnel in the sorted list of tunnels.
+        """
+        tunnel_name = self.tunnel_index.names[position]
+        state = tunnel_state.registry.get_state(tunnel_name)
+        text = tunnel_name if state == STOPPED else f"{tunnel_name} ({TUNNEL_STATE_TEXT[state]})"
+        if self.conf_files_listbox.get(position) != text:
+            was_selected = position in self.conf_files_listbox.curselection()
+            self.conf_files_listbox.delete(position)
+            self.conf_files_listbox.insert(position, text)
+            if was_selected:
+                self.conf_files_listbox.select_set(position)
+        # An empty color falls back to the color of the theme
+        self.conf_files_listbox.itemconfig(position, fg=TUNNEL_STATE_COLORS.get(state, ""))
+
+    def display_tunnel_status(self, tunnel_name):
+        """
+        @brief display_tunnel_status vpn plugin.
+        Display the state, the activate button and the progress of the selected tunnel.
+        Args:
+            tunnel_name (str): The name of the selected tunnel, or None.
+        """
+        if not tunnel_name or not self.status_image_label.winfo_exists():
+            return
+        machine = tunnel_state.registry.get(tunnel_name)
+        status_text = TUNNEL_STATE_TEXT[machine.state]
+        if not vpn_state.status_known and not machine.is_busy():
+            # Last known state from the status snapshot, or nothing yet
+            status_text = f"{status_text} (checking...)" if vpn_state.status_restored else "Checking..."
+        shield_image_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "active_shield.png" if machine.state == RUNNING else "inactive_shield.png")
+        # Shield images are shared through the image cache
+        self.shield_image = image_cache.get_ctk_image(shield_image_path, size=image_cache.NAV_ICON_SIZE)
+        self.status_image_label.configure(image=self.shield_image, text=status_text)
+        self.progress_label.configure(text=self.progress_states.get(tunnel_name) or "")
+        self.activate_button.configure(**self.get_activate_button_style(tunnel_name))
+        self.display_telemetry(tunnel_name)
+
+    def on_telemetry_sampled(self, tunnel_names):
+        """
+        @brief on_telemetry_sampled vpn plugin.
+        Redraw the throughput graph when the selected tunnel has been sampled.
+        Args:
+            tunnel_names (list): The names of the sampled tunnels.
+        """
+        if self.has_tunnel_list():
+            tunnel_name = self.get_selected_tunnel()
+            if tunnel_name in tunnel_names:
+                self.display_telemetry(tunnel_name)
+
+    def display_telemetry(self, tunnel_name):
+        """
+        @brief display_telemetry vpn plugin.
+        Draw the received and sent throughput of a tunnel as a sparkline, with the current
+        rates and the age of the latest handshake.
+        Args:
+            tunnel_name (str): The name of the selected tunnel.
+        """
+        if not self.sparkline_canvas.winfo_exists():
+            return
+        self.sparkline_canvas.delete("all")
+        history = self.telemetry.get_history(tunnel_name) if tunnel_state.registry.get_state(tunnel_name) == RUNNING else None
+        if history is None or not len(history[0]):
+            self.telemetry_label.configure(text="")
+            return
+        rx_rates, tx_rates, handshake_age = history
+        # Both lines share the scale, the graph is never flat because of an idle direction
+        peak = max(max(rx_rates), max(tx_rates), 1.0)
+        step = SPARKLINE_WIDTH / max(len(rx_rates) - 1, 1)
+        for rates, color in ((rx_rates, "green"), (tx_rates, "dodgerblue")):
+            points = []
+            for index, rate in enumerate(rates):
+                points.extend((index * step, SPARKLINE_HEIGHT - 1 - rate / peak * (SPARKLINE_HEIGHT - 2)))
+            if len(points) >= 4:
+                self.sparkline_canvas.create_line(*points, fill=color, width=1.5)
+        text = f"↓ {format_rate(rx_rates[-1])}   ↑ {format_rate(tx_rates[-1])}"
+        if handshake_age is not None:
+            text += f"   Handshake: {handshake_age:.0f}s ago"
+        self.telemetry_label.configure(text=text)
+
+    def on_tunnels_changed(self, event, tunnel_name, position):
+        """
+        @brief on_tunnels_changed vpn plugin.
+        Apply a change of the tunnel index to the listbox, without rebuilding the screen.
+        Args:
+            event (str): "added", "modified" or "removed".
+            tunnel_name (str): The name of the tunnel.
+            position (int): The position of the tunnel in the sorted list of tunnels.
+        """
+        if not self.has_tunnel_list():
+            # The screen without tunnels is displayed, or the screen has not been built yet
+            if event != "modified":
+                self.update_plugin(self.id)
+            return
+        if event == "added":
+            self.conf_files_listbox.insert(position, tunnel_name)
+            self.display_tunnel_row(position)
+            if not self.conf_files_listbox.curselection():
+                self.conf_files_listbox.select_set(position)
+                self.display_tunnel_details(tunnel_name)
+        elif event == "removed":
+            was_selected = position in self.conf_files_listbox.curselection()
+            self.conf_files_listbox.delete(position)
+            if not self.tunnel_index.names:
+                self.update_plugin(self.id)
+            elif was_selected:
+                position = min(position, len(self.tunnel_index.names) - 1)
+                self.conf_files_listbox.select_set(position)
+                self.display_tunnel_details(self.tunnel_index.names[position])
+        elif tunnel_name == self.get_selected_tunnel():
+            self.display_tunnel_details(tunnel_name)
+
+    def display_peers(self, config):
+        """
+        @brief display_peers vpn plugin.
+        Display the public key, allowed IPs and endpoint of every peer of a tunnel.
+        Args:
+            config (WireGuardConfig): The configuration of the tunnel, or None.
+        """
+        for widget in self.vpn_info_frame_peer.winfo_children():
+            widget.destroy()
+        peers = config.peers if config is not None else []
+        row = 0
+        for index, peer in enumerate(peers or [None]):
+            title = "Peer:" if len(peers) <= 1 else f"Peer {index + 1}:"
+            values = [
+                f"Public Key: {peer.public_key if peer else ''}",
+                f"Allowed IPs: {', '.join(peer.allowed_ips) if peer else ''}",
+                f"Endpoint: {(peer.endpoint or '') if peer else ''}",
+            ]
+            label = customtkinter.CTkLabel(self.vpn_info_frame_peer, text=title, justify="center")
+            label.grid(row=row, column=0, padx=10, pady=5, sticky="nw")
+            row += 1
+            for text in values:
+                label = customtkinter.CTkLabel(self.vpn_info_frame_peer, text=text, justify="left")
+                label.grid(row=row, column=0, padx=10, pady=5, sticky="nw")
+                row += 1
+
+    def display_tunnel_details(self, tunnel_name):
+        """
+        @brief display_tunnel_details vpn plugin.
+        Update the interface and peer information when another tunnel is selected.
+        Args:
+            tunnel_name (str): The name of the selected tunnel.
+        """
+        if not tunnel_name:
+            return
+        data = self.get_configuration_values(tunnel_name)
+        self.interface_label.configure(text=f"Interface: {tunnel_name}")
+        self.public_key_label.configure(text=f"Public Key: {data.get('public_key')}")
+        self.addresses_label.configure(text=f"Addresses: {data.get('client_ip_address')}")
+        self.display_peers(self.get_tunnel_config(tunnel_name))
+        self.display_tunnel_status(tunnel_name)
+
     def add_tunnel(self):
         """
         Adds a WireGuard tunnel configuration by selecting a configuration file.
@@ -367,8 +620,12 @@ class Plugin(BasePlugin):
                     with open(destination_path, 'wb') as dst_file:
                         dst_file.write(src_file.read())
                 print(f"File {file_path} saved to {destination_path}")
-                # Force update ONLY this plugin
-                self.update_plugin(self.id)  # Ensure it reloads the VPN plugin
+                # The new tunnel is inserted in the listbox right away
+                tunnel_name = os.path.splitext(os.path.basename(file_path))[0]
+                self.tunnel_index.add(tunnel_name)
+                config = self.get_tunnel_config(tunnel_name)
+                if config is not None:
+                    self.show_route_warnings(tunnel_name, self.check_routes(tunnel_name, config))
             except Exception as e:
                 print(f"Error saving file: {e}")
         else:
@@ -383,9 +640,10 @@ class Plugin(BasePlugin):
             if os.path.exists(conf_file_path):
                 try:
                     os.remove(conf_file_path)
+                    wg_config.forget_config(conf_file_path)
                     print(f"Deleted configuration file: {conf_file_path}")
-                    # Force update ONLY this plugin
-                    self.update_plugin(self.id)  # Ensure it reloads the VPN plugin
+                    # The tunnel is removed from the listbox right away
+                    self.tunnel_index.remove(selected_conf_file)
                 except Exception as e:
                     print(f"Error deleting file: {e}")
             else:
@@ -405,11 +663,29 @@ class Plugin(BasePlugin):
             wireguard_folder = get_writable_wireguard_dir()
             conf_file_path = os.path.join(wireguard_folder, f"{selected_conf_file}.conf")
 
+            confirmed_text = []
+
             def save_changes():
                 try:
-                    with open(conf_file_path, 'w') as conf_file:
-                        conf_file.write(text_area.get("1.0", tk.END))
+                    # The text is parsed before it is written, an invalid configuration is not saved
+                    text = text_area.get("1.0", "end-1c")
+                    config = wg_config.parse_config(text)
+                    # The overlaps are checked on the routes that will be written
+                    route_compiler.compile_config(config)
+                    overlaps = self.check_routes(selected_conf_file, config)
+                    if overlaps and confirmed_text != [text]:
+                        # Saving the same text again keeps the overlapping routes
+                        confirmed_text[:] = [text]
+                        lines = [overlap.describe() for overlap in overlaps[:5]]
+                        if len(overlaps) > 5:
+                            lines.append(f"and {len(overlaps) - 5} more")
+                        error_label.configure(text="\n".join(lines + ["Save again to keep these routes."]))
+                        return
+                    wg_config.write_config(conf_file_path, config)
                     settings_popup.destroy()
+                    self.update_plugin(self.id)
+                except wg_config.ConfigError as e:
+                    error_label.configure(text=f"Invalid configuration: {e}")
                 except Exception as e:
                     print(f"Error saving changes: {e}")
 
@@ -423,13 +699,20 @@ class Plugin(BasePlugin):
             settings_frame = customtkinter.CTkFrame(settings_popup, corner_radius=0, fg_color="transparent")
             settings_frame.pack(fill="both", expand=True, padx=20, pady=20)
 
-            with open(conf_file_path, 'r') as conf_file:
-                config_content = conf_file.read()
+            config = self.get_tunnel_config(selected_conf_file)
+            if config is not None:
+                config_content = config.format()
+            else:
+                with open(conf_file_path, 'r') as conf_file:
+                    config_content = conf_file.read()
 
             text_area = customtkinter.CTkTextbox(settings_frame, wrap=tk.WORD)
             text_area.insert(tk.END, config_content)
             text_area.pack(fill="both", expand=True, padx=10, pady=10)
 
+            error_label = customtkinter.CTkLabel(settings_frame, text="", text_color="red")
+            error_label.pack(fill="x", padx=10)
+
             # Save and Cancel buttons
             button_frame = customtkinter.CTkFrame(settings_frame, corner_radius=0, fg_color="transparent")
             button_frame.pack(fill="x", padx=10, pady=10)
@@ -440,21 +723,65 @@ class Plugin(BasePlugin):
             cancel_button = customtkinter.CTkButton(button_frame, text="Cancel", command=cancel_changes)
             cancel_button.pack(side="right", padx=10, pady=10, expand=True)
 
+    def check_routes(self, tunnel_name, config):
+        """
+        Find the AllowedIPs of a tunnel that overlap those of the other tunnels or the local network.
+        The configurations of the other tunnels come from the configuration cache.
+
+        :param tunnel_name: The name of the tunnel that is added or edited.
+        :param config: The new WireGuardConfig of the tunnel.
+        :return: The list of route_validator.Overlap.
+        """
+        configs = {}
+        for name in self.tunnel_index.names:
+            if name != tunnel_name:
+                other = self.get_tunnel_config(name)
+                if other is not None:
+                    configs[name] = other
+        overlaps = route_validator.check_tunnel(tunnel_name, config, configs)
+        for overlap in overlaps:
+            print(f"Route overlap: {overlap.describe()}")
+        return overlaps
+
+    def show_route_warnings(self, tunnel_name, overlaps, max_lines=10):
+        """
+        Show the routes of a tunnel that overlap other tunnels in a popup.
+
+        :param tunnel_name: The name of the tunnel.
+        :param overlaps: The list of route_validator.Overlap, nothing is shown if it is empty.
+        :param max_lines: The maximum number of overlaps listed.
+        """
+        if not overlaps:
+            return
+        lines = [overlap.describe() for overlap in overlaps[:max_lines]]
+        if len(overlaps) > max_lines:
+            lines.append(f"and {len(overlaps) - max_lines} more")
+
+        warning_popup = customtkinter.CTkToplevel(self.app)
+        warning_popup.title(f"Overlapping routes in {tunnel_name}")
+
+        warning_frame = customtkinter.CTkFrame(warning_popup, corner_radius=0, fg_color="transparent")
+        warning_frame.pack(fill="both", expand=True, padx=20, pady=20)
+
+        title_label = customtkinter.CTkLabel(warning_frame, text="When these tunnels are up at the same time, the most specific route wins:", justify="left")
+        title_label.pack(fill="x", padx=10, pady=(10, 5))
+        warning_label = customtkinter.CTkLabel(warning_frame, text="\n".join(lines), justify="left", text_color="orange")
+        warning_label.pack(fill="x", padx=10, pady=5)
+
+        ok_button = customtkinter.CTkButton(warning_frame, text="OK", command=warning_popup.destroy)
+        ok_button.pack(padx=10, pady=10)
+
     def get_list_of_tunnels(self):
         """
-        Retrieve the list of available VPN tunnel configuration files.
+        Retrieve the list of available VPN tunnel configuration files from the tunnel index.
         
         :return: A list of configuration file names.
         """
-        wireguard_folder = get_writable_wireguard_dir()
-        if os.path.exists(wireguard_folder):
-            conf_files = [f for f in os.listdir(wireguard_folder) if f.endswith('.conf')]
-            return conf_files
-        return []
+        return [f"{tunnel_name}.conf" for tunnel_name in self.tunnel_index.names]
 
     def update_plugin(self, plugin_id):
         """
-        Refresh the view of the specified plugin by reloading its main screen.
+        Refresh the view of the specified plugin by invalidating its cached main screen.
         
         :param plugin_id: The ID of the plugin to be updated.
         """
@@ -462,22 +789,40 @@ class Plugin(BasePlugin):
         # Ensure you're updating the correct plugin
         for plugin in self.app.plugin_list:
             if plugin.id == plugin_id:
-                self.main_container.destroy()  # Remove old UI
                 print(f"Reloading plugin: {plugin}")  # Debugging
-                plugin.create_main_screen().grid(row=0, column=1, sticky="nsew")  # Create new UI
+                self.app.invalidate_view(plugin)  # Rebuilt now if displayed, else on next selection
                 return    
 
+    def get_tunnel_config(self, tunnel_name):
+        """
+        Get the parsed configuration of a tunnel, from the cache if the file did not change.
+        
+        :param tunnel_name: The name of the tunnel.
+        :return: The WireGuardConfig, or None if the file is missing or not valid.
+        """
+        if not tunnel_name:
+            return None
+        conf_file_path = os.path.join(get_writable_wireguard_dir(), f"{tunnel_name}.conf")
+        try:
+            return wg_config.load_config(conf_file_path)
+        except FileNotFoundError:
+            print(f"Configuration file not found, values not created: {conf_file_path}")
+        except (OSError, wg_config.ConfigError) as e:
+            print(f"Error reading configuration file {conf_file_path}: {e}")
+        return None
+
     def get_configuration_values(self, tunnel_name):
         """
         Retrieve the configuration values from the specified tunnel's configuration file.
+        The values of the peer are those of the first [Peer] section.
         
         :param tunnel_name: The name of the tunnel whose configuration values are to be retrieved.
         :return: A dictionary containing the configuration values.
         """
-        wireguard_folder = get_writable_wireguard_dir()
-        conf_file_path = os.path.join(wireguard_folder, f"{tunnel_name}.conf")
-
-        data = {
+        config = self.get_tunnel_config(tunnel_name)
+        if config is not None:
+            return config.to_values()
+        return {
             'private_key': '',
             'client_ip_address': '',
             'public_key': '',
@@ -487,69 +832,80 @@ class Plugin(BasePlugin):
             'dns': ''
         }
 
-        if os.path.exists(conf_file_path):
-            with open(conf_file_path, 'r') as conf_file:
-                for line in conf_file:
-                    if line.startswith('PrivateKey'):
-                        data['private_key'] = line.split('=')[1].strip() + '='
-                    elif line.startswith('Address'):
-                        data['client_ip_address'] = line.split('=')[1].strip()
-                    elif line.startswith('PublicKey'):
-                        data['public_key'] = line.split('=')[1].strip() + '='
-                    elif line.startswith('AllowedIPs'):
-                        data['allowed_ips'] = line.split('=')[1].strip()
-                    elif line.startswith('Endpoint'):
-                        endpoint = line.split('=')[1].strip()
-                        data['endpoint'], data['port'] = endpoint.split(':')
-                    elif line.startswith('DNS'):
-                        data['dns'] = line.split('=')[1].strip()
-        else:
-            print(f"Configuration file not found, values not created: {conf_file_path}")
-
-        return data
-
-
-    
     def activate_tunnel(self, tunnel_name):
         """
-        Activates a VPN tunnel using WireGuard based on the provided tunnel name.
-        This function handles the activation of a VPN tunnel for both Linux and Windows platforms.
-        It checks if WireGuard is installed, configures the VPN tunnel, and starts or stops the VPN service
-        based on the current status.
+        @brief activate_tunnel vpn plugin.
+        Activate or deactivate the specified VPN tunnel, or cancel its toggle in flight.
+        The tunnel is brought up or down on a worker thread of the application executor,
+        the other tunnels keep their state and can be toggled meanwhile.
         Args:
             tunnel_name (str): The name of the VPN tunnel to be activated.
-        Raises:
-            NotImplementedError: If the platform is neither Linux nor Windows.
         """
-        global my_vpn_status
-        
         # Handle None or empty tunnel_name safely
         if not tunnel_name:
             print("❌ No tunnel name provided")
             return
-            
-        print(f"vpn status: {my_vpn_status} in activate_tunnel")
+
+        toggle_task = self.toggle_tasks.get(tunnel_name)
+        if toggle_task is not None and not toggle_task.done:
+            print(f"Cancelling the toggle of tunnel {tunnel_name}")
+            toggle_task.cancel()
+            self.show_progress(tunnel_name, "Cancelling")
+            return
+
+        state = tunnel_state.registry.get_state(tunnel_name)
+        my_vpn_status = "Running" if state == RUNNING else "Stopped"
+        print(f"tunnel {tunnel_name} state: {state} in activate_tunnel")
+        self.toggle_tasks[tunnel_name] = self.app.executor.submit(
+            tunnel_name,
+            self.toggle_tunnel,
+            tunnel_name,
+            my_vpn_status,
+            on_progress=lambda task, progress: self.show_progress(task.name, progress),
+            on_finished=self.on_toggle_finished
+        )
+        self.progress_states[tunnel_name] = "Resolving"
+        vpn_state.publish_tunnel(tunnel_name, STOPPING if state == RUNNING else STARTING)
+
+    def toggle_tunnel(self, task, tunnel_name, my_vpn_status):
+        """
+        @brief toggle_tunnel vpn plugin.
+        Bring the tunnel up or down, on a worker thread. Widgets must not be touched here,
+        the steps are reported with task.report and the result is handled by on_toggle_finished.
+        Args:
+            task (Task): The task of the toggle, used to report progress and check cancellation.
+            tunnel_name (str): The name of the VPN tunnel.
+            my_vpn_status (str): The status of the VPN when the toggle was requested.
+        Returns:
+            tuple: (status to publish or None, outcome shown in the VPN screen).
+        Raises:
+            NotImplementedError: If the platform is not supported.
+        """
+        task.report("Resolving")
         interface_name = tunnel_name
         wireguard_folder = get_writable_wireguard_dir()
         config_path = os.path.join(wireguard_folder, f"{tunnel_name}.conf")
-        
         print(f"Using config path: {config_path}")
-
-        # Check if WireGuard is installed
-        is_wg_installed = check_wireguard_installed()
+        if my_vpn_status != "Running":
+            self.select_endpoints(task, tunnel_name, config_path)
+            self.compile_routes(tunnel_name, config_path)
 
         if platform.system() == "Linux":
+            # Check if WireGuard is installed
+            if not check_wireguard_installed():
+                print("Wireguard not installed")
+                return None, "WireGuard is not installed"
             data = self.get_configuration_values(tunnel_name)
             print(f"Activating tunnel: {tunnel_name}")
-            
+
             # Create Key objects
             private = Key(data.get("private_key"))
             srv_key = Key(data.get("public_key"))
-            
+
             client_ip_address = data.get("client_ip_address")
 
             # Check if the interface already exists
-            existing_interfaces = os.popen('wg show interfaces').read().split()
+            existing_interfaces = vpn_state.list_interfaces()
             if interface_name not in existing_interfaces:
                 # Set up the client
                 print(f"Creating interface {interface_name}...")
@@ -562,72 +918,208 @@ class Plugin(BasePlugin):
                 print(f"Interface {interface_name} already exists.")
                 client = Client(interface_name, private, client_ip_address)
                 server_conn = ServerConnection(srv_key, data.get("endpoint"), data.get("port"))
-
-            if is_wg_installed:
-                if "Running" == my_vpn_status:
-                    stop_vpn(config_path)
-                    my_vpn_status = check_service_status(tunnel_name, "10.49.64.53")
-                    self.update_plugin(self.id) 
-                elif "Stopped" == my_vpn_status:
-                    client.set_server(server_conn)
-                    start_vpn(config_path)
-                    my_vpn_status = check_service_status(tunnel_name, "10.49.64.53")
-                    self.update_plugin(self.id) 
-                else:
-                    print("The service status is unknown.")    
-            else:
-                print("Wireguard not installed")
+            task.check_cancelled()
+
+            if "Running" == my_vpn_status:
+                task.report("Bringing down")
+                stop_vpn(config_path)
+                return self.get_toggle_result(tunnel_name, "Stopped")
+            elif "Stopped" == my_vpn_status:
+                task.report("Bringing up")
+                client.set_server(server_conn)
+                start_vpn(config_path)
+                return self.wait_for_handshake(task, tunnel_name, config_path)
+            print("The service status is unknown.")
+            return None, "Unknown status"
         elif platform.system() == "Darwin":
-            data = self.get_configuration_values(tunnel_name)
-            print(f"Activating tunnel: {tunnel_name}")
-
-            if is_wg_installed:
-                # Use system path for WireGuard operations
-                
-                
-                if "Running" == my_vpn_status:
-                    stop_vpn(config_path)
-                    my_vpn_status = check_service_status(tunnel_name, "10.49.64.53")
-                    self.update_plugin(self.id) 
-                elif "Stopped" == my_vpn_status:
-                    start_vpn(config_path)
-                    my_vpn_status = check_service_status(tunnel_name, "10.49.64.53")
-                    self.update_plugin(self.id) 
-                else:
-                    print("The service status is unknown.")    
-            else:
+            # Check if WireGuard is installed
+            if not check_wireguard_installed():
                 print("Wireguard not installed")
-                   
+                return None, "WireGuard is not installed"
+            print(f"Activating tunnel: {tunnel_name}")
+            task.check_cancelled()
+
+            if "Running" == my_vpn_status:
+                task.report("Bringing down")
+                stop_vpn(config_path)
+                return self.get_toggle_result(tunnel_name, "Stopped")
+            elif "Stopped" == my_vpn_status:
+                task.report("Bringing up")
+                start_vpn(config_path)
+                return self.wait_for_handshake(task, tunnel_name, config_path)
+            print("The service status is unknown.")
+            return None, "Unknown status"
         elif platform.system() == "Windows":
-            if is_admin():
-                try:
-                    # Check if the interface already exists
-                    if check_wireguard_interface(tunnel_name):
-                        if my_vpn_status == "Running":
-                            stop_vpn(config_path)
-                            my_vpn_status = check_service_status(tunnel_name, "10.49.64.53")
-                            self.update_plugin(self.id) 
-                        else:
-                            start_vpn(config_path)
-                            my_vpn_status = check_service_status(tunnel_name, "10.49.64.53")
-                            self.update_plugin(self.id) 
-                    else:
-                        install_tunnel(config_path)
-                        self.update_plugin(self.id) 
-                except Exception as e:
-                    print("Error installing VPN service:", e)
-            else:
+            if not is_admin():
                 # Re-run the script with admin privileges
                 ctypes.windll.shell32.ShellExecuteW(None, "runas", sys.executable, __file__, None, 1)
-        else:
-            #if there is no platform
-            
+                return None, "Administrator rights required"
+            # Check if the interface already exists
+            if not check_wireguard_interface(tunnel_name):
+                task.report("Installing")
+                install_tunnel(config_path)
+                return None, "Installed"
+            task.check_cancelled()
+            if my_vpn_status == "Running":
+                task.report("Bringing down")
+                stop_vpn(config_path)
+                return self.get_toggle_result(tunnel_name, "Stopped")
+            task.report("Bringing up")
+            start_vpn(config_path)
+            return self.wait_for_handshake(task, tunnel_name, config_path)
+        raise NotImplementedError("Unsupported platform")
+
+    def select_endpoints(self, task, tunnel_name, config_path):
+        """
+        @brief select_endpoints vpn plugin.
+        Probe the candidate endpoints of the peers of a tunnel before it is brought up, on a
+        worker thread, and write the fastest healthy one in the configuration file.
+        Peers with a single endpoint are not probed.
+        Args:
+            task (Task): The task of the toggle.
+            tunnel_name (str): The name of the VPN tunnel.
+            config_path (str): The path to the configuration file of the tunnel.
+        """
+        config = self.get_tunnel_config(tunnel_name)
+        if config is None or not any(len(peer.candidate_endpoints) > 1 for peer in config.peers):
+            return
+        task.report("Probing endpoints")
+        # The cached configuration is shared with the Tk thread, the endpoints are set on a copy
+        config = config.copy()
+        changed = False
+        for peer, endpoint, results in endpoint_prober.choose_endpoints(config):
+            if endpoint is None:
+                print(f"No endpoint of tunnel {tunnel_name} answered, keeping {peer.endpoint}")
+            elif endpoint != peer.endpoint:
+                print(f"Switching tunnel {tunnel_name} to endpoint {endpoint}")
+                peer.set("Endpoint", endpoint)
+                changed = True
+        task.check_cancelled()
+        if changed:
+            try:
+                wg_config.write_config(config_path, config)
+            except OSError as e:
+                print(f"Error writing the endpoint of tunnel {tunnel_name}: {e}")
 
-            raise NotImplementedError("Unsupported platform")
-            
-        
- 
- 
+    def compile_routes(self, tunnel_name, config_path):
+        """
+        @brief compile_routes vpn plugin.
+        Write the AllowedIPs of the peers with IncludeIPs or ExcludeIPs directives before the
+        tunnel is brought up, for files edited outside of the application.
+        Args:
+            tunnel_name (str): The name of the VPN tunnel.
+            config_path (str): The path to the configuration file of the tunnel.
+        """
+        config = self.get_tunnel_config(tunnel_name)
+        if config is None:
+            return
+        # The cached configuration is shared with the Tk thread, the routes are compiled in a copy
+        config = config.copy()
+        if not route_compiler.compile_config(config):
+            return
+        print(f"Writing the compiled AllowedIPs of tunnel {tunnel_name}")
+        try:
+            wg_config.write_config(config_path, config, compile_routes=False)
+        except OSError as e:
+            print(f"Error writing the routes of tunnel {tunnel_name}: {e}")
+
+    def get_toggle_result(self, tunnel_name, expected_status):
+        """
+        @brief get_toggle_result vpn plugin.
+        Check the status of the tunnel after it has been brought up or down, on a worker thread.
+        Args:
+            tunnel_name (str): The name of the VPN tunnel.
+            expected_status (str): The status expected after the toggle.
+        Returns:
+            tuple: (status to publish, outcome shown in the VPN screen).
+        """
+        status = check_service_status(tunnel_name, TEST_IP)
+        if status != expected_status:
+            return status, "Failed"
+        return status, "Connected" if status == "Running" else "Disconnected"
+
+    def wait_for_handshake(self, task, tunnel_name, config_path, attempts=3, interval=1):
+        """
+        @brief wait_for_handshake vpn plugin.
+        Wait for the tunnel that was just brought up to carry traffic, on a worker thread.
+        If the toggle is cancelled meanwhile, the tunnel is brought down again.
+        Args:
+            task (Task): The task of the toggle.
+            tunnel_name (str): The name of the VPN tunnel.
+            config_path (str): The path to the configuration file of the tunnel.
+            attempts (int): The number of status checks.
+            interval (int): Time to wait between two status checks, in seconds.
+        Returns:
+            tuple: (status to publish, outcome shown in the VPN screen).
+        """
+        try:
+            task.check_cancelled()
+            task.report("Handshaking")
+            for attempt in range(attempts):
+                status, outcome = self.get_toggle_result(tunnel_name, "Running")
+                if status == "Running":
+                    return status, outcome
+                task.wait(interval)
+            return status, outcome
+        except TaskCancelled:
+            # A cancelled activation leaves the tunnel down
+            print(f"Activation of tunnel {tunnel_name} cancelled, bringing it down")
+            stop_vpn(config_path)
+            raise
+
+    def on_toggle_finished(self, task):
+        """
+        @brief on_toggle_finished vpn plugin.
+        Record the new state of the tunnel after a toggle, on the Tk thread.
+        Args:
+            task (Task): The finished task of the toggle.
+        """
+        tunnel_name = task.name
+        self.toggle_tasks.pop(tunnel_name, None)
+        starting = tunnel_state.registry.get_state(tunnel_name) == STARTING
+        if task.is_cancelled():
+            self.progress_states[tunnel_name] = "Cancelled"
+            # A cancelled activation brings the tunnel down, a deactivation may have finished
+            vpn_state.publish_tunnel(tunnel_name, STOPPED if starting else RUNNING, "cancelled")
+            vpn_state.VPNStatusProber(self.app.dispatcher).start()
+        elif task.error is not None:
+            self.progress_states[tunnel_name] = "Failed"
+            vpn_state.publish_tunnel(tunnel_name, FAILED, str(task.error))
+        else:
+            status, outcome = task.result
+            self.progress_states[tunnel_name] = outcome
+            if status is None:
+                # Nothing was changed, e.g. WireGuard is not installed
+                vpn_state.publish_tunnel(tunnel_name, STOPPED if starting else RUNNING, outcome)
+            elif starting and status != "Running":
+                vpn_state.publish_tunnel(tunnel_name, FAILED, outcome)
+            else:
+                vpn_state.publish_tunnel(tunnel_name, RUNNING if status == "Running" else STOPPED, outcome)
 
-  
+    def show_progress(self, tunnel_name, state):
+        """
+        @brief show_progress vpn plugin.
+        Display the progress of the toggle of a tunnel in the VPN screen, on the Tk thread.
+        Args:
+            tunnel_name (str): The name of the tunnel.
+            state (str): The current step, e.g. "Bringing up", or the outcome of the toggle.
+        """
+        self.progress_states[tunnel_name] = state
+        if self.has_tunnel_list() and tunnel_name == self.get_selected_tunnel():
+            self.display_tunnel_status(tunnel_name)
 
+    def get_activate_button_style(self, tunnel_name):
+        """
+        @brief get_activate_button_style vpn plugin.
+        Get the text and color of the activate button, a toggle in flight can be cancelled.
+        Args:
+            tunnel_name (str): The name of the selected tunnel.
+        Returns:
+            dict: The text and fg_color options of the button.
+        """
+        toggle_task = self.toggle_tasks.get(tunnel_name)
+        if toggle_task is not None and not toggle_task.done:
+            return {"text": "Cancel", "fg_color": "gray"}
+        if tunnel_state.registry.get_state(tunnel_name) == RUNNING:
+            return {"text": "Deactivate", "fg_color": "red"}
+        return {"text": "Activate", "fg_color": "green"}
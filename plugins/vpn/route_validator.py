@@ -0,0 +1,262 @@
+"""
+This module finds the AllowedIPs ranges that overlap between tunnels, or with the local
+network. When several tunnels are up, the most specific route wins, so a range of one tunnel
+silently takes over part of the range of another one.
+Two CIDR ranges either do not overlap or one contains the other, so the ranges are sorted by
+first address and prefix length and swept with a stack of the enclosing ranges. The stack is
+at most 33 ranges deep for IPv4 and 129 for IPv6, the sweep is O(n log n) in the number of
+ranges instead of comparing every pair of tunnels.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import ipaddress
+import platform
+
+# Name used for the ranges of the local network
+LAN = "local network"
+
+DUPLICATE = "duplicate"
+SHADOWS = "shadows"
+SHADOWED = "shadowed"
+LAN_CONFLICT = "lan"
+
+
+class Overlap:
+    """
+    An AllowedIPs range of a tunnel that overlaps the ranges of other tunnels.
+    """
+
+    __slots__ = ("kind", "tunnel", "network", "others", "other_network")
+
+    def __init__(self, kind, tunnel, network, others, other_network):
+        """
+        Initialize the Overlap.
+
+        :param kind: DUPLICATE when the others use the same range, SHADOWS when the range of the
+            tunnel is inside the range of the others and takes over that part of it, SHADOWED when
+            ranges of the others inside the range of the tunnel take over parts of it, LAN_CONFLICT
+            when the range of the tunnel takes over the local network.
+        :param tunnel: The name of the tunnel.
+        :param network: The range of the tunnel, an ipaddress network.
+        :param others: The sorted list of the names of the other tunnels.
+        :param other_network: The range of the other tunnels, None for SHADOWED.
+        """
+        self.kind = kind
+        self.tunnel = tunnel
+        self.network = network
+        self.others = others
+        self.other_network = other_network
+
+    def describe(self, max_names=3):
+        """
+        :param max_names: The maximum number of other tunnels named.
+        :return: A sentence describing the overlap.
+        """
+        names = ", ".join(self.others[:max_names])
+        if len(self.others) > max_names:
+            names += f" and {len(self.others) - max_names} more"
+        if self.kind == DUPLICATE:
+            return f"{self.tunnel}: {self.network} is also routed by {names}"
+        if self.kind == SHADOWED:
+            return f"{self.tunnel}: parts of {self.network} are taken over by {names}"
+        if self.kind == LAN_CONFLICT:
+            return f"{self.tunnel}: {self.network} takes over the {LAN} {self.other_network}"
+        return f"{self.tunnel}: {self.network} takes over part of {self.other_network} of {names}"
+
+    def __repr__(self):
+        return f"Overlap({self.describe()})"
+
+
+def parse_networks(values):
+    """
+    Parse a list of CIDR ranges, ignoring the invalid ones.
+
+    :param values: The list of ranges, e.g. ["10.0.0.0/8", "fd00::/64"].
+    :return: The list of ipaddress networks.
+    """
+    networks = []
+    for value in values:
+        try:
+            networks.append(ipaddress.ip_network(value, strict=False))
+        except ValueError:
+            print(f"Ignoring invalid AllowedIPs range: {value}")
+    return networks
+
+
+def get_config_networks(config):
+    """
+    :param config: The WireGuardConfig of a tunnel.
+    :return: The set of ipaddress networks routed by the peers of the tunnel.
+    """
+    return {network for peer in config.peers for network in parse_networks(peer.allowed_ips)}
+
+
+def is_wireguard_interface(name):
+    """
+    :param name: The name of a network interface.
+    :return: True if it is a WireGuard interface, from its device type in sysfs.
+    """
+    try:
+        with open(f"/sys/class/net/{name}/uevent") as uevent_file:
+            return "DEVTYPE=wireguard" in uevent_file.read().split()
+    except OSError:
+        return False
+
+
+def get_lan_networks(tunnel_names=()):
+    """
+    Get the networks directly connected to the local interfaces, from the Linux routing table.
+    The routes of the tunnels also have no gateway, the WireGuard interfaces are skipped.
+
+    :param tunnel_names: The names of the tunnels, their interfaces are skipped as well.
+    :return: The set of ipaddress networks, empty on other systems.
+    """
+    networks = set()
+    if platform.system() != "Linux":
+        return networks
+    skipped = {}
+    try:
+        with open("/proc/net/route") as route_file:
+            next(route_file)
+            for line in route_file:
+                fields = line.split()
+                # Destination, gateway and mask are little-endian hexadecimal
+                if len(fields) < 8 or int(fields[2], 16) != 0 or int(fields[7], 16) == 0:
+                    continue
+                name = fields[0]
+                if name not in skipped:
+                    skipped[name] = name in tunnel_names or is_wireguard_interface(name)
+                if skipped[name]:
+                    continue
+                address = ipaddress.IPv4Address(int(fields[1], 16).to_bytes(4, "little"))
+                mask = ipaddress.IPv4Address(int(fields[7], 16).to_bytes(4, "little"))
+                networks.add(ipaddress.IPv4Network(f"{address}/{mask}", strict=False))
+    except (OSError, ValueError, StopIteration):
+        pass
+    return networks
+
+
+class RouteIndex:
+    """
+    The AllowedIPs ranges of every tunnel, sorted for the sweep.
+    """
+
+    def __init__(self, tunnels=None, lan_networks=None):
+        """
+        Initialize the RouteIndex.
+
+        :param tunnels: A dictionary of sets of ipaddress networks by tunnel name.
+        :param lan_networks: The networks of the local network.
+        """
+        self.owners = {}
+        self.tunnels = {}
+        for tunnel, networks in (tunnels or {}).items():
+            self.set_tunnel(tunnel, networks)
+        for network in lan_networks or ():
+            self.owners.setdefault(network, set()).add(LAN)
+
+    def set_tunnel(self, tunnel, networks):
+        """
+        Replace the ranges of a tunnel.
+
+        :param tunnel: The name of the tunnel.
+        :param networks: The ipaddress networks of the tunnel.
+        """
+        self.remove_tunnel(tunnel)
+        self.tunnels[tunnel] = set(networks)
+        for network in self.tunnels[tunnel]:
+            self.owners.setdefault(network, set()).add(tunnel)
+
+    def remove_tunnel(self, tunnel):
+        """
+        :param tunnel: The name of the tunnel to forget.
+        """
+        for network in self.tunnels.pop(tunnel, ()):
+            self.owners[network].discard(tunnel)
+            if not self.owners[network]:
+                del self.owners[network]
+
+    def sweep(self):
+        """
+        Visit every range with the ranges that contain it.
+
+        :return: A generator of tuples (network, list of enclosing networks, the nearest last).
+        """
+        for version in (4, 6):
+            networks = sorted(
+                (network for network in self.owners if network.version == version),
+                key=lambda network: (int(network.network_address), network.prefixlen)
+            )
+            stack = []
+            for network in networks:
+                while stack and int(stack[-1].broadcast_address) < int(network.network_address):
+                    stack.pop()
+                yield network, stack
+                stack.append(network)
+
+    def find_overlaps(self, tunnel=None):
+        """
+        Find the ranges that overlap between tunnels.
+
+        :param tunnel: Only report the ranges of this tunnel, None for every tunnel.
+        :return: The list of Overlap.
+        """
+        overlaps = []
+        shadowed = {}
+        for network, enclosing in self.sweep():
+            owners = self.owners[network]
+            subjects = sorted(owners - {LAN}) if tunnel is None else ([tunnel] if tunnel in owners else [])
+            for subject in subjects:
+                others = sorted(owners - {subject, LAN})
+                # A duplicate is reported once, by its first tunnel, when every tunnel is checked
+                if others and (tunnel is not None or subject == min(owners - {LAN})):
+                    overlaps.append(Overlap(DUPLICATE, subject, network, others, network))
+                if LAN in owners:
+                    overlaps.append(Overlap(LAN_CONFLICT, subject, network, [LAN], network))
+                for parent in reversed(enclosing):
+                    parent_owners = self.owners[parent]
+                    if LAN in parent_owners:
+                        overlaps.append(Overlap(LAN_CONFLICT, subject, network, [LAN], parent))
+                    others = sorted(parent_owners - {subject, LAN})
+                    if others:
+                        overlaps.append(Overlap(SHADOWS, subject, network, others, parent))
+            if tunnel is not None and tunnel not in owners:
+                # Ranges of other tunnels inside a range of the tunnel take over part of it,
+                # they are reported once for each range of the tunnel
+                for parent in enclosing:
+                    if tunnel in self.owners[parent]:
+                        shadowed.setdefault(parent, set()).update(owners - {LAN})
+        for parent, others in shadowed.items():
+            if others:
+                overlaps.append(Overlap(SHADOWED, tunnel, parent, sorted(others), None))
+        return overlaps
+
+
+def build_index(configs, include_lan=True, tunnel_names=()):
+    """
+    Build the index of the ranges of several tunnels.
+
+    :param configs: A dictionary of WireGuardConfig by tunnel name.
+    :param include_lan: True to add the networks of the local network.
+    :param tunnel_names: The names of other tunnels, whose routes are not part of the local network.
+    :return: The RouteIndex.
+    """
+    tunnels = {name: get_config_networks(config) for name, config in configs.items()}
+    lan_networks = get_lan_networks(set(configs) | set(tunnel_names)) if include_lan else None
+    return RouteIndex(tunnels, lan_networks)
+
+
+def check_tunnel(tunnel, config, configs, include_lan=True):
+    """
+    Find the overlaps of a tunnel that is added or edited with the other tunnels.
+
+    :param tunnel: The name of the tunnel.
+    :param config: The new WireGuardConfig of the tunnel.
+    :param configs: A dictionary of the WireGuardConfig of the other tunnels by name.
+    :param include_lan: True to also check the local network.
+    :return: The list of Overlap involving the tunnel.
+    """
+    index = build_index({name: other for name, other in configs.items() if name != tunnel}, include_lan, (tunnel,))
+    index.set_tunnel(tunnel, get_config_networks(config))
+    return index.find_overlaps(tunnel)
@@ -0,0 +1,246 @@
+"""
+This module samples the traffic counters and the latest handshake of the running WireGuard
+tunnels at a fixed interval, for the live graph of the VPN screen. The samples of each tunnel
+are kept in fixed-size ring buffers backed by arrays, so the memory used does not grow with
+the uptime and recording a sample costs the same whatever the length of the history.
+The interval and the number of samples kept can be changed with RESISTINE_VPN_TELEMETRY_INTERVAL
+and RESISTINE_VPN_TELEMETRY_HISTORY.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import operator
+import os
+import threading
+import time
+from array import array
+from plugins.vpn import tunnel_state
+from plugins.vpn.wireguard import wg_status
+
+try:
+    SAMPLE_INTERVAL = float(os.environ.get("RESISTINE_VPN_TELEMETRY_INTERVAL", "2.0"))
+except ValueError:
+    SAMPLE_INTERVAL = 2.0
+try:
+    HISTORY_SIZE = max(2, int(os.environ.get("RESISTINE_VPN_TELEMETRY_HISTORY", "120")))
+except ValueError:
+    HISTORY_SIZE = 120
+# Longest time in seconds between two attempts after repeated failures, e.g. when wg needs a password
+MAX_BACKOFF = 300.0
+
+
+class RingBuffer:
+    """
+    Fixed-size buffer of floats, the oldest value is overwritten once it is full.
+    """
+
+    __slots__ = ("data", "head", "count")
+
+    def __init__(self, capacity):
+        """
+        Initialize the empty RingBuffer.
+
+        :param capacity: The maximum number of values kept.
+        """
+        self.data = array("d", [0.0]) * capacity
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        """
+        Add a value, replacing the oldest one if the buffer is full.
+
+        :param value: The value.
+        """
+        self.data[self.head] = value
+        self.head = (self.head + 1) % len(self.data)
+        if self.count < len(self.data):
+            self.count += 1
+
+    def last(self, default=None):
+        """
+        :param default: The value returned when the buffer is empty.
+        :return: The most recent value.
+        """
+        if not self.count:
+            return default
+        return self.data[self.head - 1]
+
+    def values(self):
+        """
+        :return: An array of the values, from the oldest to the most recent.
+        """
+        if self.count < len(self.data):
+            return self.data[:self.count]
+        return self.data[self.head:] + self.data[:self.head]
+
+
+def get_rates(times, counters):
+    """
+    Compute the rate of a counter between consecutive samples. A counter that went
+    backwards, e.g. because the tunnel was brought down and up again, counts as no traffic.
+
+    :param times: The array of sample times in seconds.
+    :param counters: The array of counter values at these times.
+    :return: An array of rates in units per second, one less than the number of samples.
+    """
+    deltas = map(operator.sub, counters[1:], counters[:-1])
+    durations = map(operator.sub, times[1:], times[:-1])
+    return array("d", (delta / duration if delta > 0 and duration > 0 else 0.0 for delta, duration in zip(deltas, durations)))
+
+
+class TunnelHistory:
+    """
+    Recent samples of one tunnel.
+    """
+
+    __slots__ = ("times", "rx_bytes", "tx_bytes", "handshakes")
+
+    def __init__(self, capacity=HISTORY_SIZE):
+        """
+        Initialize the empty TunnelHistory.
+
+        :param capacity: The number of samples kept.
+        """
+        self.times = RingBuffer(capacity)
+        self.rx_bytes = RingBuffer(capacity)
+        self.tx_bytes = RingBuffer(capacity)
+        self.handshakes = RingBuffer(capacity)
+
+    def add(self, sample_time, rx_bytes, tx_bytes, latest_handshake):
+        """
+        Record a sample.
+
+        :param sample_time: The UNIX time of the sample.
+        :param rx_bytes: The number of bytes received by the tunnel.
+        :param tx_bytes: The number of bytes sent by the tunnel.
+        :param latest_handshake: The UNIX time of the latest handshake, 0 if there was none.
+        """
+        self.times.append(sample_time)
+        self.rx_bytes.append(rx_bytes)
+        self.tx_bytes.append(tx_bytes)
+        self.handshakes.append(latest_handshake)
+
+    def rates(self):
+        """
+        :return: A tuple (rx rates, tx rates) of arrays in bytes per second.
+        """
+        times = self.times.values()
+        return get_rates(times, self.rx_bytes.values()), get_rates(times, self.tx_bytes.values())
+
+    def handshake_age(self, now=None):
+        """
+        :param now: The current UNIX time, defaults to time.time().
+        :return: The number of seconds since the latest handshake, or None if there was none.
+        """
+        latest_handshake = self.handshakes.last(0.0)
+        if not latest_handshake:
+            return None
+        return max(0.0, (now if now is not None else time.time()) - latest_handshake)
+
+
+class TelemetrySampler(threading.Thread):
+    """
+    Background thread that samples the running tunnels and notifies the listeners on the Tk thread.
+    """
+
+    def __init__(self, dispatcher, interval=SAMPLE_INTERVAL, capacity=HISTORY_SIZE, command_prefix=None, reader=None):
+        """
+        Initialize the TelemetrySampler.
+
+        :param dispatcher: The TkDispatcher used to notify the listeners on the Tk thread.
+        :param interval: Time in seconds between two samples.
+        :param capacity: The number of samples kept for each tunnel.
+        :param command_prefix: Arguments placed before the wg command, e.g. ["sudo", "-n"].
+        :param reader: A function returning the output of `wg show all dump`, used instead of running wg.
+        """
+        super().__init__(name="vpn-telemetry", daemon=True)
+        self.dispatcher = dispatcher
+        self.interval = interval
+        self.capacity = capacity
+        self.command_prefix = command_prefix
+        self.reader = reader
+        self.histories = {}
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def add_listener(self, listener):
+        """
+        Register a function called as listener(tunnel_names) on the Tk thread after each sample.
+
+        :param listener: The function to call.
+        """
+        self.listeners.append(listener)
+
+    def notify(self, tunnel_names):
+        """
+        Call the listeners, a listener that raises an exception is removed.
+
+        :param tunnel_names: The names of the sampled tunnels.
+        """
+        for listener in list(self.listeners):
+            try:
+                listener(tunnel_names)
+            except Exception as e:
+                print(f"Removing telemetry listener: {e}")
+                self.listeners.remove(listener)
+
+    def get_history(self, tunnel_name):
+        """
+        :param tunnel_name: The name of the tunnel.
+        :return: A tuple (rx rates, tx rates, handshake age) for the tunnel, None if it was never sampled.
+        """
+        with self.lock:
+            history = self.histories.get(tunnel_name)
+            if history is None:
+                return None
+            rx_rates, tx_rates = history.rates()
+            return rx_rates, tx_rates, history.handshake_age()
+
+    def sample(self):
+        """
+        Record one sample of every running tunnel, with a single wg invocation.
+
+        :return: The names of the sampled tunnels.
+        """
+        table = wg_status.collect_status(self.command_prefix, self.reader)
+        with self.lock:
+            for name in table.names():
+                interface = table.get(name)
+                history = self.histories.get(name)
+                if history is None:
+                    history = self.histories[name] = TunnelHistory(self.capacity)
+                peer = interface.latest_peer()
+                history.add(table.collected_at, interface.rx_bytes(), interface.tx_bytes(), peer.latest_handshake if peer else 0)
+        return table.names()
+
+    def stop(self):
+        """
+        Stop sampling, the thread exits within one interval.
+        """
+        self.stop_event.set()
+
+    def run(self):
+        """
+        Sample the tunnels at each interval while at least one of them is running.
+        After a failure the time until the next attempt doubles up to MAX_BACKOFF, so that a
+        command refused for lack of privileges is not run again at every interval.
+        """
+        delay = self.interval
+        while not self.stop_event.wait(delay):
+            if not tunnel_state.registry.running:
+                delay = self.interval
+                continue
+            try:
+                tunnel_names = self.sample()
+            except Exception as e:
+                if delay == self.interval:
+                    print(f"Error sampling VPN telemetry, retrying less often: {e}")
+                delay = min(delay * 2, max(MAX_BACKOFF, self.interval))
+                continue
+            delay = self.interval
+            self.dispatcher.post(self.notify, tunnel_names)
@@ -0,0 +1,139 @@
+"""
+This module keeps the sorted list of the tunnels of the WireGuard configuration directory.
+The directory is listed once, then the index is updated from the changes reported by a
+DirWatcher, and the listeners receive added, modified and removed deltas on the Tk thread,
+so configurations dropped into the folder by other tools appear without a rescan.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import bisect
+import os
+from utils import dir_watcher
+
+CONF_SUFFIX = ".conf"
+
+
+class TunnelIndex:
+    """
+    Sorted in-memory list of the tunnel names of a configuration directory.
+    """
+
+    def __init__(self, directory):
+        """
+        Initialize the TunnelIndex and list the directory.
+
+        :param directory: The WireGuard configuration directory.
+        """
+        self.directory = directory
+        self.names = sorted(self.list_directory())
+        self.listeners = []
+        self.watcher = None
+
+    def list_directory(self):
+        """
+        :return: The tunnel names of the configuration files of the directory.
+        """
+        return [name[:-len(CONF_SUFFIX)] for name in dir_watcher.scan_directory(self.directory, CONF_SUFFIX)]
+
+    def get_path(self, tunnel_name):
+        """
+        :param tunnel_name: The name of the tunnel.
+        :return: The path to the configuration file of the tunnel.
+        """
+        return os.path.join(self.directory, f"{tunnel_name}{CONF_SUFFIX}")
+
+    def add_listener(self, listener):
+        """
+        Register a function called as listener(event, tunnel_name, position) on the Tk thread,
+        event is "added", "modified" or "removed" and position the index of the tunnel in the
+        sorted list (its former index for "removed").
+
+        :param listener: The function to call.
+        """
+        self.listeners.append(listener)
+
+    def notify(self, event, tunnel_name, position):
+        """
+        Call the listeners, a listener that raises an exception is removed.
+
+        :param event: The event.
+        :param tunnel_name: The name of the tunnel.
+        :param position: The index of the tunnel in the sorted list.
+        """
+        for listener in list(self.listeners):
+            try:
+                listener(event, tunnel_name, position)
+            except Exception as e:
+                print(f"Removing tunnel index listener: {e}")
+                self.listeners.remove(listener)
+
+    def add(self, tunnel_name):
+        """
+        Add a tunnel, or report it as modified if it is already indexed.
+
+        :param tunnel_name: The name of the tunnel.
+        """
+        position = bisect.bisect_left(self.names, tunnel_name)
+        if position < len(self.names) and self.names[position] == tunnel_name:
+            self.notify(dir_watcher.MODIFIED, tunnel_name, position)
+            return
+        self.names.insert(position, tunnel_name)
+        self.notify(dir_watcher.ADDED, tunnel_name, position)
+
+    def remove(self, tunnel_name):
+        """
+        Remove a tunnel if it is indexed.
+
+        :param tunnel_name: The name of the tunnel.
+        """
+        position = bisect.bisect_left(self.names, tunnel_name)
+        if position < len(self.names) and self.names[position] == tunnel_name:
+            del self.names[position]
+            self.notify(dir_watcher.REMOVED, tunnel_name, position)
+
+    def rescan(self):
+        """
+        List the directory again and report the differences, after changes may have been missed.
+        """
+        current = set(self.list_directory())
+        for tunnel_name in set(self.names) - current:
+            self.remove(tunnel_name)
+        for tunnel_name in sorted(current - set(self.names)):
+            self.add(tunnel_name)
+
+    def apply(self, event, file_name):
+        """
+        Apply a change reported by the directory watcher, on the Tk thread.
+
+        :param event: The dir_watcher event.
+        :param file_name: The name of the changed file, None for a rescan.
+        """
+        if event == dir_watcher.RESCAN:
+            self.rescan()
+        elif event == dir_watcher.REMOVED:
+            self.remove(file_name[:-len(CONF_SUFFIX)])
+        else:
+            self.add(file_name[:-len(CONF_SUFFIX)])
+
+    def start(self, dispatcher):
+        """
+        Start watching the directory, the changes are applied on the Tk thread.
+
+        :param dispatcher: The TkDispatcher of the application.
+        """
+        if self.watcher is None:
+            self.watcher = dir_watcher.DirWatcher(
+                self.directory,
+                lambda event, file_name: dispatcher.post(self.apply, event, file_name),
+                suffix=CONF_SUFFIX
+            )
+            self.watcher.start()
+
+    def stop(self):
+        """
+        Stop watching the directory.
+        """
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
@@ -0,0 +1,184 @@
+"""
+This module tracks the state of every WireGuard tunnel separately, so several tunnels can be
+up at the same time. Each tunnel has a small state machine (Stopped, Starting, Running,
+Stopping, Failed) kept in a registry keyed by interface name. The registry also keeps the
+set of running tunnels up to date, so no lookup has to go through every configured profile.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import time
+
+STOPPED = "Stopped"
+STARTING = "Starting"
+RUNNING = "Running"
+STOPPING = "Stopping"
+FAILED = "Failed"
+
+# Allowed transitions, a probe may also report the observed state at any time
+TRANSITIONS = {
+    STOPPED: {STARTING, RUNNING},
+    STARTING: {RUNNING, FAILED, STOPPED},
+    RUNNING: {STOPPING, STOPPED, FAILED},
+    STOPPING: {STOPPED, FAILED, RUNNING},
+    FAILED: {STARTING, STOPPED, RUNNING},
+}
+
+
+class InvalidTransition(ValueError):
+    """
+    Raised when a tunnel is asked to move to a state that cannot follow its current state.
+    """
+
+
+class TunnelStateMachine:
+    """
+    State of one tunnel.
+    """
+
+    __slots__ = ("name", "state", "reason", "changed_at")
+
+    def __init__(self, name, state=STOPPED):
+        """
+        Initialize the TunnelStateMachine.
+
+        :param name: The name of the tunnel interface.
+        :param state: The initial state.
+        """
+        self.name = name
+        self.state = state
+        self.reason = None
+        self.changed_at = time.time()
+
+    def can_transition(self, state):
+        """
+        :param state: The requested state.
+        :return: True if the tunnel can move to the state, False otherwise.
+        """
+        return state == self.state or state in TRANSITIONS[self.state]
+
+    def transition(self, state, reason=None):
+        """
+        Move the tunnel to a new state.
+
+        :param state: The new state.
+        :param reason: A short explanation, e.g. the reason code of a failed health check.
+        :return: True if the state changed, False if the tunnel already was in this state.
+        :raises InvalidTransition: If the state cannot follow the current state.
+        """
+        if not self.can_transition(state):
+            raise InvalidTransition(f"Tunnel {self.name} cannot go from {self.state} to {state}")
+        changed = state != self.state
+        self.state = state
+        self.reason = reason
+        if changed:
+            self.changed_at = time.time()
+        return changed
+
+    def is_busy(self):
+        """
+        :return: True while the tunnel is being brought up or down, False otherwise.
+        """
+        return self.state in (STARTING, STOPPING)
+
+
+class TunnelRegistry:
+    """
+    State machines of every known tunnel, keyed by interface name. Must be used on the Tk thread.
+    """
+
+    def __init__(self):
+        """
+        Initialize the empty TunnelRegistry.
+        """
+        self.tunnels = {}
+        self.running = set()
+        self.listeners = []
+
+    def get(self, name):
+        """
+        Get the state machine of a tunnel, created in the Stopped state on first use.
+
+        :param name: The name of the tunnel.
+        :return: The TunnelStateMachine.
+        """
+        machine = self.tunnels.get(name)
+        if machine is None:
+            machine = self.tunnels[name] = TunnelStateMachine(name)
+        return machine
+
+    def get_state(self, name):
+        """
+        :param name: The name of the tunnel.
+        :return: The state of the tunnel, Stopped for an unknown tunnel.
+        """
+        machine = self.tunnels.get(name)
+        return machine.state if machine is not None else STOPPED
+
+    def add_listener(self, listener):
+        """
+        Register a function called as listener(machine) every time a tunnel changes state.
+
+        :param listener: The function to call.
+        """
+        self.listeners.append(listener)
+
+    def transition(self, name, state, reason=None):
+        """
+        Move a tunnel to a new state and notify the listeners.
+
+        :param name: The name of the tunnel.
+        :param state: The new state.
+        :param reason: A short explanation of the change.
+        :return: The TunnelStateMachine.
+        :raises InvalidTransition: If the state cannot follow the current state.
+        """
+        machine = self.get(name)
+        if machine.transition(state, reason):
+            if state == RUNNING:
+                self.running.add(name)
+            else:
+                self.running.discard(name)
+            for listener in list(self.listeners):
+                try:
+                    listener(machine)
+                except Exception as e:
+                    print(f"Removing tunnel state listener: {e}")
+                    self.listeners.remove(listener)
+        return machine
+
+    def observe(self, name, status, reason=None):
+        """
+        Record the status reported by a probe, "Running" or "Stopped".
+        A tunnel being brought up or down keeps its state, the toggle decides the outcome.
+
+        :param name: The name of the tunnel.
+        :param status: The observed status.
+        :param reason: The reason code of the probe.
+        """
+        machine = self.get(name)
+        if machine.is_busy():
+            return
+        self.transition(name, RUNNING if status == RUNNING else STOPPED, reason)
+
+    def sync(self, statuses):
+        """
+        Record the result of a probe of every tunnel. The tunnels that were running and are
+        missing from the result are marked as stopped, the others are not visited.
+
+        :param statuses: A dictionary of observed status by interface name.
+        """
+        for name in self.running - statuses.keys():
+            self.observe(name, STOPPED)
+        for name, status in statuses.items():
+            if status == RUNNING or name in self.tunnels:
+                self.observe(name, status)
+
+    def running_tunnels(self):
+        """
+        :return: The sorted list of the running tunnels.
+        """
+        return sorted(self.running)
+
+
+registry = TunnelRegistry()
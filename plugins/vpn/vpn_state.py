@@ -0,0 +1,201 @@
+"""
+This module holds the VPN state shared by the VPN plugin and the dashboard.
+The state of each tunnel is kept in the tunnel registry, my_vpn_status summarizes it:
+the VPN is "Running" while at least one tunnel is running.
+The state is probed by a background thread started once the main window is shown,
+so that importing the VPN plugin never runs a subprocess. Until the first probe finishes,
+the last known state saved in the status snapshot is displayed.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import os
+import platform
+import subprocess
+import threading
+from plugins.vpn import tunnel_state
+from utils.command_runner import runner
+
+# Host, or "host:port", probed when no recent handshake proves that the tunnel carries traffic
+TEST_IP = os.environ.get("RESISTINE_VPN_PROBE_TARGET", "10.49.64.53")
+
+my_vpn_status = "Stopped"
+active_client_name = None
+status_known = False
+status_restored = False
+_listeners = []
+
+
+def load_backend():
+    """
+    Import the WireGuard functions of the current platform.
+
+    :return: The backend module for the current platform.
+    :raises NotImplementedError: If the platform is not supported.
+    """
+    system = platform.system()
+    if system == "Windows":
+        from plugins.vpn.wireguard import vpn_functions_windows as backend
+    elif system == "Linux":
+        from plugins.vpn.wireguard import vpn_functions_linux as backend
+    elif system == "Darwin":
+        from plugins.vpn.wireguard import vpn_functions_darwin as backend
+    else:
+        raise NotImplementedError("Unsupported platform")
+    return backend
+
+
+def list_interfaces():
+    """
+    List the WireGuard interfaces that currently exist on the system.
+
+    :return: A list of interface names.
+    """
+    if platform.system() == "Windows":
+        return runner.run(['wg', 'show', 'interfaces'], read_only=True, check=True).stdout.split()
+    try:
+        return runner.run(['wg', 'show', 'interfaces'], read_only=True).stdout.split()
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+
+
+def probe_tunnels(test_ip=TEST_IP):
+    """
+    Probe the status of every WireGuard interface. This runs subprocesses and may take
+    several seconds, it must not be called from the Tk thread.
+
+    :param test_ip: The IP address to probe for testing connectivity.
+    :return: A dictionary of status ("Running" or "Stopped") by interface name.
+    """
+    backend = load_backend()
+    if hasattr(backend, "collect_status"):
+        # One wg invocation for every tunnel
+        results = backend.collect_status(test_ip)
+        for interface, result in results.items():
+            print(f"WireGuard interface {interface}: {result.status} ({result.reason})")
+        return {interface: result.status for interface, result in results.items()}
+    return {interface: backend.check_service_status(interface, test_ip) for interface in list_interfaces()}
+
+
+def add_listener(listener):
+    """
+    Register a function called as listener(active_client_name, status) on the Tk thread
+    every time the VPN state is published.
+
+    :param listener: The function to call.
+    """
+    _listeners.append(listener)
+
+
+def restore(client_name, status):
+    """
+    Display a last known VPN state until the first probe publishes the current one.
+    The state stays unknown, so the VPN screen shows it as being checked.
+
+    :param client_name: The name of the interface that was active, or None.
+    :param status: The last known status of the VPN ("Running" or "Stopped").
+    """
+    global my_vpn_status, active_client_name, status_restored
+    if status_known:
+        return
+    status_restored = True
+    my_vpn_status = status
+    active_client_name = client_name if status == "Running" else None
+    if active_client_name:
+        tunnel_state.registry.transition(active_client_name, tunnel_state.RUNNING, "restored")
+
+
+def publish_tunnels(statuses):
+    """
+    Record the probed status of every tunnel and publish the VPN state. Must be called on the Tk thread.
+
+    :param statuses: A dictionary of status by interface name, the interfaces that are not
+        listed are not running.
+    """
+    tunnel_state.registry.sync(statuses)
+    publish_summary()
+
+
+def publish_tunnel(tunnel_name, state, reason=None):
+    """
+    Record the new state of one tunnel and publish the VPN state. Must be called on the Tk thread.
+
+    :param tunnel_name: The name of the tunnel.
+    :param state: The new state of the tunnel, see plugins/vpn/tunnel_state.py.
+    :param reason: A short explanation of the change.
+    """
+    tunnel_state.registry.transition(tunnel_name, state, reason)
+    publish_summary()
+
+
+def publish_summary():
+    """
+    Publish the VPN state summarized from the tunnel registry.
+    """
+    running = tunnel_state.registry.running_tunnels()
+    publish(running[0] if running else None, "Running" if running else "Stopped")
+
+
+def publish(client_name, status):
+    """
+    Update the VPN state and notify the listeners. Must be called on the Tk thread.
+
+    :param client_name: The name of the active interface, or None.
+    :param status: The status of the VPN ("Running" or "Stopped").
+    """
+    global my_vpn_status, active_client_name, status_known
+    my_vpn_status = status
+    active_client_name = client_name if status == "Running" else None
+    status_known = True
+    print(f"VPN Status published: {my_vpn_status}")
+    for listener in list(_listeners):
+        try:
+            listener(active_client_name, my_vpn_status)
+        except Exception as e:
+            print(f"Removing VPN state listener: {e}")
+            _listeners.remove(listener)
+
+
+class VPNStatusProber(threading.Thread):
+    """
+    Background thread that probes the VPN state and publishes it on the Tk thread.
+    """
+
+    def __init__(self, dispatcher, test_ip=TEST_IP):
+        """
+        Initialize the prober.
+
+        :param dispatcher: The TkDispatcher used to publish results on the Tk thread.
+        :param test_ip: The IP address to ping for testing connectivity.
+        """
+        super().__init__(name="vpn-status-prober", daemon=True)
+        self.dispatcher = dispatcher
+        self.test_ip = test_ip
+
+    def run(self):
+        """
+        Probe the VPN state and post the result to the Tk thread.
+        """
+        try:
+            statuses = probe_tunnels(self.test_ip)
+        except Exception as e:
+            print(f"Error probing VPN status: {e}")
+            statuses = {}
+        self.dispatcher.post(publish_tunnels, statuses)
+
+
+def start(app, plugin):
+    """
+    Start probing the VPN state in the background and reflect it on the plugin status.
+
+    :param app: The main application, providing the dispatcher.
+    :param plugin: The VPN plugin shown in the navigation bar and the dashboard.
+    """
+    snapshot = getattr(app, "status_snapshot", None)
+    if snapshot is not None:
+        saved_state = snapshot.get_value("vpn")
+        if isinstance(saved_state, dict) and saved_state.get("status") in ("Running", "Stopped"):
+            restore(saved_state.get("client"), saved_state["status"])
+        add_listener(lambda client_name, status: snapshot.set_value("vpn", {"client": client_name, "status": status}))
+    add_listener(lambda client_name, status: plugin.set_status("Ok" if status == "Running" else "Warning"))
+    VPNStatusProber(app.dispatcher).start()
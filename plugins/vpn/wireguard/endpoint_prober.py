@@ -0,0 +1,340 @@
+"""
+WireGuard endpoint selection
+----------------------------
+A [Peer] section can list several servers it can be reached at with a directive comment,
+e.g. "#@ Endpoints = vpn1.example.com:51820, vpn2.example.com:51820". Before a tunnel is
+brought up, every candidate is probed concurrently with asyncio and the healthy one with
+the lowest round trip becomes the Endpoint of the peer.
+By default a candidate is probed with a WireGuard handshake initiation over UDP and is healthy
+when the server answers it. "#@ EndpointProbe = tcp" probes a TCP connection to the same port
+instead, for servers that answer it. The choice is cached for RESISTINE_VPN_ENDPOINT_TTL seconds
+so toggling a tunnel repeatedly does not probe again, and each probe waits at most
+RESISTINE_VPN_ENDPOINT_TIMEOUT seconds.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import asyncio
+import os
+import socket
+import struct
+import threading
+import time
+from plugins.vpn.wireguard import wg_config
+from plugins.vpn.wireguard import wg_handshake
+
+try:
+    PROBE_TIMEOUT = float(os.environ.get("RESISTINE_VPN_ENDPOINT_TIMEOUT", "1.0"))
+except ValueError:
+    PROBE_TIMEOUT = 1.0
+try:
+    CACHE_TTL = float(os.environ.get("RESISTINE_VPN_ENDPOINT_TTL", "300"))
+except ValueError:
+    CACHE_TTL = 300.0
+
+MODE_UDP = "udp"
+MODE_TCP = "tcp"
+
+
+class ProbeResult:
+    """
+    Result of the probe of one candidate endpoint.
+    """
+
+    __slots__ = ("endpoint", "latency", "error")
+
+    def __init__(self, endpoint, latency=None, error=None):
+        """
+        Initialize the ProbeResult.
+
+        :param endpoint: The endpoint "host:port".
+        :param latency: The round trip in seconds, None if the endpoint did not answer.
+        :param error: A short description of the failure, or None.
+        """
+        self.endpoint = endpoint
+        self.latency = latency
+        self.error = error
+
+    @property
+    def healthy(self):
+        return self.latency is not None
+
+    def __repr__(self):
+        if self.healthy:
+            return f"ProbeResult({self.endpoint}, {self.latency * 1000:.1f} ms)"
+        return f"ProbeResult({self.endpoint}, {self.error})"
+
+
+class ReplyProtocol(asyncio.DatagramProtocol):
+    """
+    Datagram protocol completing a future with the first datagram accepted by a check.
+    """
+
+    def __init__(self, future, check_reply=None):
+        """
+        Initialize the ReplyProtocol.
+
+        :param future: The future set to the arrival time of the reply.
+        :param check_reply: The function called as check_reply(data), None to accept any datagram.
+        """
+        self.future = future
+        self.check_reply = check_reply
+
+    def datagram_received(self, data, address):
+        if not self.future.done() and (self.check_reply is None or self.check_reply(data)):
+            self.future.set_result(time.perf_counter())
+
+    def error_received(self, exc):
+        # An ICMP port unreachable is reported as ConnectionRefusedError
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+async def resolve(host, port, socket_type):
+    """
+    Resolve an endpoint without blocking the event loop.
+
+    :param host: The host name or IP address.
+    :param port: The port.
+    :param socket_type: socket.SOCK_DGRAM or socket.SOCK_STREAM.
+    :return: The socket address of the first result.
+    :raises OSError: If the host cannot be resolved.
+    :raises ValueError: If the host name is not valid, e.g. UnicodeError for a label too long.
+    """
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket_type)
+    return infos[0][4]
+
+
+async def probe_udp(endpoint, payload, check_reply=None, timeout=PROBE_TIMEOUT):
+    """
+    Send a datagram to an endpoint and measure the time until it is answered.
+
+    :param endpoint: The endpoint "host:port".
+    :param payload: The bytes to send.
+    :param check_reply: The function called as check_reply(data) to accept an answer, None to accept any.
+    :param timeout: Maximum time in seconds to wait, resolution included.
+    :return: The ProbeResult.
+    """
+    host, port = wg_config.split_endpoint(endpoint)
+    if not host or port is None:
+        return ProbeResult(endpoint, error="invalid endpoint")
+    loop = asyncio.get_running_loop()
+    transports = []
+
+    async def exchange():
+        address = await resolve(host, port, socket.SOCK_DGRAM)
+        future = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(lambda: ReplyProtocol(future, check_reply), remote_addr=address[:2])
+        transports.append(transport)
+        start = time.perf_counter()
+        transport.sendto(payload)
+        return await future - start
+
+    try:
+        return ProbeResult(endpoint, latency=await asyncio.wait_for(exchange(), timeout))
+    except asyncio.TimeoutError:
+        return ProbeResult(endpoint, error="timeout")
+    except OSError as e:
+        return ProbeResult(endpoint, error=e.strerror or type(e).__name__)
+    except ValueError as e:
+        # e.g. UnicodeError for a host name too long to be encoded
+        return ProbeResult(endpoint, error=f"invalid endpoint: {e}")
+    finally:
+        for transport in transports:
+            transport.close()
+
+
+async def probe_tcp(endpoint, timeout=PROBE_TIMEOUT):
+    """
+    Open a TCP connection to an endpoint and measure the time until it is accepted.
+    A refused connection also proves that the host is up, and counts as an answer.
+
+    :param endpoint: The endpoint "host:port".
+    :param timeout: Maximum time in seconds to wait, resolution included.
+    :return: The ProbeResult.
+    """
+    host, port = wg_config.split_endpoint(endpoint)
+    if not host or port is None:
+        return ProbeResult(endpoint, error="invalid endpoint")
+
+    async def connect():
+        address = await resolve(host, port, socket.SOCK_STREAM)
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.open_connection(address[0], address[1])
+        except ConnectionRefusedError:
+            return time.perf_counter() - start
+        latency = time.perf_counter() - start
+        writer.close()
+        return latency
+
+    try:
+        return ProbeResult(endpoint, latency=await asyncio.wait_for(connect(), timeout))
+    except asyncio.TimeoutError:
+        return ProbeResult(endpoint, error="timeout")
+    except OSError as e:
+        return ProbeResult(endpoint, error=e.strerror or type(e).__name__)
+    except ValueError as e:
+        # e.g. UnicodeError for a host name too long to be encoded
+        return ProbeResult(endpoint, error=f"invalid endpoint: {e}")
+
+
+async def probe_handshake(endpoint, private_key, public_key, timeout=PROBE_TIMEOUT):
+    """
+    Send a WireGuard handshake initiation to an endpoint and wait for the server to answer it.
+
+    :param endpoint: The endpoint "host:port".
+    :param private_key: The private key of the interface, in base64.
+    :param public_key: The public key of the peer, in base64.
+    :param timeout: Maximum time in seconds to wait.
+    :return: The ProbeResult.
+    """
+    sender_index = struct.unpack("<I", os.urandom(4))[0]
+    try:
+        payload = wg_handshake.build_initiation(private_key, public_key, sender_index)
+    except ValueError as e:
+        return ProbeResult(endpoint, error=f"invalid key: {e}")
+    return await probe_udp(endpoint, payload, lambda data: wg_handshake.is_reply(data, sender_index), timeout)
+
+
+async def probe_candidates(candidates, private_key=None, public_key=None, mode=MODE_UDP, timeout=PROBE_TIMEOUT, first_healthy=False):
+    """
+    Probe several endpoints concurrently.
+
+    :param candidates: The list of endpoints "host:port".
+    :param private_key: The private key of the interface, in base64.
+    :param public_key: The public key of the peer, in base64.
+    :param mode: MODE_UDP for a handshake initiation, MODE_TCP for a TCP connection.
+    :param timeout: Maximum time in seconds to wait for each endpoint.
+    :param first_healthy: True to stop at the first answer: the probes are sent together, so the
+        first endpoint to answer has the lowest latency and the others are not waited for.
+    :return: The list of ProbeResult, in the order of the candidates.
+    """
+    if mode == MODE_TCP:
+        tasks = [asyncio.ensure_future(probe_tcp(endpoint, timeout)) for endpoint in candidates]
+    else:
+        tasks = [asyncio.ensure_future(probe_handshake(endpoint, private_key, public_key, timeout)) for endpoint in candidates]
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if first_healthy and any(task.result().healthy for task in done):
+            break
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+    return [task.result() if not task.cancelled() else ProbeResult(endpoint, error="not waited for") for endpoint, task in zip(candidates, tasks)]
+
+
+def choose_best(results):
+    """
+    :param results: The list of ProbeResult.
+    :return: The healthy endpoint with the lowest latency, or None if no endpoint answered.
+    """
+    healthy = [result for result in results if result.healthy]
+    if not healthy:
+        return None
+    return min(healthy, key=lambda result: result.latency).endpoint
+
+
+class EndpointCache:
+    """
+    Endpoints chosen for recently probed peers, each kept for a limited time.
+    """
+
+    def __init__(self, ttl=CACHE_TTL):
+        """
+        Initialize the empty EndpointCache.
+
+        :param ttl: The time in seconds a choice is kept.
+        """
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, now=None):
+        """
+        :param key: The key of the peer.
+        :param now: The current monotonic time, defaults to time.monotonic().
+        :return: The cached tuple (endpoint, results), or None if there is none or it expired.
+        """
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] > self.ttl:
+                del self.entries[key]
+                return None
+            return entry[1]
+
+    def put(self, key, value, now=None):
+        """
+        :param key: The key of the peer.
+        :param value: The tuple (endpoint, results).
+        :param now: The current monotonic time, defaults to time.monotonic().
+        """
+        with self.lock:
+            self.entries[key] = (now if now is not None else time.monotonic(), value)
+
+    def clear(self):
+        """
+        Forget every choice, e.g. after the network changed.
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+cache = EndpointCache()
+
+
+def get_cache_key(peer, mode):
+    """
+    :param peer: The PeerSection.
+    :param mode: The probe mode.
+    :return: The key of the choice of the peer in the cache.
+    """
+    return peer.public_key, tuple(sorted(peer.candidate_endpoints)), mode
+
+
+def choose_endpoints(config, timeout=PROBE_TIMEOUT, endpoint_cache=cache):
+    """
+    Choose the endpoint of every peer of a configuration that lists several candidates.
+    The candidates of all the peers are probed at the same time. This blocks for up to
+    the timeout, it must not be called from the Tk thread.
+
+    :param config: The WireGuardConfig.
+    :param timeout: Maximum time in seconds to wait for each endpoint.
+    :param endpoint_cache: The EndpointCache, None to always probe.
+    :return: A list of tuples (peer, endpoint or None, list of ProbeResult).
+    """
+    choices = []
+    pending = []
+    for peer in config.peers:
+        candidates = peer.candidate_endpoints
+        if len(candidates) < 2:
+            continue
+        mode = MODE_TCP if (peer.get_directive("EndpointProbe") or "").lower() == MODE_TCP else MODE_UDP
+        key = get_cache_key(peer, mode)
+        cached = endpoint_cache.get(key) if endpoint_cache is not None else None
+        if cached is not None:
+            choices.append((peer, cached[0], cached[1]))
+        else:
+            pending.append((peer, candidates, mode, key))
+    if not pending:
+        return choices
+
+    async def probe_all():
+        return await asyncio.gather(*(
+            probe_candidates(candidates, config.interface.private_key, peer.public_key, mode, timeout, first_healthy=True)
+            for peer, candidates, mode, key in pending
+        ))
+
+    for (peer, candidates, mode, key), results in zip(pending, asyncio.run(probe_all())):
+        endpoint = choose_best(results)
+        print(f"Endpoints of peer {peer.public_key[:8]}: {results}, chosen: {endpoint}")
+        # A failed probe is not cached, the next toggle tries again
+        if endpoint is not None and endpoint_cache is not None:
+            endpoint_cache.put(key, (endpoint, results))
+        choices.append((peer, endpoint, results))
+    return choices
@@ -0,0 +1,607 @@
+"""
+Privileged WireGuard helper for Linux
+-------------------------------------
+Reading the peers and bringing tunnels up or down requires root. Instead of running sudo for
+every command, the application starts this helper once as root, with pkexec or sudo, and talks
+to it over a Unix socket, so every later call costs a round trip on the socket. This plays the
+role of apple_helper/ResistineHelperManager.swift on macOS.
+Only the user that started the application may connect (checked with SO_PEERCRED) and only the
+operations of an allow-list are run, on configuration files of the WireGuard directory of the
+application. Messages are JSON objects preceded by their length on 4 bytes:
+    request:  {"op": "up", "args": {"config": "/path/wg0.conf"}}
+    response: {"ok": true, "result": ...} or {"ok": false, "error": "..."}
+Tunnels are brought up with netlink (netlink_linux.py), wg-quick is the fallback. The user can
+write the configuration files, so configurations with commands run by wg-quick (PostUp...) are
+refused and the checked content is copied where only root can write before it is used. The
+configuration directory and files must belong to the user and not be links. The keys
+are removed from the peers read by the user.
+The helper runs as a script outside of the application, or through the --linux-helper option of
+the frozen application:
+    python3 -I linux_helper.py --uid 1000 --config-dir /home/user/.config/resistine/wireguard
+It refuses to start when its code can be modified by another user than root.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SOCKET_PATH = os.environ.get("RESISTINE_HELPER_SOCKET", "/run/resistine-helper.sock")
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_SIZE = 1 << 20
+COMMAND_TIMEOUT = 30
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+# Interface names accepted by wg-quick
+INTERFACE_NAME = re.compile(r"^[a-zA-Z0-9_=+.-]{1,15}$")
+# Modules of the application run by the helper, in plugins/vpn/wireguard
+HELPER_MODULES = ("linux_helper.py", "netlink_linux.py", "wg_config.py")
+# Operations that do not change the system, sent again if the connection breaks
+READ_OPERATIONS = ("ping", "show_dump")
+# Replaces the private and preshared keys in the peers sent to the user
+HIDDEN_KEY = "(hidden)"
+
+# Imported by main() once the application tree is checked, the helper is started as a script
+netlink_linux = None
+wg_config = None
+
+
+class HelperError(Exception):
+    """
+    Raised when the helper cannot be reached or refuses a request.
+    """
+
+
+def receive_exactly(sock, size):
+    """
+    :param sock: The connected socket.
+    :param size: The number of bytes to read.
+    :return: The bytes read.
+    :raises ConnectionError: If the connection is closed before.
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def send_message(sock, message):
+    """
+    :param sock: The connected socket.
+    :param message: The JSON-serializable message.
+    """
+    data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def receive_message(sock):
+    """
+    :param sock: The connected socket.
+    :return: The decoded message.
+    :raises ConnectionError: If the connection is closed or the message is too large.
+    """
+    size = HEADER.unpack(receive_exactly(sock, HEADER.size))[0]
+    if size > MAX_MESSAGE_SIZE:
+        raise ConnectionError(f"Message of {size} bytes refused")
+    return json.loads(receive_exactly(sock, size).decode("utf-8"))
+
+
+def get_trusted_paths():
+    """
+    :return: The files whose code the helper runs as root: the executable of the frozen
+        application, or the modules of the application tree and their bytecode.
+    """
+    if getattr(sys, "frozen", False):
+        return [sys.executable, sys._MEIPASS]
+    package_dir = os.path.join(ROOT_DIR, "plugins", "vpn", "wireguard")
+    paths = [os.path.join(package_dir, name) for name in HELPER_MODULES]
+    cache_dir = os.path.join(package_dir, "__pycache__")
+    if os.path.isdir(cache_dir):
+        paths.extend(os.path.join(cache_dir, name) for name in os.listdir(cache_dir))
+    return paths
+
+
+def check_trusted(path):
+    """
+    Check that only root can modify a file and the directories above it.
+
+    :param path: The path to the file.
+    :raises HelperError: If another user can modify it.
+    """
+    path = os.path.realpath(path)
+    while True:
+        status = os.stat(path)
+        # A group other than root's must not write either
+        writable = status.st_mode & (0o002 if status.st_gid == 0 else 0o022)
+        # Only the owner of an entry of a sticky directory, such as /tmp, can replace it
+        sticky = stat.S_ISDIR(status.st_mode) and status.st_mode & stat.S_ISVTX
+        if status.st_uid != 0 or (writable and not sticky):
+            raise HelperError(f"{path} can be modified by another user than root")
+        parent = os.path.dirname(path)
+        if parent == path:
+            return
+        path = parent
+
+
+def get_peer_uid(sock):
+    """
+    :param sock: A connected Unix socket.
+    :return: The user id of the process at the other end.
+    """
+    credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", credentials)[1]
+
+
+class HelperServer:
+    """
+    The helper, running as root, serving the requests of one user.
+    """
+
+    def __init__(self, socket_path, allowed_uid, config_dir):
+        """
+        Initialize the HelperServer.
+
+        :param socket_path: The path of the Unix socket.
+        :param allowed_uid: The user id allowed to connect, root is always allowed.
+        :param config_dir: The WireGuard configuration directory of the application.
+        """
+        self.socket_path = socket_path
+        self.allowed_uid = allowed_uid
+        # Not resolved, the directory is checked on every request, see open_config_dir
+        self.config_dir = os.path.abspath(config_dir)
+        # The checked copies of the configurations, only root can write there
+        self.work_dir = tempfile.mkdtemp(prefix="resistine-helper-")
+        # Tunnels are brought up and down one at a time, status requests are not blocked
+        self.change_lock = threading.Lock()
+        self.operations = {
+            "ping": self.ping,
+            "show_dump": self.show_dump,
+            "up": self.up,
+            "down": self.down,
+            "install_wireguard": self.install_wireguard,
+        }
+
+    def ping(self):
+        return {"pid": os.getpid(), "uid": os.geteuid()}
+
+    def open_config_dir(self):
+        """
+        Open the configuration directory. It must be a directory of the user and not a link, the
+        user could otherwise point it to the configurations of the system, e.g. /etc/wireguard.
+
+        :return: The file descriptor of the directory, to be closed by the caller.
+        :raises HelperError: If the directory is missing, a link or owned by another user.
+        """
+        try:
+            dir_descriptor = os.open(self.config_dir, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+        except OSError as e:
+            raise HelperError(f"Configuration directory refused: {e}")
+        if os.fstat(dir_descriptor).st_uid != self.allowed_uid:
+            os.close(dir_descriptor)
+            raise HelperError(f"Configuration directory owned by another user: {self.config_dir}")
+        return dir_descriptor
+
+    def get_tunnel_names(self):
+        """
+        :return: The set of interface names of the configuration files of the application.
+        """
+        try:
+            dir_descriptor = self.open_config_dir()
+        except HelperError:
+            return set()
+        try:
+            names = {os.path.splitext(name)[0] for name in os.listdir(dir_descriptor) if name.endswith(".conf")}
+        except OSError:
+            return set()
+        finally:
+            os.close(dir_descriptor)
+        return {name for name in names if INTERFACE_NAME.match(name)}
+
+    def show_dump(self, interface=None):
+        """
+        Read the peers of the tunnels of the application, without the private and preshared keys.
+
+        :param interface: The name of an interface, None for every tunnel of the application.
+        :return: The output of `wg show <interface> dump`, None if the interface does not exist
+            or is not a tunnel of the application.
+        """
+        if interface is not None and not INTERFACE_NAME.match(interface):
+            raise HelperError(f"Invalid interface name: {interface}")
+        tunnels = self.get_tunnel_names()
+        if interface is not None and interface not in tunnels:
+            return None
+        result = self.run_command(["wg", "show", interface or "all", "dump"])
+        if result["returncode"] != 0:
+            return None
+        lines = []
+        for line in result["stdout"].splitlines():
+            fields = line.split("\t")
+            prefix = []
+            if interface is None:
+                if fields[0] not in tunnels:
+                    continue
+                prefix, fields = fields[:1], fields[1:]
+            # The interface line starts with the private key, the preshared key is the second field of a peer line
+            if len(fields) == 4:
+                fields[0] = HIDDEN_KEY
+            elif len(fields) >= 8:
+                fields[1] = HIDDEN_KEY
+            else:
+                continue
+            lines.append("\t".join(prefix + fields))
+        return "".join(line + "\n" for line in lines)
+
+    def up(self, config):
+        with self.change_lock:
+            path = self.check_config(config)
+            try:
+                try:
+                    netlink_linux.bring_up(path)
+                    return {"returncode": 0, "stdout": "", "stderr": ""}
+                except (ValueError, OSError) as e:
+                    print(f"Bringing up {path} with wg-quick: {e}")
+                return self.run_command(["wg-quick", "up", path])
+            finally:
+                os.unlink(path)
+
+    def down(self, config):
+        with self.change_lock:
+            path = self.check_config(config)
+            try:
+                try:
+                    if netlink_linux.bring_down(path):
+                        return {"returncode": 0, "stdout": "", "stderr": ""}
+                except OSError as e:
+                    print(f"Bringing down {path} with wg-quick: {e}")
+                return self.run_command(["wg-quick", "down", path])
+            finally:
+                os.unlink(path)
+
+    def install_wireguard(self):
+        with self.change_lock:
+            return self.run_command(["apt-get", "install", "-y", "wireguard"], timeout=600)
+
+    def check_config(self, config):
+        """
+        Check that a configuration file can be used by wg-quick on behalf of the user and copy it
+        where only root can write, the user could change the file once it is checked. wg-quick
+        runs the commands of PreUp, PostUp, PreDown and PostDown as root and SaveConfig writes
+        the file, configurations with them are refused.
+
+        :param config: The path to the configuration file.
+        :return: The path to the copy, with the same name, to be removed by the caller.
+        :raises HelperError: If the file is outside of the configuration directory or not valid.
+        """
+        config = str(config)
+        file_name = os.path.basename(config)
+        name, extension = os.path.splitext(file_name)
+        # The application sends the resolved path
+        if os.path.realpath(os.path.dirname(config)) != os.path.realpath(self.config_dir) or extension != ".conf" or not INTERFACE_NAME.match(name):
+            raise HelperError(f"Configuration refused: {config}")
+        # Opened from the checked directory, neither of them may be a link
+        dir_descriptor = self.open_config_dir()
+        try:
+            file_descriptor = os.open(file_name, os.O_RDONLY | os.O_NOFOLLOW, dir_fd=dir_descriptor)
+        except OSError:
+            raise HelperError(f"Configuration not found: {config}")
+        finally:
+            os.close(dir_descriptor)
+        with os.fdopen(file_descriptor, "r", encoding="utf-8") as conf_file:
+            status = os.fstat(file_descriptor)
+            if not stat.S_ISREG(status.st_mode):
+                raise HelperError(f"Configuration not found: {config}")
+            if status.st_uid != self.allowed_uid:
+                raise HelperError(f"Configuration owned by another user: {config}")
+            try:
+                text = conf_file.read()
+                parsed = wg_config.parse_config(text)
+            except (OSError, ValueError):
+                raise HelperError(f"Configuration not valid: {config}")
+        keys = {entry.key.lower() for section in parsed.sections for entry in section.entries()}
+        refused = [key for key in netlink_linux.UNSUPPORTED_KEYS if key.lower() in keys]
+        if refused:
+            raise HelperError(f"Configuration refused, {', '.join(refused)} not allowed: {config}")
+        copy_path = os.path.join(self.work_dir, file_name)
+        file_descriptor = os.open(copy_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as copy_file:
+            copy_file.write(text)
+        return copy_path
+
+    def run_command(self, command, timeout=COMMAND_TIMEOUT):
+        """
+        :param command: The command of the allow-list to run.
+        :param timeout: Maximum time in seconds to wait for the command.
+        :return: A dictionary with the returncode, stdout and stderr of the command.
+        """
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise HelperError(f"{command[0]} failed: {e}")
+        return {"returncode": result.returncode, "stdout": result.stdout, "stderr": result.stderr}
+
+    def handle(self, request):
+        """
+        :param request: The decoded request.
+        :return: The response.
+        """
+        operation = self.operations.get(request.get("op")) if isinstance(request, dict) else None
+        if operation is None:
+            return {"ok": False, "error": "Operation not allowed"}
+        args = request.get("args") or {}
+        try:
+            return {"ok": True, "result": operation(**args)}
+        except TypeError:
+            return {"ok": False, "error": "Invalid arguments"}
+        except HelperError as e:
+            return {"ok": False, "error": str(e)}
+
+    def serve_connection(self, connection):
+        """
+        Answer the requests of a client until it disconnects.
+
+        :param connection: The accepted socket.
+        """
+        with connection:
+            uid = get_peer_uid(connection)
+            if uid not in (0, self.allowed_uid):
+                print(f"Refusing connection from uid {uid}")
+                return
+            while True:
+                try:
+                    request = receive_message(connection)
+                except (ConnectionError, ValueError):
+                    return
+                response = self.handle(request)
+                try:
+                    send_message(connection, response)
+                except OSError:
+                    # The client stopped waiting, e.g. after its timeout
+                    return
+
+    def serve(self):
+        """
+        Listen on the socket until the process is stopped.
+        """
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chown(self.socket_path, self.allowed_uid, -1)
+        os.chmod(self.socket_path, 0o600)
+        server.listen(4)
+        print(f"Helper listening on {self.socket_path} for uid {self.allowed_uid}")
+        try:
+            while True:
+                connection, _ = server.accept()
+                threading.Thread(target=self.serve_connection, args=(connection,), daemon=True).start()
+        finally:
+            server.close()
+            os.unlink(self.socket_path)
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class HelperConnection:
+    """
+    A connection to the helper, used by one call at a time.
+    """
+
+    def __init__(self, socket_path):
+        """
+        Initialize the HelperConnection, it is opened on the first call.
+
+        :param socket_path: The path of the Unix socket.
+        """
+        self.socket_path = socket_path
+        self.sock = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """
+        :raises OSError: If the helper is not running.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def check_closed(self):
+        """
+        Close the connection if the helper closed its end, e.g. when it was restarted.
+        """
+        try:
+            # Without a timeout, the socket does not wait for data
+            self.sock.settimeout(0)
+            if self.sock.recv(1, socket.MSG_PEEK) == b"":
+                self.close()
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.close()
+
+    def call(self, request, timeout, retry):
+        """
+        Send a request and wait for the response. A request that could not be sent on a
+        connection closed by the helper is sent again once on a new connection.
+
+        :param request: The request.
+        :param timeout: Maximum time in seconds to wait for the response.
+        :param retry: True to also send the request again when it was sent but no response
+            came, only for requests that do not change the system.
+        :return: The response.
+        :raises HelperError: If the helper is not reachable.
+        """
+        with self.lock:
+            for attempt in range(2):
+                reused = self.sock is not None
+                sent = False
+                try:
+                    if reused:
+                        self.check_closed()
+                        reused = self.sock is not None
+                    if self.sock is None:
+                        self.connect()
+                    self.sock.settimeout(timeout)
+                    send_message(self.sock, request)
+                    sent = True
+                    return receive_message(self.sock)
+                except (OSError, ValueError) as e:
+                    self.close()
+                    # The helper may be running a change that was sent, it is not sent twice
+                    if attempt or not reused or (sent and not retry):
+                        raise HelperError(f"Helper not reachable: {e}")
+
+
+class HelperClient:
+    """
+    Connection of the application to the helper, shared by the worker threads. Status reads
+    use their own connection, they do not wait for a tunnel being brought up or down.
+    """
+
+    def __init__(self, socket_path=SOCKET_PATH):
+        """
+        Initialize the HelperClient, the connections are opened on the first calls.
+
+        :param socket_path: The path of the Unix socket.
+        """
+        self.read_connection = HelperConnection(socket_path)
+        self.change_connection = HelperConnection(socket_path)
+
+    def close(self):
+        self.read_connection.close()
+        self.change_connection.close()
+
+    def call(self, op, timeout=COMMAND_TIMEOUT + 5, **args):
+        """
+        Run an operation in the helper. Operations that change the system are never sent twice.
+
+        :param op: The name of the operation.
+        :param timeout: Maximum time in seconds to wait for the response.
+        :param args: The arguments of the operation.
+        :return: The result of the operation.
+        :raises HelperError: If the helper is not reachable or refused the request.
+        """
+        read_only = op in READ_OPERATIONS
+        connection = self.read_connection if read_only else self.change_connection
+        response = connection.call({"op": op, "args": args}, timeout, retry=read_only)
+        if not response.get("ok"):
+            raise HelperError(response.get("error", "Request failed"))
+        return response.get("result")
+
+
+_client = None
+_launch_attempted = False
+_client_lock = threading.Lock()
+
+
+def get_client(socket_path=SOCKET_PATH):
+    """
+    Get the connection to the helper if it is running.
+
+    :param socket_path: The path of the Unix socket.
+    :return: The HelperClient, or None if the helper is not running.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            client = HelperClient(socket_path)
+            try:
+                client.call("ping", timeout=2)
+            except HelperError:
+                return None
+            _client = client
+        return _client
+
+
+def start_helper(config_dir, socket_path=SOCKET_PATH, timeout=60):
+    """
+    Start the helper as root, once per session. pkexec asks for the password in a dialog,
+    sudo is only used when it does not need one.
+
+    :param config_dir: The WireGuard configuration directory of the application.
+    :param socket_path: The path of the Unix socket.
+    :param timeout: Maximum time in seconds to wait for the helper, the user may be typing a password.
+    :return: The HelperClient, or None if the helper could not be started.
+    """
+    global _launch_attempted
+    client = get_client(socket_path)
+    if client is not None or _launch_attempted:
+        return client
+    _launch_attempted = True
+    if getattr(sys, "frozen", False):
+        # The frozen application starts the helper instead of its window, see main.py
+        arguments = [sys.executable, "--linux-helper"]
+    else:
+        # Isolated mode, the directory of the script is not searched for the standard modules
+        arguments = [sys.executable, "-I", os.path.realpath(__file__)]
+    arguments += ["--uid", str(os.getuid()), "--config-dir", config_dir, "--socket", socket_path]
+    if shutil.which("pkexec"):
+        command = ["pkexec"] + arguments
+    else:
+        command = ["sudo", "-n"] + arguments
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, start_new_session=True)
+    except OSError as e:
+        print(f"Error starting the privileged helper: {e}")
+        return None
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        client = get_client(socket_path)
+        if client is not None:
+            return client
+        if process.poll() is not None:
+            print(f"The privileged helper exited with code {process.returncode}")
+            return None
+        time.sleep(0.1)
+    print("The privileged helper did not start in time")
+    return None
+
+
+def main(argv=None):
+    """
+    Run the helper. Every module is imported before the socket is opened, and only from files
+    that only root can modify.
+
+    :param argv: The command line arguments, those of the process if None.
+    """
+    global netlink_linux, wg_config
+    parser = argparse.ArgumentParser(description="Privileged WireGuard helper of Resistine")
+    parser.add_argument("--uid", type=int, required=True, help="User id allowed to connect")
+    parser.add_argument("--config-dir", required=True, help="WireGuard configuration directory of the application")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Path of the Unix socket")
+    arguments = parser.parse_args(argv)
+    if os.geteuid() != 0:
+        sys.exit("The helper must run as root")
+    try:
+        for path in get_trusted_paths():
+            check_trusted(path)
+    except (HelperError, OSError) as e:
+        sys.exit(f"The helper refuses to run: {e}")
+    if not getattr(sys, "frozen", False):
+        sys.path.insert(0, ROOT_DIR)
+    from plugins.vpn.wireguard import netlink_linux, wg_config
+    HelperServer(arguments.socket, arguments.uid, arguments.config_dir).serve()
+
+
+if __name__ == "__main__":
+    main()
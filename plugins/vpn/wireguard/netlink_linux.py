@@ -0,0 +1,618 @@
+"""
+WireGuard interfaces over netlink
+---------------------------------
+This module brings a tunnel up and down on Linux with netlink messages sent directly to the
+kernel, instead of wg-quick, which runs ip, wg and resolvconf one after the other.
+The interface is created with its MTU in one rtnetlink message, its keys and peers are set in
+WireGuard generic netlink messages, then its addresses, the link state, the routes and the
+policy rules of a default route are sent as a batch. Batches are written in chunks of at most
+BATCH_MESSAGES messages, each answered by the kernel before the next one is sent, so that
+thousands of routes fit in the socket buffers. Only DNS servers still run resolvconf. It requires root, so it runs in the application when started as root, or in the
+privileged helper (linux_helper.py).
+Configurations using settings this module does not handle (PreUp, PostUp, PreDown, PostDown,
+SaveConfig, Table) raise UnsupportedConfig, callers fall back to wg-quick. Any error while the
+tunnel is brought up removes the interface again so that wg-quick starts from a clean state.
+The module only uses the standard library and the configuration parser.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import base64
+import errno
+import ipaddress
+import os
+import socket
+import struct
+import subprocess
+import threading
+from plugins.vpn.wireguard import wg_config
+
+NETLINK_ROUTE = 0
+NETLINK_GENERIC = 16
+
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+NLM_F_REPLACE = 0x100
+NLM_F_EXCL = 0x200
+NLM_F_CREATE = 0x400
+NLMSG_ERROR = 0x2
+NLMSG_DONE = 0x3
+NLA_F_NESTED = 0x8000
+NLA_TYPE_MASK = 0x3fff
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_NEWADDR = 20
+RTM_NEWROUTE = 24
+RTM_NEWRULE = 32
+RTM_DELRULE = 33
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_LINKINFO = 18
+IFLA_INFO_KIND = 1
+IFF_UP = 0x1
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+RTA_DST = 1
+RTA_OIF = 4
+RTA_TABLE = 15
+FRA_FWMARK = 10
+FRA_SUPPRESS_PREFIXLEN = 14
+FRA_TABLE = 15
+FR_ACT_TO_TBL = 1
+FIB_RULE_INVERT = 0x2
+RT_TABLE_UNSPEC = 0
+RT_TABLE_MAIN = 254
+RTPROT_BOOT = 3
+RT_SCOPE_UNIVERSE = 0
+RT_SCOPE_LINK = 253
+RTN_UNICAST = 1
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+WG_GENL_NAME = b"wireguard"
+WG_GENL_VERSION = 1
+WG_CMD_SET_DEVICE = 1
+WGDEVICE_A_IFINDEX = 1
+WGDEVICE_A_PRIVATE_KEY = 3
+WGDEVICE_A_FLAGS = 5
+WGDEVICE_A_LISTEN_PORT = 6
+WGDEVICE_A_FWMARK = 7
+WGDEVICE_A_PEERS = 8
+WGDEVICE_F_REPLACE_PEERS = 0x1
+WGPEER_A_PUBLIC_KEY = 1
+WGPEER_A_PRESHARED_KEY = 2
+WGPEER_A_FLAGS = 3
+WGPEER_A_ENDPOINT = 4
+WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL = 5
+WGPEER_A_ALLOWEDIPS = 9
+WGPEER_F_REPLACE_ALLOWEDIPS = 0x2
+WGALLOWEDIP_A_FAMILY = 1
+WGALLOWEDIP_A_IPADDR = 2
+WGALLOWEDIP_A_CIDR_MASK = 3
+
+HEADER = struct.Struct("=IHHII")
+ATTRIBUTE = struct.Struct("=HH")
+DEFAULT_MTU = 1420
+# Largest write of a batch, in bytes and in messages. The kernel refuses a write larger than the
+# send buffer (EMSGSIZE) and drops the acknowledgements overflowing the receive buffer (ENOBUFS),
+# both about 200 KiB by default, and each acknowledgement takes close to 1 KiB of it.
+BATCH_SIZE = 32768
+BATCH_MESSAGES = 128
+# AllowedIPs per WireGuard message, at most 44 bytes each, the next ones are sent in another message
+ALLOWED_IPS_PER_MESSAGE = 512
+# Routing table and firewall mark of a default route, as chosen first by wg-quick
+DEFAULT_TABLE = 51820
+UNSUPPORTED_KEYS = ("PreUp", "PostUp", "PreDown", "PostDown", "SaveConfig")
+
+# The interfaces brought up by this module, the others are brought down by wg-quick
+native_interfaces = set()
+_family_id = None
+
+
+class NetlinkError(OSError):
+    """
+    Raised when the kernel refuses a netlink message.
+    """
+
+
+class UnsupportedConfig(ValueError):
+    """
+    Raised when a configuration uses settings that only wg-quick handles.
+    """
+
+
+def attribute(kind, data):
+    """
+    :param kind: The type of the attribute.
+    :param data: The payload.
+    :return: The encoded attribute, padded to 4 bytes.
+    """
+    length = ATTRIBUTE.size + len(data)
+    return ATTRIBUTE.pack(length, kind) + data + b"\0" * (-length % 4)
+
+
+def nested(kind, attributes):
+    """
+    :param kind: The type of the attribute.
+    :param attributes: The encoded attributes it contains.
+    :return: The encoded nested attribute.
+    """
+    return attribute(kind | NLA_F_NESTED, b"".join(attributes))
+
+
+def u16(kind, value):
+    return attribute(kind, struct.pack("=H", value))
+
+
+def u32(kind, value):
+    return attribute(kind, struct.pack("=I", value))
+
+
+def parse_attributes(data):
+    """
+    :param data: The encoded attributes.
+    :return: A dictionary of payloads by attribute type.
+    """
+    attributes = {}
+    offset = 0
+    while offset + ATTRIBUTE.size <= len(data):
+        length, kind = ATTRIBUTE.unpack_from(data, offset)
+        if length < ATTRIBUTE.size:
+            break
+        attributes[kind & NLA_TYPE_MASK] = data[offset + ATTRIBUTE.size:offset + length]
+        offset += (length + 3) & ~3
+    return attributes
+
+
+class NetlinkSocket:
+    """
+    A netlink socket sending batches of requests and waiting for their acknowledgements.
+    """
+
+    def __init__(self, protocol):
+        """
+        Initialize the NetlinkSocket.
+
+        :param protocol: NETLINK_ROUTE or NETLINK_GENERIC.
+        """
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, protocol)
+        self.sock.bind((0, 0))
+        self.sequence = 0
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request(self, messages, ignore=()):
+        """
+        Send several messages in writes of at most BATCH_MESSAGES messages and BATCH_SIZE bytes,
+        and wait until the kernel answered each write before sending the next one.
+
+        :param messages: A list of tuples (message type, flags, payload).
+        :param ignore: The error numbers that are not raised, e.g. errno.ENOENT when deleting.
+        :return: The payloads of the replies that are not acknowledgements, by message index.
+        :raises NetlinkError: With the first error, the writes after the one that failed are not sent.
+        """
+        first_sequence = self.sequence + 1
+        replies = {}
+        start = 0
+        while start < len(messages):
+            buffer = bytearray()
+            end = start
+            # A message larger than BATCH_SIZE is written alone
+            while end < len(messages) and end - start < BATCH_MESSAGES and (end == start or len(buffer) + HEADER.size + len(messages[end][2]) <= BATCH_SIZE):
+                message_type, flags, payload = messages[end]
+                self.sequence += 1
+                buffer += HEADER.pack(HEADER.size + len(payload), message_type, flags | NLM_F_REQUEST | NLM_F_ACK, self.sequence, 0)
+                buffer += payload
+                end += 1
+            self.sock.send(buffer)
+            error = self.receive(set(range(first_sequence + start, self.sequence + 1)), first_sequence, len(messages), replies, ignore)
+            if error is not None:
+                raise error
+            start = end
+        return replies
+
+    def receive(self, pending, first_sequence, count, replies, ignore):
+        """
+        Read the answers of the kernel until every pending message is acknowledged.
+
+        :param pending: The set of sequence numbers of the messages not acknowledged yet.
+        :param first_sequence: The sequence number of the first message of the batch.
+        :param count: The number of messages of the batch.
+        :param replies: The dictionary the replies that are not acknowledgements are added to.
+        :param ignore: The error numbers that are not returned.
+        :return: The NetlinkError of the first refused message, or None.
+        """
+        error = None
+        while pending:
+            data = self.sock.recv(65536)
+            offset = 0
+            while offset + HEADER.size <= len(data):
+                length, message_type, _, sequence, _ = HEADER.unpack_from(data, offset)
+                payload = data[offset + HEADER.size:offset + length]
+                offset += (length + 3) & ~3
+                if sequence not in pending:
+                    continue
+                if message_type == NLMSG_ERROR:
+                    pending.discard(sequence)
+                    code = -struct.unpack_from("=i", payload)[0]
+                    if code and code not in ignore and error is None:
+                        error = NetlinkError(code, f"{os.strerror(code)} (message {sequence - first_sequence + 1} of {count})")
+                elif message_type != NLMSG_DONE:
+                    replies[sequence - first_sequence] = payload
+        return error
+
+
+def get_family_id(generic):
+    """
+    Resolve the generic netlink family of WireGuard, once per process.
+
+    :param generic: The NETLINK_GENERIC NetlinkSocket.
+    :return: The family id.
+    """
+    global _family_id
+    if _family_id is None:
+        payload = struct.pack("=BBH", CTRL_CMD_GETFAMILY, 1, 0) + attribute(CTRL_ATTR_FAMILY_NAME, WG_GENL_NAME + b"\0")
+        reply = generic.request([(GENL_ID_CTRL, 0, payload)])[0]
+        _family_id = struct.unpack("=H", parse_attributes(reply[4:])[CTRL_ATTR_FAMILY_ID][:2])[0]
+    return _family_id
+
+
+def link_message(name=None, index=0, kind=None, mtu=None, up=False):
+    """
+    :param name: The name of the interface, when it is created.
+    :param index: The index of the interface, 0 when it is created.
+    :param kind: The kind of interface created, e.g. "wireguard".
+    :param mtu: The MTU of the interface.
+    :param up: True to set the interface up.
+    :return: The payload of a RTM_NEWLINK or RTM_DELLINK message.
+    """
+    payload = struct.pack("=BxHiII", socket.AF_UNSPEC, 0, index, IFF_UP if up else 0, IFF_UP if up else 0)
+    if name is not None:
+        payload += attribute(IFLA_IFNAME, name.encode() + b"\0")
+    if mtu is not None:
+        payload += u32(IFLA_MTU, mtu)
+    if kind is not None:
+        payload += nested(IFLA_LINKINFO, [attribute(IFLA_INFO_KIND, kind.encode())])
+    return payload
+
+
+def address_message(index, interface):
+    """
+    :param index: The index of the interface.
+    :param interface: The ipaddress interface, e.g. 10.0.0.2/32.
+    :return: The payload of a RTM_NEWADDR message.
+    """
+    family = socket.AF_INET if interface.version == 4 else socket.AF_INET6
+    address = interface.ip.packed
+    return struct.pack("=BBBBI", family, interface.network.prefixlen, 0, RT_SCOPE_UNIVERSE, index) + attribute(IFA_LOCAL, address) + attribute(IFA_ADDRESS, address)
+
+
+def route_message(index, network, table=RT_TABLE_MAIN):
+    """
+    :param index: The index of the interface.
+    :param network: The ipaddress network routed through the interface.
+    :param table: The routing table.
+    :return: The payload of a RTM_NEWROUTE message.
+    """
+    family = socket.AF_INET if network.version == 4 else socket.AF_INET6
+    payload = struct.pack("=BBBBBBBBI", family, network.prefixlen, 0, 0, table if table < 256 else RT_TABLE_UNSPEC, RTPROT_BOOT, RT_SCOPE_LINK, RTN_UNICAST, 0)
+    if network.prefixlen:
+        payload += attribute(RTA_DST, network.network_address.packed)
+    return payload + u32(RTA_OIF, index) + u32(RTA_TABLE, table)
+
+
+def rule_message(version, table, fwmark=None, invert=False, suppress_prefixlength=None):
+    """
+    :param version: 4 or 6.
+    :param table: The routing table the rule looks up.
+    :param fwmark: Only match the packets with this firewall mark.
+    :param invert: True to match the packets the rule would not match.
+    :param suppress_prefixlength: Ignore the routes of the table with this prefix length or shorter.
+    :return: The payload of a RTM_NEWRULE or RTM_DELRULE message.
+    """
+    family = socket.AF_INET if version == 4 else socket.AF_INET6
+    payload = struct.pack("=BBBBBBBBI", family, 0, 0, 0, table if table < 256 else RT_TABLE_UNSPEC, 0, 0, FR_ACT_TO_TBL, FIB_RULE_INVERT if invert else 0)
+    payload += u32(FRA_TABLE, table)
+    if fwmark is not None:
+        payload += u32(FRA_FWMARK, fwmark)
+    if suppress_prefixlength is not None:
+        payload += u32(FRA_SUPPRESS_PREFIXLEN, suppress_prefixlength)
+    return payload
+
+
+def default_rules(version, table):
+    """
+    The policy rules of wg-quick for a default route: the packets of the tunnel itself, marked
+    with the firewall mark, use the main table, every other packet uses the table of the tunnel,
+    except the routes of the main table more specific than the default route.
+
+    :param version: 4 or 6.
+    :param table: The routing table and firewall mark of the tunnel.
+    :return: The list of rule payloads.
+    """
+    return [
+        rule_message(version, table, fwmark=table, invert=True),
+        rule_message(version, RT_TABLE_MAIN, suppress_prefixlength=0),
+    ]
+
+
+def sockaddr(endpoint):
+    """
+    :param endpoint: The endpoint "host:port", host names are resolved.
+    :return: The endpoint encoded as a sockaddr_in or sockaddr_in6.
+    :raises OSError: If the host name cannot be resolved.
+    """
+    host, port = wg_config.split_endpoint(endpoint)
+    if port is None:
+        raise wg_config.ConfigError(f"Invalid endpoint: {endpoint}")
+    family, _, _, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+    packed = socket.inet_pton(family, address[0])
+    if family == socket.AF_INET:
+        return struct.pack("=H", family) + struct.pack("!H", port) + packed + b"\0" * 8
+    return struct.pack("=H", family) + struct.pack("!HI", port, 0) + packed + struct.pack("=I", address[3])
+
+
+def decode_key(key):
+    """
+    :param key: A key encoded in base64.
+    :return: The 32 bytes of the key.
+    """
+    try:
+        data = base64.b64decode(key, validate=True)
+    except ValueError:
+        data = b""
+    if len(data) != 32:
+        raise wg_config.ConfigError("Invalid key")
+    return data
+
+
+def allowed_ip_attributes(peer):
+    """
+    :param peer: The PeerSection.
+    :return: The list of encoded nested attributes of the AllowedIPs of the peer.
+    """
+    allowed_ips = []
+    for network in get_allowed_networks(peer):
+        family = socket.AF_INET if network.version == 4 else socket.AF_INET6
+        allowed_ips.append(nested(0, [
+            u16(WGALLOWEDIP_A_FAMILY, family),
+            attribute(WGALLOWEDIP_A_IPADDR, network.network_address.packed),
+            attribute(WGALLOWEDIP_A_CIDR_MASK, bytes([network.prefixlen])),
+        ]))
+    return allowed_ips
+
+
+def peer_attributes(peer, allowed_ips, first=True):
+    """
+    :param peer: The PeerSection.
+    :param allowed_ips: The encoded AllowedIPs sent in this message.
+    :param first: True for the first message of the peer, which sets it and replaces its AllowedIPs,
+        False for the next ones, which only add AllowedIPs.
+    :return: The encoded nested attribute of the peer.
+    """
+    attributes = [attribute(WGPEER_A_PUBLIC_KEY, decode_key(peer.public_key))]
+    if first:
+        attributes.append(u32(WGPEER_A_FLAGS, WGPEER_F_REPLACE_ALLOWEDIPS))
+        if peer.preshared_key:
+            attributes.append(attribute(WGPEER_A_PRESHARED_KEY, decode_key(peer.preshared_key)))
+        if peer.endpoint:
+            attributes.append(attribute(WGPEER_A_ENDPOINT, sockaddr(peer.endpoint)))
+        if peer.persistent_keepalive:
+            attributes.append(u16(WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL, peer.persistent_keepalive))
+    attributes.append(nested(WGPEER_A_ALLOWEDIPS, allowed_ips))
+    return nested(0, attributes)
+
+
+def device_messages(family_id, index, config, fwmark=None):
+    """
+    Build the messages that set the keys and the peers of an interface. Like wg, the AllowedIPs
+    are split over several messages: the first one sets the device and replaces its peers, the
+    next ones add the remaining AllowedIPs of the peers.
+
+    :param family_id: The generic netlink family of WireGuard.
+    :param index: The index of the interface.
+    :param config: The WireGuardConfig.
+    :param fwmark: The firewall mark of the packets of the tunnel, None for no mark.
+    :return: The list of payloads of WG_CMD_SET_DEVICE messages.
+    """
+    attributes = [
+        u32(WGDEVICE_A_IFINDEX, index),
+        attribute(WGDEVICE_A_PRIVATE_KEY, decode_key(config.interface.private_key)),
+        u32(WGDEVICE_A_FLAGS, WGDEVICE_F_REPLACE_PEERS),
+    ]
+    if config.interface.listen_port is not None:
+        attributes.append(u16(WGDEVICE_A_LISTEN_PORT, config.interface.listen_port))
+    if fwmark is not None:
+        attributes.append(u32(WGDEVICE_A_FWMARK, fwmark))
+    peers = [[]]
+    room = ALLOWED_IPS_PER_MESSAGE
+    for peer in config.peers:
+        allowed_ips = allowed_ip_attributes(peer)
+        first = True
+        while first or allowed_ips:
+            if room == 0 and allowed_ips:
+                peers.append([])
+                room = ALLOWED_IPS_PER_MESSAGE
+            chunk, allowed_ips = allowed_ips[:room], allowed_ips[room:]
+            room -= len(chunk)
+            peers[-1].append(peer_attributes(peer, chunk, first))
+            first = False
+    header = struct.pack("=BBH", WG_CMD_SET_DEVICE, WG_GENL_VERSION, 0)
+    messages = [header + b"".join(attributes) + nested(WGDEVICE_A_PEERS, peers[0])]
+    for message_peers in peers[1:]:
+        messages.append(header + u32(WGDEVICE_A_IFINDEX, index) + nested(WGDEVICE_A_PEERS, message_peers))
+    return messages
+
+
+def get_allowed_networks(peer):
+    """
+    :param peer: The PeerSection.
+    :return: The ipaddress networks of the AllowedIPs of the peer.
+    """
+    try:
+        return [ipaddress.ip_network(value, strict=False) for value in peer.allowed_ips]
+    except ValueError as e:
+        raise wg_config.ConfigError(f"Invalid AllowedIPs: {e}")
+
+
+def get_interface_name(config_path):
+    """
+    :param config_path: The path to the configuration file.
+    :return: The name of the interface, the name of the file like wg-quick.
+    """
+    return os.path.splitext(os.path.basename(config_path))[0]
+
+
+def get_fwmark(config):
+    """
+    :param config: The WireGuardConfig.
+    :return: The firewall mark and routing table of a default route.
+    """
+    value = config.interface.get("FwMark")
+    if not value or value == "off":
+        return DEFAULT_TABLE
+    return int(value, 0)
+
+
+def check_supported(config):
+    """
+    :param config: The WireGuardConfig.
+    :raises UnsupportedConfig: If the configuration uses settings only wg-quick handles.
+    """
+    keys = [key for key in UNSUPPORTED_KEYS if config.interface.get(key) is not None]
+    if config.interface.get("Table", "auto") not in ("auto", "main"):
+        keys.append("Table")
+    if keys:
+        raise UnsupportedConfig(f"Settings handled by wg-quick: {', '.join(keys)}")
+
+
+def plan_routes(index, config, table):
+    """
+    Build the messages that set the addresses and the routes of an interface and set it up.
+    Default routes go to the table of the tunnel with the policy rules of wg-quick.
+
+    :param index: The index of the interface.
+    :param config: The WireGuardConfig.
+    :param table: The routing table and firewall mark of a default route.
+    :return: A tuple (list of messages, True if a default route is used).
+    """
+    messages = []
+    for value in config.interface.addresses:
+        try:
+            interface = ipaddress.ip_interface(value)
+        except ValueError as e:
+            raise wg_config.ConfigError(f"Invalid Address: {e}")
+        messages.append((RTM_NEWADDR, NLM_F_CREATE | NLM_F_REPLACE, address_message(index, interface)))
+    messages.append((RTM_NEWLINK, 0, link_message(index=index, up=True)))
+    networks = sorted({network for peer in config.peers for network in get_allowed_networks(peer)}, key=lambda network: (network.version, network.prefixlen))
+    default_versions = []
+    for network in networks:
+        if network.prefixlen == 0:
+            default_versions.append(network.version)
+            messages.append((RTM_NEWROUTE, NLM_F_CREATE | NLM_F_EXCL, route_message(index, network, table)))
+        else:
+            messages.append((RTM_NEWROUTE, NLM_F_CREATE | NLM_F_REPLACE, route_message(index, network)))
+    for version in default_versions:
+        for rule in default_rules(version, table):
+            messages.append((RTM_NEWRULE, NLM_F_CREATE, rule))
+    return messages, bool(default_versions)
+
+
+def set_dns(interface_name, servers):
+    """
+    Set the DNS servers of the tunnel with resolvconf, like wg-quick.
+
+    :param interface_name: The name of the interface.
+    :param servers: The DNS servers and search domains.
+    """
+    lines = []
+    for server in servers:
+        try:
+            lines.append(f"nameserver {ipaddress.ip_address(server)}")
+        except ValueError:
+            lines.append(f"search {server}")
+    try:
+        subprocess.run(["resolvconf", "-a", interface_name, "-m", "0", "-x"], input="\n".join(lines) + "\n", text=True, capture_output=True, timeout=10, check=True)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Error setting the DNS servers of {interface_name}: {e}")
+
+
+def unset_dns(interface_name):
+    """
+    :param interface_name: The name of the interface.
+    """
+    try:
+        subprocess.run(["resolvconf", "-d", interface_name, "-f"], capture_output=True, timeout=10)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Error removing the DNS servers of {interface_name}: {e}")
+
+
+_lock = threading.Lock()
+
+
+def bring_up(config_path):
+    """
+    Bring a tunnel up with netlink messages.
+
+    :param config_path: The path to the WireGuard configuration file.
+    :raises UnsupportedConfig: If the configuration must be brought up by wg-quick.
+    :raises wg_config.ConfigError: If the configuration is not valid.
+    :raises OSError: If the kernel refused a message, e.g. NetlinkError, or WireGuard is not available.
+    """
+    config = wg_config.load_config(config_path)
+    check_supported(config)
+    name = get_interface_name(config_path)
+    table = get_fwmark(config)
+    with _lock, NetlinkSocket(NETLINK_ROUTE) as route, NetlinkSocket(NETLINK_GENERIC) as generic:
+        route.request([(RTM_NEWLINK, NLM_F_CREATE | NLM_F_EXCL, link_message(name, kind="wireguard", mtu=config.interface.mtu or DEFAULT_MTU))])
+        try:
+            index = socket.if_nametoindex(name)
+            messages, default_route = plan_routes(index, config, table)
+            family_id = get_family_id(generic)
+            generic.request([(family_id, 0, payload) for payload in device_messages(family_id, index, config, table if default_route else None)])
+            route.request(messages)
+            if default_route:
+                with open("/proc/sys/net/ipv4/conf/all/src_valid_mark", "w") as sysctl_file:
+                    sysctl_file.write("1")
+        except Exception:
+            route.request([(RTM_DELLINK, 0, link_message(name))], ignore=(errno.ENODEV,))
+            raise
+        native_interfaces.add(name)
+    if config.interface.dns:
+        set_dns(name, config.interface.dns)
+
+
+def bring_down(config_path):
+    """
+    Bring down a tunnel brought up by bring_up. Deleting the interface removes its addresses and routes.
+
+    :param config_path: The path to the WireGuard configuration file.
+    :return: True if the tunnel was brought down, False if it was not brought up by this module.
+    :raises OSError: If the kernel refused a message.
+    """
+    name = get_interface_name(config_path)
+    if name not in native_interfaces:
+        return False
+    try:
+        config = wg_config.load_config(config_path)
+        table = get_fwmark(config)
+        dns = config.interface.dns
+    except (OSError, ValueError):
+        table, dns = DEFAULT_TABLE, []
+    with _lock, NetlinkSocket(NETLINK_ROUTE) as route:
+        rules = [(RTM_DELRULE, 0, rule) for version in (4, 6) for rule in default_rules(version, table)]
+        route.request(rules + [(RTM_DELLINK, 0, link_message(name))], ignore=(errno.ENOENT, errno.ENODEV))
+        native_interfaces.discard(name)
+    if dns:
+        unset_dns(name)
+    return True
@@ -10,6 +10,8 @@ import subprocess
 import json
 import tempfile
 from typing import Tuple, Optional
+from utils.capabilities import registry
+from utils.command_runner import runner
 
 _stored_password = None
 def _request_password_once():
@@ -29,12 +31,7 @@ def _request_password_once():
         end tell
         '''
         
-        result = subprocess.run(
-            ["osascript", "-e", apple_script],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
+        result = runner.run(["osascript", "-e", apple_script], timeout=60)
         
         if result.returncode == 0:
             _stored_password = result.stdout.strip()
@@ -47,8 +44,8 @@ def _request_password_once():
     except Exception as e:
         print(f"❌ Error requesting password: {e}")
         return None
-def _run_wireguard_command(command: list, description: str = "This operation requires administrator privileges") -> Tuple[bool, str]:
-    """Run WireGuard command with stored password"""
+def _run_wireguard_command(command: list, description: str = "This operation requires administrator privileges", read_only: bool = False) -> Tuple[bool, str]:
+    """Run WireGuard command with stored password, read-only commands such as wg show are shared and cached"""
     global _stored_password
     
     # Get password if not already stored
@@ -76,14 +73,13 @@ export SHELL="/bin/bash"
         # Make script executable
         os.chmod(script_path, 0o755)
         
-        # Run with stored password using echo and sudo
-        sudo_command = f'echo "{_stored_password}" | sudo -S /bin/bash {script_path}'
-        
-        result = subprocess.run(
-            ["/bin/bash", "-c", sudo_command],
-            capture_output=True,
-            text=True,
-            timeout=30
+        # Run with stored password given to sudo on its standard input
+        result = runner.run(
+            ["sudo", "-S", "/bin/bash", script_path],
+            input=_stored_password + "\n",
+            timeout=30,
+            read_only=read_only,
+            cache_key=tuple(command) if read_only else None
         )
         
         # Clean up
@@ -125,13 +121,7 @@ def generate_keys():
         
         # Generate public key from private key
         try:
-            result = subprocess.run(
-                [wg_path, "pubkey"],
-                input=private_key,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            result = runner.run([wg_path, "pubkey"], input=private_key, timeout=10)
             
             if result.returncode == 0:
                 public_key = result.stdout.strip()
@@ -247,7 +237,7 @@ def check_service_status(interface_name, test_ip):
             return "Stopped"
         
         # Run wg show command using AppleScript
-        success, output = _run_wireguard_command([wg_path, "show"], "Check WireGuard status")
+        success, output = _run_wireguard_command([wg_path, "show"], "Check WireGuard status", read_only=True)
         
         if success and output.strip():
             # Check if there are active interfaces
@@ -261,21 +251,22 @@ def check_service_status(interface_name, test_ip):
     except Exception as e:
         print(f"❌ Exception: {e}")
         return "Stopped"
+def read_all_dump() -> str:
+    """Get the output of `wg show all dump` with the stored password, for the telemetry thread.
+    The password is never asked here, it is stored once a tunnel was started from the application."""
+    wg_path = _find_wireguard_path("wg")
+    if not wg_path:
+        raise FileNotFoundError("WireGuard not found")
+    if _stored_password is None:
+        raise PermissionError("The administrator password was not given yet")
+    success, output = _run_wireguard_command([wg_path, "show", "all", "dump"], "Read WireGuard statistics", read_only=True)
+    if not success:
+        raise OSError(output)
+    return output
+
 def _find_wireguard_path(tool: str) -> Optional[str]:
-    """Find WireGuard tool path"""
-    search_paths = [
-        "/opt/homebrew/bin",
-        "/usr/local/bin",
-        "/usr/bin",
-        "/bin"
-    ]
-    
-    for path in search_paths:
-        full_path = os.path.join(path, tool)
-        if os.path.exists(full_path) and os.access(full_path, os.X_OK):
-            return full_path
-    
-    return None
+    """Find WireGuard tool path, found once at start-up in PATH and the Homebrew directories"""
+    return registry.get_tool_path(tool)
 
 def check_wireguard_installed():
     """Check if WireGuard is installed."""
@@ -15,7 +15,12 @@ import os
 import subprocess
 import json
 from python_wireguard import Key
+from plugins.vpn.wireguard import linux_helper, netlink_linux, wg_status
+from utils.capabilities import registry
+from utils.command_runner import runner
 
+# The configuration files the privileged helper may bring up, see get_wireguard_config_dir in plugins/vpn/main.py
+HELPER_CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".config", "resistine-ai", "wireguard")
 
 def is_admin():
     """
@@ -51,8 +56,17 @@ def run_installer_as_admin(file_path):
 
     :param file_path: The path to the installer file.
     """
+    helper = get_helper(start=True)
+    if helper is not None:
+        try:
+            result = helper.call("install_wireguard", timeout=660)
+            print(f"WireGuard installation finished with code {result['returncode']}.")
+            return
+        except linux_helper.HelperError as e:
+            print(f"Error during installation with the privileged helper: {e}")
     try:
         print(f"Running installer as admin: {file_path}...")
+        # Interactive, the password and the confirmation of apt are asked in the terminal
         subprocess.run(["sudo", "apt", "install", "wireguard"], check=True)
         print("WireGuard installation command executed.")
     except Exception as e:
@@ -115,52 +129,128 @@ def generate_keys():
     except Exception as e:
         print(f"Error generating keys: {e}")
 
-def check_service_status(interface_name, test_ip):
+def get_helper(start=False):
     """
-    Check the status of the WireGuard VPN service.
+    Get the connection to the privileged helper, which runs the wg and wg-quick commands
+    without starting sudo for each one. It is not used when running as root.
+
+    :param start: True to start the helper if it is not running, asking for the password once per session.
+    :return: The linux_helper.HelperClient, or None.
+    """
+    if is_admin():
+        return None
+    if start:
+        return linux_helper.start_helper(HELPER_CONFIG_DIR)
+    return linux_helper.get_client()
+
+def read_all_dump():
+    """
+    Get the output of `wg show all dump`, from the privileged helper when it is running.
+
+    :return: The output of the command.
+    :raises subprocess.CalledProcessError: If the command failed.
+    """
+    helper = get_helper()
+    if helper is not None:
+        try:
+            output = helper.call("show_dump")
+            if output is not None:
+                return output
+        except linux_helper.HelperError as e:
+            print(f"Error reading WireGuard interfaces with the privileged helper: {e}")
+    return wg_status.read_all_dump(get_wg_command_prefix())
+
+def read_dump(interface_name):
+    """
+    Get the output of `wg show <interface> dump`, from the privileged helper when it is running.
 
     :param interface_name: The name of the WireGuard interface.
-    :param test_ip: The IP address to ping for testing connectivity.
-    :return: "Running" if the service is up, "Stopped" otherwise.
+    :return: The output of the command, or None if the interface does not exist.
     """
-    try:
-        result = subprocess.run(['sudo', 'wg', 'show', interface_name], check=True, capture_output=True, text=True)
-    except Exception as e:
-        print(f"Error checking WireGuard interface {interface_name}: {e}")
-        return "Stopped"
+    helper = get_helper()
+    if helper is not None:
+        try:
+            return helper.call("show_dump", interface=interface_name)
+        except linux_helper.HelperError as e:
+            print(f"Error reading WireGuard interface {interface_name} with the privileged helper: {e}")
+    return wg_status.read_dump(interface_name, get_wg_command_prefix())
 
-    try:
-        result = subprocess.run(['ip', 'route'], check=True, capture_output=True, text=True)
-    except Exception as e:
-        print(f"Error retrieving routing table: {e}")
-        return "Stopped"
+def get_wg_command_prefix():
+    """
+    Get the arguments placed before the wg commands that read the peers.
+    Reading the peers requires root, sudo must not wait for a password.
 
-    try:
-        result = subprocess.run(['ping', '-c', '4', test_ip], check=True, capture_output=True, text=True)
-    except Exception as e:
-        print(f"Error pinging {test_ip}: {e}")
-        return "Stopped"
+    :return: None when running as root, ["sudo", "-n"] otherwise.
+    """
+    return None if is_admin() else ['sudo', '-n']
+
+def collect_status(test_ip=None, timeout=wg_status.PROBE_TIMEOUT):
+    """
+    Check the health of every WireGuard interface with a single `wg show all dump`.
+
+    :param test_ip: The host, or "host:port", probed at most once when a handshake is not recent, None to skip the probe.
+    :param timeout: Maximum time in seconds to wait for the probe.
+    :return: A dictionary of wg_status.HealthResult by interface name.
+    """
+    return wg_status.collect_status(reader=read_all_dump).evaluate(test_ip, timeout)
+
+def check_service_health(interface_name, test_ip=None, timeout=wg_status.PROBE_TIMEOUT):
+    """
+    Check the health of the WireGuard VPN service from the latest handshake of its peers.
+    The test IP is only probed, once, when no handshake happened recently.
 
-    return "Running"
+    :param interface_name: The name of the WireGuard interface.
+    :param test_ip: The host, or "host:port", to probe for testing connectivity, None to skip the probe.
+    :param timeout: Maximum time in seconds to wait for the probe.
+    :return: A wg_status.HealthResult with the status and the reason code.
+    """
+    return wg_status.check_health(interface_name, test_ip, timeout, reader=read_dump)
+
+def check_service_status(interface_name, test_ip):
+    """
+    Check the status of the WireGuard VPN service.
+
+    :param interface_name: The name of the WireGuard interface.
+    :param test_ip: The IP address to probe for testing connectivity.
+    :return: "Running" if the service is up, "Stopped" otherwise.
+    """
+    result = check_service_health(interface_name, test_ip)
+    print(f"WireGuard interface {interface_name}: {result.status} ({result.reason}, {result.elapsed:.0f} ms)")
+    return result.status
 
 def check_wireguard_installed():
     """
-    Check if WireGuard is installed on the system.
+    Check if WireGuard is installed on the system, from the tools found at start-up.
 
     :return: True if WireGuard is installed, False otherwise.
     """
-    try:
-        subprocess.run(['which', 'wg'], check=True, capture_output=True, text=True)
-        print("WireGuard (wg) is installed.")
-    except Exception:
-        print("WireGuard (wg) is not installed.")
-        return False
+    for tool in ('wg', 'wg-quick'):
+        if not registry.has_tools(tool):
+            print(f"WireGuard ({tool}) is not installed.")
+            return False
+    return True
 
+def run_with_helper(action, config_path):
+    """
+    Bring a tunnel up or down with the privileged helper, which is started if needed. The helper
+    uses netlink and falls back to `wg-quick <action> <config>`.
+
+    :param action: "up" or "down".
+    :param config_path: The path to the WireGuard configuration file.
+    :return: True or False with the result of the command, None if the helper is not available.
+    """
+    helper = get_helper(start=True)
+    if helper is None:
+        return None
     try:
-        subprocess.run(['which', 'wg-quick'], check=True, capture_output=True, text=True)
-        print("WireGuard (wg-quick) is installed.")
-    except Exception:
-        print("WireGuard (wg-quick) is not installed.")
+        result = helper.call(action, config=os.path.realpath(config_path))
+    except linux_helper.HelperError as e:
+        print(f"Error running wg-quick {action} with the privileged helper: {e}")
+        return None
+    finally:
+        runner.invalidate()
+    if result["returncode"] != 0:
+        print(f"wg-quick {action} failed: {result['stderr'].strip()}")
         return False
     return True
 
@@ -171,10 +261,20 @@ def stop_vpn(config_path):
     :param config_path: The path to the WireGuard configuration file.
     :return: True if the service is stopped successfully, False otherwise.
     """
+    if is_admin():
+        try:
+            if netlink_linux.bring_down(config_path):
+                runner.invalidate()
+                return True
+        except OSError as e:
+            print(f"Bringing down the VPN with wg-quick: {e}")
+    stopped = run_with_helper("down", config_path)
+    if stopped is not None:
+        return stopped
     try:
         interface_name = f'{config_path}'
         command = ['wg-quick', 'down', interface_name]
-        output = subprocess.run(command, check=True)
+        output = runner.run(command, check=True)
         if output.returncode != 0:
             print("Failed to stop VPN service.")
             return False
@@ -190,10 +290,20 @@ def start_vpn(config_path):
     :param config_path: The path to the WireGuard configuration file.
     :return: True if the service is started successfully, False otherwise.
     """
+    if is_admin():
+        try:
+            netlink_linux.bring_up(config_path)
+            runner.invalidate()
+            return True
+        except (ValueError, OSError) as e:
+            print(f"Bringing up the VPN with wg-quick: {e}")
+    started = run_with_helper("up", config_path)
+    if started is not None:
+        return started
     try:
         interface_name = f'{config_path}'
         command = ['wg-quick', 'up', interface_name]
-        output = subprocess.run(command, check=True)
+        output = runner.run(command, check=True)
         if output.returncode != 0:
             print("Failed to start VPN service.")
             return False
@@ -12,6 +12,9 @@ import subprocess
 import requests
 import json
 import time
+from plugins.vpn.wireguard import windows_service
+from utils.capabilities import registry
+from utils.command_runner import runner
 
 def is_admin():
     """
@@ -74,12 +77,12 @@ def run_installer_as_admin(file_path):
     """
     try:
         print(f"Running installer as admin: {file_path}...")
-        output = subprocess.run([file_path, "/S"], capture_output=True, text=True, check=True)
+        output = runner.run([file_path, "/S"], timeout=600, check=True)
         print("Installation command executed.")
         if output.returncode != 0:
             try:
                 print("Trying to uninstall services")
-                subprocess.run(["C:\\Program Files\\WireGuard\\wireguard.exe", "/uninstallmanagerservice"], check=True)
+                runner.run(["C:\\Program Files\\WireGuard\\wireguard.exe", "/uninstallmanagerservice"], check=True)
                 print("Services off")
             except subprocess.CalledProcessError as e:
                 print(f"Failed to turn off services: {e}")
@@ -125,10 +128,10 @@ def generate_keys():
     :return: A dictionary containing the private and public keys.
     """
     try:
-        private_key = subprocess.check_output(["C:\\Program Files\\WireGuard\\wg.exe", "genkey"]).decode("utf-8").strip()
-        public_key = subprocess.check_output(
-            ["C:\\Program Files\\WireGuard\\wg.exe", "pubkey"], input=private_key.encode("utf-8")
-        ).decode("utf-8").strip()
+        private_key = runner.run(["C:\\Program Files\\WireGuard\\wg.exe", "genkey"], check=True).stdout.strip()
+        public_key = runner.run(
+            ["C:\\Program Files\\WireGuard\\wg.exe", "pubkey"], input=private_key, check=True
+        ).stdout.strip()
 
         keys = {
             "private_key": private_key,
@@ -145,6 +148,38 @@ def generate_keys():
     except Exception as e:
         print(f"Error generating keys: {e}")
 
+def get_service_controller():
+    """
+    Get the controller of the tunnel services, connected to the Service Control Manager.
+
+    :return: The windows_service.ServiceController, or None if the Service Control Manager cannot be opened.
+    """
+    try:
+        return windows_service.get_controller()
+    except (AttributeError, OSError) as e:
+        print(f"Service Control Manager not available, falling back to sc: {e}")
+        return None
+
+def query_service_state(service_name):
+    """
+    Query the state of a service, from the Service Control Manager without starting any process if possible.
+
+    :param service_name: The name of the service.
+    :return: The windows_service state of the service, or None if it is not installed.
+    """
+    controller = get_service_controller()
+    if controller is not None:
+        return controller.query(service_name)
+    try:
+        result = runner.run(["sc", "query", service_name], read_only=True, check=True)
+    except subprocess.CalledProcessError:
+        return None
+    # e.g. "        STATE              : 4  RUNNING"
+    for line in result.stdout.splitlines():
+        if line.strip().startswith("STATE"):
+            return int(line.split(":", 1)[1].split()[0])
+    return None
+
 def check_service_status(tunnel_name, test_ip=None):
     """
     Check the status of the WireGuard service.
@@ -154,27 +189,19 @@ def check_service_status(tunnel_name, test_ip=None):
     :return: The status of the service ('Running' or 'Stopped').
     """
     try:
-        service_name = f"WireGuardTunnel${tunnel_name}"
-        result = subprocess.run(
-            ["sc", "query", service_name],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        content = result.stdout
-
-        if "RUNNING" in content:
+        service_name = windows_service.get_service_name(tunnel_name)
+        state = query_service_state(service_name)
+
+        if state == windows_service.SERVICE_RUNNING:
             if test_ip:
                 try:
-                    ping_result = subprocess.run(['ping', '-n', '2', test_ip], check=True, capture_output=True, text=True)
+                    ping_result = runner.run(['ping', '-n', '2', test_ip], timeout=10, read_only=True, cache_ttl=0, check=True)
                     print(f"Ping to {test_ip} successful:\n{ping_result.stdout}")
                     return "Running"
                 except Exception as e:
                     print(f"Error pinging {test_ip}: {e}")
                     return "Stopped"
             return "Running"
-        elif "STOPPED" in content:
-            return "Stopped"
         else:
             return "Stopped"
     except Exception as e:
@@ -183,25 +210,18 @@ def check_service_status(tunnel_name, test_ip=None):
 
 def check_wireguard_installed():
     """
-    Validate if WireGuard is installed.
+    Validate if WireGuard is installed, from the tools found at start-up.
 
     :return: True if WireGuard is installed, False otherwise.
     """
-    try:
-        result = subprocess.run(
-            ['wg.exe', '--version'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        print("WireGuard is installed.")
-        return True
-    except Exception as e:
-        print("WireGuard is installed, but there was an error executing 'wg.exe'.")
-        return False
-    except FileNotFoundError:
+    tool = registry.get().tools.get("wg")
+    if tool is None:
         print("WireGuard is not installed or 'wg.exe' is not in the system's PATH.")
         return False
+    if tool.version is None:
+        print("WireGuard is installed, but there was an error executing 'wg.exe'.")
+        return False
+    return True
 
 def install_tunnel(config_path):
     """
@@ -219,8 +239,8 @@ def install_tunnel(config_path):
             return True
         else:
             print("Installing VPN Tunnel service...")
-            command_install = f'"C:\\Program Files\\WireGuard\\wireguard.exe" /installtunnelservice "{config_path}"'
-            output = subprocess.run(command_install, check=True, shell=True)
+            command_install = ["C:\\Program Files\\WireGuard\\wireguard.exe", "/installtunnelservice", config_path]
+            output = runner.run(command_install, check=True)
             if output.returncode != 0:
                 print("Failed to install VPN service.")
                 return False
@@ -245,8 +265,8 @@ def uninstall_tunnel(config_path):
             return True
         else:
             print("Uninstalling VPN Tunnel service...")
-            command_install = f'"C:\\Program Files\\WireGuard\\wireguard.exe" /uninstalltunnelservice "{config_path}"'
-            output = subprocess.run(command_install, check=True, shell=True)
+            command_install = ["C:\\Program Files\\WireGuard\\wireguard.exe", "/uninstalltunnelservice", config_path]
+            output = runner.run(command_install, check=True)
             if output.returncode != 0:
                 print("Failed to uninstall VPN service.")
                 return False
@@ -262,20 +282,16 @@ def check_wireguard_interface(tunnel_name):
     :param tunnel_name: The name of the WireGuard tunnel.
     :return: True if the tunnel exists, False otherwise.
     """
-    service_name = f"WireGuardTunnel${tunnel_name}"
     try:
-        result = subprocess.run(
-            ["sc", "query", service_name],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        if "STATE" in result.stdout:
-            print(f"Tunnel '{tunnel_name}' exists.")
-            return True
-    except subprocess.CalledProcessError:
-        print(f"Tunnel '{tunnel_name}' does not exist.")
+        state = query_service_state(windows_service.get_service_name(tunnel_name))
+    except OSError as e:
+        print(f"Error checking tunnel '{tunnel_name}': {e}")
         return False
+    if state is not None:
+        print(f"Tunnel '{tunnel_name}' exists.")
+        return True
+    print(f"Tunnel '{tunnel_name}' does not exist.")
+    return False
 
 
 def stop_vpn(config_path, timeout=5, check_interval=1):
@@ -284,15 +300,30 @@ def stop_vpn(config_path, timeout=5, check_interval=1):
     Args:
         config_path (str): The path to the WireGuard configuration file.
         timeout (int): Maximum time to wait for the service to stop, in seconds.
-        check_interval (int): Time to wait between status checks, in seconds.
+        check_interval (int): Time to wait between status checks, in seconds, only used
+            when the Service Control Manager cannot be opened.
     Returns:
         bool: True if the service was stopped successfully, False otherwise.
     """
-    service_name = f"WireGuardTunnel${os.path.basename(config_path).split('.')[0]}"
     tunnel_name = f"{os.path.basename(config_path).split('.')[0]}"
+    service_name = windows_service.get_service_name(tunnel_name)
+    controller = get_service_controller()
+    if controller is not None:
+        try:
+            # Returns as soon as the service reports its new state
+            if controller.stop(service_name, timeout):
+                print(f"Service {service_name} has stopped.")
+                return True
+            print(f"Service {service_name} did not stop within {timeout} seconds.")
+        except OSError as e:
+            print(f"Failed to stop VPN service: {e}")
+        finally:
+            # The cached answers of wg and ping describe the previous state
+            runner.invalidate()
+        return False
     try:
         # Issue the stop command
-        subprocess.run(['sc', 'stop', service_name], check=True)
+        runner.run(['sc', 'stop', service_name], check=True)
 
         # Wait for the service to stop
         start_time = time.time()
@@ -302,6 +333,8 @@ def stop_vpn(config_path, timeout=5, check_interval=1):
                 print(f"Service {service_name} has stopped.")
                 return True
             time.sleep(check_interval)
+            # The previous answer of sc query is still cached
+            runner.invalidate()
         print(f"Timeout: Service {service_name} did not stop within {timeout} seconds.")
     except Exception as e:
         print(f"Failed to stop VPN service: {e}")
@@ -313,15 +346,30 @@ def start_vpn(config_path, timeout=5, check_interval=1):
     Args:
         config_path (str): The path to the WireGuard configuration file.
         timeout (int): Maximum time to wait for the service to start, in seconds.
-        check_interval (int): Time to wait between status checks, in seconds.
+        check_interval (int): Time to wait between status checks, in seconds, only used
+            when the Service Control Manager cannot be opened.
     Returns:
         bool: True if the service was started successfully, False otherwise.
     """
-    service_name = f"WireGuardTunnel${os.path.basename(config_path).split('.')[0]}"
     tunnel_name = f"{os.path.basename(config_path).split('.')[0]}"
+    service_name = windows_service.get_service_name(tunnel_name)
+    controller = get_service_controller()
+    if controller is not None:
+        try:
+            # Returns as soon as the service reports its new state
+            if controller.start(service_name, timeout):
+                print(f"Service {service_name} is running.")
+                return True
+            print(f"Service {service_name} did not start within {timeout} seconds.")
+        except OSError as e:
+            print(f"Failed to start VPN service: {e}")
+        finally:
+            # The cached answers of wg and ping describe the previous state
+            runner.invalidate()
+        return False
     try:
         # Issue the start command
-        subprocess.run(['sc', 'start', service_name], check=True)
+        runner.run(['sc', 'start', service_name], check=True)
 
         # Wait for the service to start
         start_time = time.time()
@@ -331,6 +379,8 @@ def start_vpn(config_path, timeout=5, check_interval=1):
                 print(f"Service {service_name} is running.")
                 return True
             time.sleep(check_interval)
+            # The previous answer of sc query is still cached
+            runner.invalidate()
         print(f"Timeout: Service {service_name} did not start within {timeout} seconds.")
     except Exception as e:
         print(f"Failed to start VPN service: {e}")
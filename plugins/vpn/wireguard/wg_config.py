@@ -0,0 +1,499 @@
+"""
+WireGuard configuration files
+-----------------------------
+This module parses WireGuard .conf files into a typed configuration with one Interface
+section and any number of Peer sections, and writes them back. The parser keeps comments,
+blank lines, unknown keys and the order of the lines, so that a file that is parsed and
+written again is unchanged apart from the values that were modified.
+Parsed files are cached by (path, mtime, size), re-rendering the VPN screen or switching
+between tunnels does not read the files again. The cached configurations are read-only.
+Settings of the application that wg-quick must not see are written as directive comments,
+e.g. "#@ Endpoints = vpn1.example.com:51820, vpn2.example.com:51820" in a [Peer] section.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import os
+import threading
+
+DIRECTIVE_PREFIX = "#@"
+
+
+class ConfigError(ValueError):
+    """
+    Raised when a WireGuard configuration cannot be parsed.
+    """
+
+
+def split_list(value):
+    """
+    Split a comma-separated value such as AllowedIPs.
+
+    :param value: The value, or None.
+    :return: The list of stripped items.
+    """
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def split_endpoint(endpoint):
+    """
+    Split an endpoint into a host and a port. IPv6 hosts are written between brackets,
+    e.g. [2001:db8::1]:51820.
+
+    :param endpoint: The endpoint "host:port", or None.
+    :return: A tuple (host, port), port is None if the endpoint has no valid port.
+    """
+    if not endpoint:
+        return None, None
+    if endpoint.startswith("["):
+        host, _, port = endpoint[1:].partition("]")
+        port = port[1:] if port.startswith(":") else ""
+    else:
+        host, separator, port = endpoint.rpartition(":")
+        if not separator:
+            return endpoint, None
+    return host, int(port) if port.isdigit() else None
+
+
+def join_endpoint(host, port):
+    """
+    Build an endpoint from a host and a port, with brackets around IPv6 hosts.
+
+    :param host: The host name or IP address.
+    :param port: The UDP port.
+    :return: The endpoint "host:port".
+    """
+    if ":" in host:
+        return f"[{host}]:{port}"
+    return f"{host}:{port}"
+
+
+class Entry:
+    """
+    A "Key = Value" line of a configuration section, with its inline comment.
+    """
+
+    __slots__ = ("key", "value", "comment", "raw", "raw_value")
+
+    def __init__(self, key, value, comment="", raw=None):
+        """
+        Initialize the Entry.
+
+        :param key: The key as written in the file.
+        :param value: The value, without the inline comment.
+        :param comment: The inline comment including the "#", or an empty string.
+        :param raw: The line as written in the file, kept as is while the value is unchanged.
+        """
+        self.key = key
+        self.value = value
+        self.comment = comment
+        self.raw = raw
+        self.raw_value = value
+
+    def format(self):
+        """
+        :return: The line of the entry.
+        """
+        if self.raw is not None and self.value == self.raw_value:
+            return self.raw
+        line = f"{self.key} = {self.value}"
+        return f"{line}  {self.comment}" if self.comment else line
+
+
+class Section:
+    """
+    A section of a configuration file, as a list of entries and raw comment or blank lines.
+    Keys are matched case-insensitively, like wg-quick does.
+    """
+
+    name = None
+
+    def __init__(self, header=None):
+        """
+        Initialize the Section.
+
+        :param header: The header line as written in the file, e.g. "[Peer]".
+        """
+        self.header = header or f"[{self.name}]"
+        self.lines = []
+
+    def entries(self, key=None):
+        """
+        :param key: Only return the entries of this key, None for every entry.
+        :return: The list of entries of the section.
+        """
+        entries = [line for line in self.lines if isinstance(line, Entry)]
+        if key is None:
+            return entries
+        key = key.lower()
+        return [entry for entry in entries if entry.key.lower() == key]
+
+    def get(self, key, default=None):
+        """
+        Get a value. A key given on several lines, such as Address, is joined with commas.
+
+        :param key: The key.
+        :param default: The value returned when the key is not set.
+        :return: The value.
+        """
+        entries = self.entries(key)
+        if not entries:
+            return default
+        return ", ".join(entry.value for entry in entries)
+
+    def set(self, key, value):
+        """
+        Set a value, replacing the first line of the key and removing the others.
+        A None value removes the key.
+
+        :param key: The key.
+        :param value: The new value, or None.
+        """
+        if value is None:
+            self.remove(key)
+            return
+        entries = self.entries(key)
+        if not entries:
+            self.append(key, value)
+            return
+        entries[0].value = str(value)
+        for entry in entries[1:]:
+            self.lines.remove(entry)
+
+    def append(self, key, value):
+        """
+        Add a line after the last entry of the section, before the trailing blank lines.
+
+        :param key: The key.
+        :param value: The value.
+        """
+        index = len(self.lines)
+        while index > 0 and not isinstance(self.lines[index - 1], Entry) and not self.lines[index - 1].strip():
+            index -= 1
+        self.lines.insert(index, Entry(key, str(value)))
+
+    def remove(self, key):
+        """
+        Remove every line of a key.
+
+        :param key: The key.
+        """
+        for entry in self.entries(key):
+            self.lines.remove(entry)
+
+    def get_directive(self, key, default=None):
+        """
+        Get the value of a directive comment "#@ Key = Value" of the section.
+
+        :param key: The key of the directive.
+        :param default: The value returned when the directive is not set.
+        :return: The value.
+        """
+        key = key.lower()
+        for line in self.lines:
+            if isinstance(line, Entry):
+                continue
+            line = line.strip()
+            if line.startswith(DIRECTIVE_PREFIX):
+                name, separator, value = line[len(DIRECTIVE_PREFIX):].partition("=")
+                if separator and name.strip().lower() == key:
+                    return value.strip()
+        return default
+
+    def format(self):
+        """
+        :return: The lines of the section, header included.
+        """
+        return [self.header] + [line.format() if isinstance(line, Entry) else line for line in self.lines]
+
+
+class InterfaceSection(Section):
+    """
+    The [Interface] section of a configuration.
+    """
+
+    name = "Interface"
+
+    @property
+    def private_key(self):
+        return self.get("PrivateKey", "")
+
+    @property
+    def addresses(self):
+        return split_list(self.get("Address"))
+
+    @property
+    def dns(self):
+        return split_list(self.get("DNS"))
+
+    @property
+    def listen_port(self):
+        value = self.get("ListenPort")
+        return int(value) if value and value.isdigit() else None
+
+    @property
+    def mtu(self):
+        value = self.get("MTU")
+        return int(value) if value and value.isdigit() else None
+
+
+class PeerSection(Section):
+    """
+    A [Peer] section of a configuration.
+    """
+
+    name = "Peer"
+
+    @property
+    def public_key(self):
+        return self.get("PublicKey", "")
+
+    @property
+    def preshared_key(self):
+        return self.get("PresharedKey")
+
+    @property
+    def allowed_ips(self):
+        return split_list(self.get("AllowedIPs"))
+
+    @property
+    def endpoint(self):
+        return self.get("Endpoint")
+
+    @property
+    def endpoint_host(self):
+        return split_endpoint(self.endpoint)[0]
+
+    @property
+    def endpoint_port(self):
+        return split_endpoint(self.endpoint)[1]
+
+    @property
+    def candidate_endpoints(self):
+        """
+        The endpoints the peer can be reached at: the current Endpoint, then those listed
+        in the "#@ Endpoints" directive.
+        """
+        candidates = [self.endpoint] if self.endpoint else []
+        for endpoint in split_list(self.get_directive("Endpoints")):
+            if endpoint not in candidates:
+                candidates.append(endpoint)
+        return candidates
+
+    @property
+    def persistent_keepalive(self):
+        value = self.get("PersistentKeepalive")
+        return int(value) if value and value.isdigit() else None
+
+
+class WireGuardConfig:
+    """
+    A parsed WireGuard configuration file.
+    """
+
+    def __init__(self, preamble=None, interface=None, peers=None):
+        """
+        Initialize the WireGuardConfig.
+
+        :param preamble: The comment and blank lines before the first section.
+        :param interface: The InterfaceSection.
+        :param peers: The list of PeerSection.
+        """
+        self.preamble = preamble if preamble is not None else []
+        self.interface = interface if interface is not None else InterfaceSection()
+        self.peers = peers if peers is not None else []
+        self.sections = [self.interface] + self.peers
+
+    def add_peer(self, peer=None):
+        """
+        Add a peer section at the end of the configuration.
+
+        :param peer: The PeerSection, a new empty one if None.
+        :return: The added PeerSection.
+        """
+        peer = peer or PeerSection()
+        last_lines = self.sections[-1].lines if self.sections else []
+        if last_lines and (isinstance(last_lines[-1], Entry) or last_lines[-1].strip()):
+            self.sections[-1].lines.append("")
+        self.peers.append(peer)
+        self.sections.append(peer)
+        return peer
+
+    def remove_peer(self, peer):
+        """
+        Remove a peer section.
+
+        :param peer: The PeerSection to remove.
+        """
+        self.peers.remove(peer)
+        self.sections.remove(peer)
+
+    def format(self):
+        """
+        Write the configuration back to text.
+
+        :return: The content of the configuration file.
+        """
+        lines = list(self.preamble)
+        for section in self.sections:
+            lines.extend(section.format())
+        return "\n".join(lines) + "\n"
+
+    def copy(self):
+        """
+        Copy the configuration, e.g. to modify one returned by load_config.
+
+        :return: A new WireGuardConfig with the same content.
+        """
+        return parse_config(self.format())
+
+    def to_values(self):
+        """
+        Get the values displayed by the VPN screen and used to bring the tunnel up,
+        the peer values are those of the first peer.
+
+        :return: A dictionary of the configuration values.
+        """
+        peer = self.peers[0] if self.peers else PeerSection()
+        host, port = split_endpoint(peer.endpoint)
+        return {
+            'private_key': self.interface.private_key,
+            'client_ip_address': ", ".join(self.interface.addresses),
+            'public_key': peer.public_key,
+            'allowed_ips': ", ".join(peer.allowed_ips),
+            'endpoint': host or '',
+            'port': port or '',
+            'dns': ", ".join(self.interface.dns),
+        }
+
+
+def parse_config(text):
+    """
+    Parse the content of a WireGuard configuration file.
+
+    :param text: The content of the file.
+    :return: The WireGuardConfig.
+    :raises ConfigError: If a line is not valid or the [Interface] section is missing or repeated.
+    """
+    preamble = []
+    interface = None
+    peers = []
+    sections = []
+    section = None
+    for number, raw_line in enumerate(text.splitlines(), start=1):
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            (section.lines if section is not None else preamble).append(raw_line)
+            continue
+        content, hash_sign, comment = line.partition("#")
+        content = content.strip()
+        if content.startswith("[") and content.endswith("]"):
+            name = content[1:-1].strip().lower()
+            if name == "interface":
+                if interface is not None:
+                    raise ConfigError(f"Line {number}: duplicate [Interface] section")
+                section = interface = InterfaceSection(raw_line.strip())
+            elif name == "peer":
+                section = PeerSection(raw_line.strip())
+                peers.append(section)
+            else:
+                raise ConfigError(f"Line {number}: unknown section {content}")
+            sections.append(section)
+            continue
+        key, separator, value = content.partition("=")
+        if not separator or not key.strip():
+            raise ConfigError(f"Line {number}: expected 'Key = Value'")
+        if section is None:
+            raise ConfigError(f"Line {number}: {key.strip()} is outside of a section")
+        section.lines.append(Entry(key.strip(), value.strip(), hash_sign + comment if hash_sign else "", raw_line))
+    if interface is None:
+        raise ConfigError("Missing [Interface] section")
+    config = WireGuardConfig(preamble, interface, peers)
+    # The writer keeps the sections in the order of the file
+    config.sections = sections
+    return config
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_file_key(path):
+    """
+    Get the key that identifies the current content of a file.
+
+    :param path: The path to the file.
+    :return: A tuple (path, mtime, size).
+    :raises OSError: If the file does not exist.
+    """
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def load_config(path):
+    """
+    Load a configuration file, from the cache if the file did not change since it was parsed.
+    The returned configuration is shared by every caller and every thread and must be treated
+    as read-only: to modify it, modify its copy() and write the copy with write_config, which
+    replaces the cached configuration.
+
+    :param path: The path to the configuration file.
+    :return: The WireGuardConfig.
+    :raises OSError: If the file cannot be read.
+    :raises ConfigError: If the file is not a valid configuration.
+    """
+    key = get_file_key(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    with open(path, "r", encoding="utf-8") as conf_file:
+        config = parse_config(conf_file.read())
+    with _cache_lock:
+        _cache[path] = (key, config)
+    return config
+
+
+def write_config(path, config, compile_routes=True):
+    """
+    Write a configuration file. The file is replaced atomically, keeps the permissions of
+    the previous file (0600 for a new one, it holds a private key) and the cache is updated
+    without reading the file again.
+
+    :param path: The path to the configuration file.
+    :param config: The WireGuardConfig, or the text of the configuration. It becomes the cached
+        configuration, pass a copy() of a configuration returned by load_config.
+    :param compile_routes: True to write the AllowedIPs of the peers with IncludeIPs or
+        ExcludeIPs directives, see route_compiler.py. The configuration is compiled in place.
+    :raises ConfigError: If the text is not a valid configuration.
+    :raises OSError: If the file cannot be written.
+    """
+    if isinstance(config, str):
+        config = parse_config(config)
+    if compile_routes:
+        # Imported here, the route compiler uses the parser of this module
+        from plugins.vpn.wireguard import route_compiler
+        route_compiler.compile_config(config)
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        mode = 0o600
+    temp_path = path + ".tmp"
+    file_descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(file_descriptor, "w", encoding="utf-8", newline="\n") as conf_file:
+        conf_file.write(config.format())
+    os.replace(temp_path, path)
+    with _cache_lock:
+        _cache[path] = (get_file_key(path), config)
+
+
+def forget_config(path):
+    """
+    Remove a configuration from the cache, e.g. when the file is deleted.
+
+    :param path: The path to the configuration file.
+    """
+    with _cache_lock:
+        _cache.pop(path, None)
@@ -0,0 +1,172 @@
+"""
+WireGuard handshake initiation
+------------------------------
+This module builds the first message of the WireGuard handshake (Noise_IKpsk2), as sent by
+wg-quick when a tunnel comes up. A server that knows the public key of the client answers
+it with a handshake response, so sending it from a plain UDP socket measures the round trip
+to a server without bringing an interface up. The response is not processed, no session is
+established and the server keeps the session of a running tunnel.
+See https://www.wireguard.com/protocol/ for the message format.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import time
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+CONSTRUCTION = b"Noise_IKpsk2_25519_ChaChaPoly_BLAKE2s"
+IDENTIFIER = b"WireGuard v1 zx2c4 Jason@zx2c4.com"
+LABEL_MAC1 = b"mac1----"
+
+MESSAGE_INITIATION = 1
+MESSAGE_RESPONSE = 2
+MESSAGE_COOKIE_REPLY = 3
+INITIATION_SIZE = 148
+# TAI64 label of the UNIX epoch, with the 10 seconds of TAI offset added by the WireGuard implementations
+TAI64_BASE = 2 ** 62 + 10
+
+
+def blake2s(*parts):
+    """
+    :param parts: The bytes to hash.
+    :return: The 32-byte BLAKE2s hash of the concatenated parts.
+    """
+    digest = hashlib.blake2s()
+    for part in parts:
+        digest.update(part)
+    return digest.digest()
+
+
+def hmac_blake2s(key, data):
+    """
+    :param key: The HMAC key.
+    :param data: The message.
+    :return: The 32-byte HMAC-BLAKE2s of the message.
+    """
+    return hmac.new(key, data, hashlib.blake2s).digest()
+
+
+def kdf(chaining_key, data, count):
+    """
+    Derive keys with HKDF over HMAC-BLAKE2s, as in the Noise protocol.
+
+    :param chaining_key: The chaining key.
+    :param data: The input key material.
+    :param count: The number of keys to derive.
+    :return: The list of derived keys.
+    """
+    secret = hmac_blake2s(chaining_key, data)
+    keys = []
+    previous = b""
+    for index in range(1, count + 1):
+        previous = hmac_blake2s(secret, previous + bytes([index]))
+        keys.append(previous)
+    return keys
+
+
+def aead_encrypt(key, counter, plaintext, associated_data):
+    """
+    :param key: The 32-byte ChaCha20-Poly1305 key.
+    :param counter: The message counter, used as the nonce.
+    :param plaintext: The bytes to encrypt.
+    :param associated_data: The authenticated data.
+    :return: The ciphertext followed by the 16-byte tag.
+    """
+    nonce = b"\0" * 4 + struct.pack("<Q", counter)
+    return ChaCha20Poly1305(key).encrypt(nonce, plaintext, associated_data)
+
+
+def tai64n(now=None):
+    """
+    :param now: The UNIX time, defaults to time.time().
+    :return: The 12-byte TAI64N timestamp.
+    """
+    now = now if now is not None else time.time()
+    seconds = int(now)
+    return struct.pack(">QI", TAI64_BASE + seconds, int((now - seconds) * 1e9))
+
+
+def decode_key(key):
+    """
+    :param key: A key encoded in base64, as written in the configuration files.
+    :return: The 32 bytes of the key.
+    :raises ValueError: If the key is not a valid WireGuard key.
+    """
+    raw = base64.b64decode(key, validate=True)
+    if len(raw) != 32:
+        raise ValueError("A WireGuard key is 32 bytes long")
+    return raw
+
+
+def public_bytes(private_key):
+    """
+    :param private_key: The X25519PrivateKey.
+    :return: The 32 bytes of its public key.
+    """
+    return private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+
+
+def build_initiation(private_key, peer_public_key, sender_index=None, now=None):
+    """
+    Build a handshake initiation message for a peer.
+    The preshared key is not part of the initiation, the server checks it in its response.
+
+    :param private_key: The private key of the interface, in base64.
+    :param peer_public_key: The public key of the peer, in base64.
+    :param sender_index: The 32-bit index identifying the handshake, random if None.
+    :param now: The UNIX time of the timestamp, defaults to time.time().
+    :return: The 148 bytes of the message.
+    :raises ValueError: If a key is not valid.
+    """
+    static_private = X25519PrivateKey.from_private_bytes(decode_key(private_key))
+    responder_public_raw = decode_key(peer_public_key)
+    responder_public = X25519PublicKey.from_public_bytes(responder_public_raw)
+    if sender_index is None:
+        sender_index = struct.unpack("<I", os.urandom(4))[0]
+
+    chaining_key = blake2s(CONSTRUCTION)
+    hash_value = blake2s(chaining_key, IDENTIFIER)
+    hash_value = blake2s(hash_value, responder_public_raw)
+
+    ephemeral_private = X25519PrivateKey.generate()
+    ephemeral_public = public_bytes(ephemeral_private)
+    chaining_key = kdf(chaining_key, ephemeral_public, 1)[0]
+    hash_value = blake2s(hash_value, ephemeral_public)
+
+    chaining_key, key = kdf(chaining_key, ephemeral_private.exchange(responder_public), 2)
+    encrypted_static = aead_encrypt(key, 0, public_bytes(static_private), hash_value)
+    hash_value = blake2s(hash_value, encrypted_static)
+
+    chaining_key, key = kdf(chaining_key, static_private.exchange(responder_public), 2)
+    encrypted_timestamp = aead_encrypt(key, 0, tai64n(now), hash_value)
+
+    message = struct.pack("<BxxxI", MESSAGE_INITIATION, sender_index) + ephemeral_public + encrypted_static + encrypted_timestamp
+    mac1 = hashlib.blake2s(message, digest_size=16, key=blake2s(LABEL_MAC1, responder_public_raw)).digest()
+    # mac2 is only required by a server under load, which answers with a cookie reply instead
+    return message + mac1 + b"\0" * 16
+
+
+def is_reply(data, sender_index):
+    """
+    Check that a datagram answers a handshake initiation.
+
+    :param data: The bytes received.
+    :param sender_index: The index of the initiation.
+    :return: True for a handshake response or a cookie reply to the initiation, False otherwise.
+    """
+    if len(data) < 8:
+        return False
+    message_type = data[0]
+    if message_type == MESSAGE_RESPONSE:
+        # The response carries the index of the server then the index of the initiation
+        return len(data) >= 12 and struct.unpack_from("<I", data, 8)[0] == sender_index
+    if message_type == MESSAGE_COOKIE_REPLY:
+        return struct.unpack_from("<I", data, 4)[0] == sender_index
+    return False
@@ -0,0 +1,439 @@
+"""
+WireGuard health check
+----------------------
+This module decides if a WireGuard tunnel carries traffic without a multi-packet ping.
+The status of every tunnel can be collected at once with `wg show all dump`, so refreshing
+50 tunnels costs a single process like refreshing one. The check is tiered:
+    1. `wg show <interface> dump` must list the interface and at least one peer,
+    2. a peer whose latest handshake is recent proves that the tunnel is up,
+    3. otherwise an optional single reachability probe is sent through the tunnel.
+The result carries a reason code, the handshake age, the transfer counters and the endpoint.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import os
+import platform
+import socket
+import subprocess
+import time
+from utils.command_runner import runner
+
+# WireGuard renews the session every 2 minutes while there is traffic and rejects it
+# after 180 seconds, an older handshake means the peer has not been heard of recently.
+HANDSHAKE_TIMEOUT = 180
+# Maximum time in seconds to wait for the reachability probe, RESISTINE_VPN_PROBE_TIMEOUT overrides it
+try:
+    PROBE_TIMEOUT = float(os.environ.get("RESISTINE_VPN_PROBE_TIMEOUT", "1.0"))
+except ValueError:
+    PROBE_TIMEOUT = 1.0
+DUMP_TIMEOUT = 2.0
+# Errors of wg for an interface that does not exist, on Linux and for the userspace implementations
+NO_INTERFACE_ERRORS = ("No such device", "No such file or directory")
+
+# Reason codes of a health check result
+REASON_HANDSHAKE_RECENT = "handshake_recent"
+REASON_PROBE_OK = "probe_ok"
+REASON_PROBE_FAILED = "probe_failed"
+REASON_HANDSHAKE_STALE = "handshake_stale"
+REASON_NO_HANDSHAKE = "no_handshake"
+REASON_NO_PEERS = "no_peers"
+REASON_NO_INTERFACE = "no_interface"
+REASON_ERROR = "error"
+
+
+class PeerStatus:
+    """
+    State of a WireGuard peer as reported by `wg show dump`.
+    """
+
+    __slots__ = ("public_key", "endpoint", "allowed_ips", "latest_handshake", "rx_bytes", "tx_bytes", "persistent_keepalive")
+
+    def __init__(self, public_key, endpoint, allowed_ips, latest_handshake, rx_bytes, tx_bytes, persistent_keepalive):
+        """
+        Initialize the PeerStatus.
+
+        :param public_key: The public key of the peer.
+        :param endpoint: The endpoint "host:port" of the peer, or None.
+        :param allowed_ips: The list of allowed IP ranges of the peer.
+        :param latest_handshake: The UNIX time of the latest handshake, 0 if there was none.
+        :param rx_bytes: The number of bytes received from the peer.
+        :param tx_bytes: The number of bytes sent to the peer.
+        :param persistent_keepalive: The keepalive interval in seconds, 0 if disabled.
+        """
+        self.public_key = public_key
+        self.endpoint = endpoint
+        self.allowed_ips = allowed_ips
+        self.latest_handshake = latest_handshake
+        self.rx_bytes = rx_bytes
+        self.tx_bytes = tx_bytes
+        self.persistent_keepalive = persistent_keepalive
+
+    def handshake_age(self, now=None):
+        """
+        Get the number of seconds since the latest handshake.
+
+        :param now: The current UNIX time, defaults to time.time().
+        :return: The age in seconds, or None if there was no handshake.
+        """
+        if not self.latest_handshake:
+            return None
+        return max(0.0, (now if now is not None else time.time()) - self.latest_handshake)
+
+
+class InterfaceStatus:
+    """
+    State of a WireGuard interface and its peers as reported by `wg show dump`.
+    """
+
+    __slots__ = ("name", "public_key", "listen_port", "peers")
+
+    def __init__(self, name, public_key, listen_port, peers=None):
+        """
+        Initialize the InterfaceStatus.
+
+        :param name: The name of the interface.
+        :param public_key: The public key of the interface.
+        :param listen_port: The UDP port the interface listens on.
+        :param peers: The list of PeerStatus of the interface.
+        """
+        self.name = name
+        self.public_key = public_key
+        self.listen_port = listen_port
+        self.peers = peers if peers is not None else []
+
+    def latest_peer(self):
+        """
+        Get the peer with the most recent handshake.
+
+        :return: The PeerStatus, or None if the interface has no peer.
+        """
+        if not self.peers:
+            return None
+        return max(self.peers, key=lambda peer: peer.latest_handshake)
+
+    def rx_bytes(self):
+        """
+        :return: The number of bytes received from every peer.
+        """
+        return sum(peer.rx_bytes for peer in self.peers)
+
+    def tx_bytes(self):
+        """
+        :return: The number of bytes sent to every peer.
+        """
+        return sum(peer.tx_bytes for peer in self.peers)
+
+
+class HealthResult:
+    """
+    Result of a tunnel health check.
+    """
+
+    def __init__(self, interface_name, status, reason, handshake_age=None, rx_bytes=0, tx_bytes=0, endpoint=None, elapsed=0.0):
+        """
+        Initialize the HealthResult.
+
+        :param interface_name: The name of the checked interface.
+        :param status: "Running" or "Stopped".
+        :param reason: One of the REASON_* codes.
+        :param handshake_age: Seconds since the latest handshake, or None.
+        :param rx_bytes: The number of bytes received through the tunnel.
+        :param tx_bytes: The number of bytes sent through the tunnel.
+        :param endpoint: The endpoint of the most recently seen peer, or None.
+        :param elapsed: The duration of the check in milliseconds.
+        """
+        self.interface_name = interface_name
+        self.status = status
+        self.reason = reason
+        self.handshake_age = handshake_age
+        self.rx_bytes = rx_bytes
+        self.tx_bytes = tx_bytes
+        self.endpoint = endpoint
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"HealthResult({self.interface_name!r}, {self.status!r}, {self.reason!r}, handshake_age={self.handshake_age}, elapsed={self.elapsed:.1f} ms)"
+
+
+def parse_peer(fields):
+    """
+    Parse the fields of a peer line of `wg show dump`.
+
+    :param fields: public-key, preshared-key, endpoint, allowed-ips, latest-handshake,
+        transfer-rx, transfer-tx and persistent-keepalive.
+    :return: The PeerStatus.
+    """
+    public_key, _, endpoint, allowed_ips, latest_handshake, rx_bytes, tx_bytes, keepalive = fields[:8]
+    return PeerStatus(
+        public_key=public_key,
+        endpoint=None if endpoint == "(none)" else endpoint,
+        allowed_ips=[] if allowed_ips == "(none)" else allowed_ips.split(","),
+        latest_handshake=int(latest_handshake),
+        rx_bytes=int(rx_bytes),
+        tx_bytes=int(tx_bytes),
+        persistent_keepalive=0 if keepalive == "off" else int(keepalive),
+    )
+
+
+def parse_dump(output, interface_name):
+    """
+    Parse the output of `wg show <interface> dump`. The first line describes the interface
+    (private-key, public-key, listen-port, fwmark), each following line describes a peer.
+
+    :param output: The output of the command.
+    :param interface_name: The name of the interface.
+    :return: The InterfaceStatus, or None if the output is empty.
+    """
+    lines = [line for line in output.splitlines() if line.strip()]
+    if not lines:
+        return None
+    fields = lines[0].split("\t")
+    interface = InterfaceStatus(interface_name, fields[1] if len(fields) > 1 else None, int(fields[2]) if len(fields) > 2 and fields[2].isdigit() else 0)
+    for line in lines[1:]:
+        fields = line.split("\t")
+        if len(fields) >= 8:
+            interface.peers.append(parse_peer(fields))
+    return interface
+
+
+def parse_all_dump(output):
+    """
+    Parse the output of `wg show all dump` in a single pass. Every line starts with the
+    interface name, interface lines have 5 fields and peer lines have 9 fields.
+
+    :param output: The output of the command.
+    :return: A dictionary of InterfaceStatus by interface name, in the order of the output.
+    """
+    interfaces = {}
+    for line in output.splitlines():
+        fields = line.split("\t")
+        if len(fields) == 5:
+            interfaces[fields[0]] = InterfaceStatus(fields[0], fields[2], int(fields[3]) if fields[3].isdigit() else 0)
+        elif len(fields) >= 9:
+            interface = interfaces.get(fields[0])
+            if interface is None:
+                interface = interfaces[fields[0]] = InterfaceStatus(fields[0], None, 0)
+            interface.peers.append(parse_peer(fields[1:]))
+    return interfaces
+
+
+class StatusTable:
+    """
+    Status of every WireGuard interface, collected at once.
+    """
+
+    def __init__(self, interfaces, collected_at=None):
+        """
+        Initialize the StatusTable.
+
+        :param interfaces: A dictionary of InterfaceStatus by interface name.
+        :param collected_at: The UNIX time of the collection, defaults to time.time().
+        """
+        self.interfaces = interfaces
+        self.collected_at = collected_at if collected_at is not None else time.time()
+
+    def names(self):
+        """
+        :return: The list of interface names.
+        """
+        return list(self.interfaces)
+
+    def get(self, name):
+        """
+        :param name: The name of the interface.
+        :return: The InterfaceStatus, or None if the interface does not exist.
+        """
+        return self.interfaces.get(name)
+
+    def evaluate(self, probe_target=None, probe_timeout=PROBE_TIMEOUT, handshake_timeout=HANDSHAKE_TIMEOUT):
+        """
+        Decide the health of every interface. The reachability probe is sent at most once,
+        for the first interface without a recent handshake, and its answer is reused.
+
+        :param probe_target: The host, or "host:port", probed when a handshake is not recent, None to skip.
+        :param probe_timeout: Maximum time in seconds to wait for the probe.
+        :param handshake_timeout: Maximum age in seconds of a handshake that proves a tunnel is up.
+        :return: A dictionary of HealthResult by interface name.
+        """
+        probe_answers = {}
+
+        def probe_once(target, timeout):
+            if target not in probe_answers:
+                probe_answers[target] = probe_reachability(target, timeout)
+            return probe_answers[target]
+
+        results = {}
+        for name, interface in self.interfaces.items():
+            start = time.perf_counter()
+            status, reason, peer = evaluate(interface, probe_target, probe_timeout, handshake_timeout, self.collected_at, probe_once)
+            results[name] = make_result(name, interface, status, reason, peer, start)
+        return results
+
+
+def read_dump(interface_name, command_prefix=None, timeout=DUMP_TIMEOUT):
+    """
+    Run `wg show <interface> dump`.
+
+    :param interface_name: The name of the interface.
+    :param command_prefix: Arguments placed before the command, e.g. ["sudo", "-n"].
+    :param timeout: Maximum time in seconds to wait for the command.
+    :return: The output of the command, or None if the interface does not exist.
+    :raises subprocess.CalledProcessError: If the command failed otherwise, e.g. sudo needs a password.
+    """
+    command = list(command_prefix or []) + ["wg", "show", interface_name, "dump"]
+    result = runner.run(command, timeout=timeout, read_only=True)
+    if result.returncode != 0 and any(error in (result.stderr or "") for error in NO_INTERFACE_ERRORS):
+        return None
+    result.check_returncode()
+    return result.stdout
+
+
+def read_all_dump(command_prefix=None, timeout=DUMP_TIMEOUT):
+    """
+    Run `wg show all dump`.
+
+    :param command_prefix: Arguments placed before the command, e.g. ["sudo", "-n"].
+    :param timeout: Maximum time in seconds to wait for the command.
+    :return: The output of the command.
+    :raises subprocess.CalledProcessError: If the command failed.
+    """
+    command = list(command_prefix or []) + ["wg", "show", "all", "dump"]
+    return runner.run(command, timeout=timeout, read_only=True, check=True).stdout
+
+
+def collect_status(command_prefix=None, reader=None):
+    """
+    Collect the status of every WireGuard interface with a single wg invocation.
+
+    :param command_prefix: Arguments placed before the wg command, e.g. ["sudo", "-n"].
+    :param reader: A function returning the output of `wg show all dump`, used instead of running wg.
+    :return: The StatusTable.
+    """
+    output = reader() if reader is not None else read_all_dump(command_prefix)
+    return StatusTable(parse_all_dump(output))
+
+
+def split_target(target):
+    """
+    Split a probe target into a host and an optional port.
+
+    :param target: "host", "host:port", an IPv6 address or "[IPv6]:port".
+    :return: A tuple (host, port), port is None when the target has no port.
+    """
+    if target.startswith("["):
+        host, _, port = target[1:].partition("]:")
+        return host.rstrip("]"), int(port) if port.isdigit() else None
+    host, separator, port = target.rpartition(":")
+    if separator and ":" not in host and port.isdigit():
+        return host, int(port)
+    return target, None
+
+
+def probe_reachability(target, timeout=PROBE_TIMEOUT):
+    """
+    Send a single reachability probe through the tunnel.
+    A "host:port" target is probed with a TCP connection, a refused connection also proves
+    that the host answered, so the probe works when ICMP is filtered. A bare host is probed
+    with a single ping.
+
+    :param target: The host, or "host:port", to probe.
+    :param timeout: Maximum time in seconds to wait for an answer.
+    :return: True if the target answered, False otherwise.
+    """
+    host, port = split_target(target)
+    if port is not None:
+        try:
+            with socket.create_connection((host, port), timeout=timeout):
+                return True
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+    system = platform.system()
+    if system == "Windows":
+        command = ["ping", "-n", "1", "-w", str(int(timeout * 1000)), target]
+    elif system == "Darwin":
+        command = ["ping", "-c", "1", "-t", str(max(1, int(round(timeout)))), target]
+    else:
+        command = ["ping", "-c", "1", "-W", str(max(1, int(round(timeout)))), target]
+    try:
+        # Simultaneous probes of the same target share one ping, the result is not kept
+        return runner.run(command, timeout=timeout + 1, read_only=True, cache_ttl=0).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def evaluate(interface, probe_target=None, probe_timeout=PROBE_TIMEOUT, handshake_timeout=HANDSHAKE_TIMEOUT, now=None, probe=probe_reachability):
+    """
+    Decide the health of an interface from its parsed dump.
+
+    :param interface: The InterfaceStatus, or None if the interface does not exist.
+    :param probe_target: The host, or "host:port", probed when the handshake is not recent, None to skip.
+    :param probe_timeout: Maximum time in seconds to wait for the probe.
+    :param handshake_timeout: Maximum age in seconds of a handshake that proves the tunnel is up.
+    :param now: The current UNIX time, defaults to time.time().
+    :param probe: The function called as probe(target, timeout) to probe the target.
+    :return: A tuple (status, reason, latest peer).
+    """
+    if interface is None:
+        return "Stopped", REASON_NO_INTERFACE, None
+    peer = interface.latest_peer()
+    if peer is None:
+        return "Stopped", REASON_NO_PEERS, None
+    age = peer.handshake_age(now)
+    if age is not None and age <= handshake_timeout:
+        return "Running", REASON_HANDSHAKE_RECENT, peer
+    if probe_target:
+        if probe(probe_target, probe_timeout):
+            return "Running", REASON_PROBE_OK, peer
+        return "Stopped", REASON_PROBE_FAILED, peer
+    return "Stopped", REASON_NO_HANDSHAKE if age is None else REASON_HANDSHAKE_STALE, peer
+
+
+def check_health(interface_name, probe_target=None, probe_timeout=PROBE_TIMEOUT, handshake_timeout=HANDSHAKE_TIMEOUT, command_prefix=None, reader=None):
+    """
+    Check the health of a WireGuard interface.
+
+    :param interface_name: The name of the interface.
+    :param probe_target: The host, or "host:port", probed when the handshake is not recent, None to skip.
+    :param probe_timeout: Maximum time in seconds to wait for the probe.
+    :param handshake_timeout: Maximum age in seconds of a handshake that proves the tunnel is up.
+    :param command_prefix: Arguments placed before the wg command, e.g. ["sudo", "-n"].
+    :param reader: A function returning the output of `wg show <interface> dump` for an interface
+        name, or None if it does not exist, used instead of running wg.
+    :return: The HealthResult.
+    """
+    start = time.perf_counter()
+    try:
+        output = reader(interface_name) if reader is not None else read_dump(interface_name, command_prefix)
+        interface = parse_dump(output, interface_name) if output is not None else None
+    except (OSError, ValueError, subprocess.SubprocessError) as e:
+        print(f"Error reading WireGuard interface {interface_name}: {e}")
+        return HealthResult(interface_name, "Stopped", REASON_ERROR, elapsed=(time.perf_counter() - start) * 1000)
+    status, reason, peer = evaluate(interface, probe_target, probe_timeout, handshake_timeout)
+    return make_result(interface_name, interface, status, reason, peer, start)
+
+
+def make_result(interface_name, interface, status, reason, peer, start):
+    """
+    Build the HealthResult of an evaluated interface.
+
+    :param interface_name: The name of the interface.
+    :param interface: The InterfaceStatus, or None if the interface does not exist.
+    :param status: "Running" or "Stopped".
+    :param reason: One of the REASON_* codes.
+    :param peer: The peer with the most recent handshake, or None.
+    :param start: The time.perf_counter() value at the start of the check.
+    :return: The HealthResult.
+    """
+    return HealthResult(
+        interface_name,
+        status,
+        reason,
+        handshake_age=peer.handshake_age() if peer is not None else None,
+        rx_bytes=interface.rx_bytes() if interface is not None else 0,
+        tx_bytes=interface.tx_bytes() if interface is not None else 0,
+        endpoint=peer.endpoint if peer is not None else None,
+        elapsed=(time.perf_counter() - start) * 1000,
+    )
@@ -0,0 +1,413 @@
+"""
+Windows tunnel services
+-----------------------
+WireGuard for Windows runs each tunnel as a service named WireGuardTunnel$<tunnel>. This module
+starts and stops them and waits for their state to change through the Service Control Manager:
+NotifyServiceStatusChangeW queues a callback as soon as the service reports a new state, the
+waiting thread sleeps in an alertable wait until then. No sc query process is started and a
+transition is seen within milliseconds instead of at the next poll.
+The ServiceController only talks to a ServiceControlManager. WindowsServiceControlManager calls
+advapi32 through ctypes, FakeServiceControlManager simulates services in memory so the state
+transitions can be exercised and benchmarked on any system (see benchmarks/windows_service_benchmark.py).
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import ctypes
+import threading
+import time
+
+# Service states, as reported by QueryServiceStatusEx
+SERVICE_STOPPED = 1
+SERVICE_START_PENDING = 2
+SERVICE_STOP_PENDING = 3
+SERVICE_RUNNING = 4
+SERVICE_CONTINUE_PENDING = 5
+SERVICE_PAUSE_PENDING = 6
+SERVICE_PAUSED = 7
+PENDING_STATES = (SERVICE_START_PENDING, SERVICE_STOP_PENDING, SERVICE_CONTINUE_PENDING, SERVICE_PAUSE_PENDING)
+STATE_NAMES = {
+    SERVICE_STOPPED: "stopped",
+    SERVICE_START_PENDING: "start pending",
+    SERVICE_STOP_PENDING: "stop pending",
+    SERVICE_RUNNING: "running",
+    SERVICE_CONTINUE_PENDING: "continue pending",
+    SERVICE_PAUSE_PENDING: "pause pending",
+    SERVICE_PAUSED: "paused",
+}
+
+SC_MANAGER_CONNECT = 0x0001
+SERVICE_QUERY_STATUS = 0x0004
+SERVICE_START = 0x0010
+SERVICE_STOP = 0x0020
+SERVICE_CONTROL_STOP = 0x00000001
+SC_STATUS_PROCESS_INFO = 0
+SERVICE_NOTIFY_STATUS_CHANGE = 2
+ALL_STATES_MASK = 0x7f
+WAIT_IO_COMPLETION = 0xc0
+ERROR_SERVICE_ALREADY_RUNNING = 1056
+ERROR_SERVICE_DOES_NOT_EXIST = 1060
+ERROR_SERVICE_NOT_ACTIVE = 1062
+ERROR_SERVICE_NOTIFY_CLIENT_LAGGING = 1294
+
+
+def get_service_name(tunnel_name):
+    """
+    :param tunnel_name: The name of the tunnel.
+    :return: The name of the service of the tunnel.
+    """
+    return f"WireGuardTunnel${tunnel_name}"
+
+
+def get_notify_mask(state):
+    """
+    :param state: A service state.
+    :return: The SERVICE_NOTIFY_* flag of the state.
+    """
+    return 1 << (state - 1)
+
+
+class ServiceControlManager:
+    """
+    Access to the services of the system.
+    """
+
+    def query(self, name):
+        """
+        :param name: The name of the service.
+        :return: The current state of the service, None if it is not installed.
+        """
+        raise NotImplementedError
+
+    def start(self, name):
+        """
+        Ask a service to start, without waiting. A service that is already running is not an error.
+
+        :param name: The name of the service.
+        :raises OSError: If the service cannot be started.
+        """
+        raise NotImplementedError
+
+    def stop(self, name):
+        """
+        Ask a service to stop, without waiting. A service that is not running is not an error.
+
+        :param name: The name of the service.
+        :raises OSError: If the service cannot be stopped.
+        """
+        raise NotImplementedError
+
+    def wait_for_change(self, name, state, timeout):
+        """
+        Wait until a service leaves a state.
+
+        :param name: The name of the service.
+        :param state: The state the service is known to be in.
+        :param timeout: Maximum time in seconds to wait.
+        :return: The new state, the same state if the timeout expired, None if the service is not installed.
+        """
+        raise NotImplementedError
+
+
+class SERVICE_STATUS(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_uint32) for name in (
+        "dwServiceType", "dwCurrentState", "dwControlsAccepted", "dwWin32ExitCode",
+        "dwServiceSpecificExitCode", "dwCheckPoint", "dwWaitHint",
+    )]
+
+
+class SERVICE_STATUS_PROCESS(ctypes.Structure):
+    _fields_ = SERVICE_STATUS._fields_ + [("dwProcessId", ctypes.c_uint32), ("dwServiceFlags", ctypes.c_uint32)]
+
+
+class SERVICE_NOTIFY(ctypes.Structure):
+    _fields_ = [
+        ("dwVersion", ctypes.c_uint32),
+        ("pfnNotifyCallback", ctypes.c_void_p),
+        ("pContext", ctypes.c_void_p),
+        ("dwNotificationStatus", ctypes.c_uint32),
+        ("ServiceStatus", SERVICE_STATUS_PROCESS),
+        ("dwNotificationTriggered", ctypes.c_uint32),
+        ("pszServiceNames", ctypes.c_wchar_p),
+    ]
+
+
+class WindowsServiceControlManager(ServiceControlManager):
+    """
+    The Service Control Manager of Windows, called through advapi32.
+    """
+
+    def __init__(self):
+        """
+        Initialize the WindowsServiceControlManager and connect to the Service Control Manager.
+
+        :raises OSError: If the Service Control Manager cannot be opened.
+        """
+        self.advapi32 = ctypes.WinDLL("advapi32", use_last_error=True)
+        self.kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = ctypes.c_void_p
+        self.advapi32.OpenSCManagerW.argtypes = [ctypes.c_wchar_p, ctypes.c_wchar_p, ctypes.c_uint32]
+        self.advapi32.OpenSCManagerW.restype = handle
+        self.advapi32.OpenServiceW.argtypes = [handle, ctypes.c_wchar_p, ctypes.c_uint32]
+        self.advapi32.OpenServiceW.restype = handle
+        self.advapi32.CloseServiceHandle.argtypes = [handle]
+        self.advapi32.QueryServiceStatusEx.argtypes = [handle, ctypes.c_int, ctypes.c_void_p, ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32)]
+        self.advapi32.StartServiceW.argtypes = [handle, ctypes.c_uint32, ctypes.c_void_p]
+        self.advapi32.ControlService.argtypes = [handle, ctypes.c_uint32, ctypes.POINTER(SERVICE_STATUS)]
+        self.advapi32.NotifyServiceStatusChangeW.argtypes = [handle, ctypes.c_uint32, ctypes.POINTER(SERVICE_NOTIFY)]
+        self.advapi32.NotifyServiceStatusChangeW.restype = ctypes.c_uint32
+        self.kernel32.SleepEx.argtypes = [ctypes.c_uint32, ctypes.c_bool]
+        self.kernel32.SleepEx.restype = ctypes.c_uint32
+        # The callback only has to exist, the alertable wait returns once it ran
+        self.callback = ctypes.WINFUNCTYPE(None, ctypes.c_void_p)(lambda context: None)
+        self.manager = self.advapi32.OpenSCManagerW(None, None, SC_MANAGER_CONNECT)
+        if not self.manager:
+            raise ctypes.WinError(ctypes.get_last_error())
+
+    def open_service(self, name, access):
+        """
+        :param name: The name of the service.
+        :param access: The access rights requested.
+        :return: The handle of the service, None if it is not installed.
+        :raises OSError: If the service cannot be opened.
+        """
+        service = self.advapi32.OpenServiceW(self.manager, name, access)
+        if not service:
+            error = ctypes.get_last_error()
+            if error == ERROR_SERVICE_DOES_NOT_EXIST:
+                return None
+            raise ctypes.WinError(error)
+        return service
+
+    def query_handle(self, service):
+        """
+        :param service: The handle of the service.
+        :return: The current state of the service.
+        """
+        status = SERVICE_STATUS_PROCESS()
+        needed = ctypes.c_uint32()
+        if not self.advapi32.QueryServiceStatusEx(service, SC_STATUS_PROCESS_INFO, ctypes.byref(status), ctypes.sizeof(status), ctypes.byref(needed)):
+            raise ctypes.WinError(ctypes.get_last_error())
+        return status.dwCurrentState
+
+    def query(self, name):
+        service = self.open_service(name, SERVICE_QUERY_STATUS)
+        if service is None:
+            return None
+        try:
+            return self.query_handle(service)
+        finally:
+            self.advapi32.CloseServiceHandle(service)
+
+    def start(self, name):
+        service = self.open_service(name, SERVICE_START)
+        if service is None:
+            raise OSError(f"Service {name} is not installed")
+        try:
+            if not self.advapi32.StartServiceW(service, 0, None):
+                error = ctypes.get_last_error()
+                if error != ERROR_SERVICE_ALREADY_RUNNING:
+                    raise ctypes.WinError(error)
+        finally:
+            self.advapi32.CloseServiceHandle(service)
+
+    def stop(self, name):
+        service = self.open_service(name, SERVICE_STOP)
+        if service is None:
+            raise OSError(f"Service {name} is not installed")
+        try:
+            status = SERVICE_STATUS()
+            if not self.advapi32.ControlService(service, SERVICE_CONTROL_STOP, ctypes.byref(status)):
+                error = ctypes.get_last_error()
+                if error != ERROR_SERVICE_NOT_ACTIVE:
+                    raise ctypes.WinError(error)
+        finally:
+            self.advapi32.CloseServiceHandle(service)
+
+    def wait_for_change(self, name, state, timeout):
+        service = self.open_service(name, SERVICE_QUERY_STATUS)
+        if service is None:
+            return None
+        try:
+            notify = SERVICE_NOTIFY()
+            notify.dwVersion = SERVICE_NOTIFY_STATUS_CHANGE
+            notify.pfnNotifyCallback = ctypes.cast(self.callback, ctypes.c_void_p)
+            # A service already in one of the states of the mask is notified at once
+            error = self.advapi32.NotifyServiceStatusChangeW(service, ALL_STATES_MASK & ~get_notify_mask(state), ctypes.byref(notify))
+            if error == ERROR_SERVICE_NOTIFY_CLIENT_LAGGING:
+                return self.query_handle(service)
+            if error:
+                raise ctypes.WinError(error)
+            deadline = time.monotonic() + timeout
+            while not notify.dwNotificationTriggered:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return state
+                # Returns early when the notification callback ran on this thread
+                self.kernel32.SleepEx(max(1, int(remaining * 1000)), True)
+            if notify.dwNotificationStatus:
+                return self.query_handle(service)
+            return notify.ServiceStatus.dwCurrentState
+        finally:
+            # Closing the handle also cancels a notification that did not come
+            self.advapi32.CloseServiceHandle(service)
+
+
+class FakeServiceControlManager(ServiceControlManager):
+    """
+    Services simulated in memory: a started service is start pending then running after a
+    delay, a stopped one is stop pending then stopped.
+    """
+
+    def __init__(self, start_delay=0.05, stop_delay=0.05):
+        """
+        Initialize the FakeServiceControlManager.
+
+        :param start_delay: Time in seconds a service stays start pending.
+        :param stop_delay: Time in seconds a service stays stop pending.
+        """
+        self.start_delay = start_delay
+        self.stop_delay = stop_delay
+        self.states = {}
+        # The services that stop again instead of running
+        self.failing = set()
+        # Time at which each service reached its current state
+        self.changed_at = {}
+        self.queries = 0
+        self.condition = threading.Condition()
+
+    def install(self, name, state=SERVICE_STOPPED):
+        self.set_state(name, state)
+
+    def set_state(self, name, state):
+        with self.condition:
+            self.states[name] = state
+            self.changed_at[name] = time.perf_counter()
+            self.condition.notify_all()
+
+    def query(self, name):
+        with self.condition:
+            self.queries += 1
+            return self.states.get(name)
+
+    def start(self, name):
+        with self.condition:
+            state = self.states.get(name)
+            if state is None:
+                raise OSError(f"Service {name} is not installed")
+            if state != SERVICE_STOPPED:
+                return
+            self.set_state(name, SERVICE_START_PENDING)
+        final_state = SERVICE_STOPPED if name in self.failing else SERVICE_RUNNING
+        threading.Timer(self.start_delay, self.set_state, (name, final_state)).start()
+
+    def stop(self, name):
+        with self.condition:
+            state = self.states.get(name)
+            if state is None:
+                raise OSError(f"Service {name} is not installed")
+            if state != SERVICE_RUNNING:
+                return
+            self.set_state(name, SERVICE_STOP_PENDING)
+        threading.Timer(self.stop_delay, self.set_state, (name, SERVICE_STOPPED)).start()
+
+    def wait_for_change(self, name, state, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.states.get(name) != state, timeout)
+            return self.states.get(name)
+
+
+class ServiceController:
+    """
+    Starts and stops services and waits for them to settle.
+    """
+
+    def __init__(self, scm):
+        """
+        Initialize the ServiceController.
+
+        :param scm: The ServiceControlManager.
+        """
+        self.scm = scm
+
+    def query(self, name):
+        """
+        :param name: The name of the service.
+        :return: The current state of the service, None if it is not installed.
+        """
+        return self.scm.query(name)
+
+    def wait_until_settled(self, name, state, timeout):
+        """
+        Follow the transitions of a service until it is no longer in a pending state.
+
+        :param name: The name of the service.
+        :param state: The current state of the service.
+        :param timeout: Maximum time in seconds to wait.
+        :return: The settled state, a pending state if the timeout expired, None if the service is not installed.
+        """
+        deadline = time.monotonic() + timeout
+        while state in PENDING_STATES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            state = self.scm.wait_for_change(name, state, remaining)
+        return state
+
+    def change(self, name, target, timeout):
+        """
+        Bring a service to the running or stopped state.
+
+        :param name: The name of the service.
+        :param target: SERVICE_RUNNING or SERVICE_STOPPED.
+        :param timeout: Maximum time in seconds to wait.
+        :return: The state of the service at the end, equal to the target on success.
+        :raises OSError: If the service is not installed or refused the request.
+        """
+        deadline = time.monotonic() + timeout
+        state = self.scm.query(name)
+        if state is None:
+            raise OSError(f"Service {name} is not installed")
+        # A previous start or stop may still be in progress
+        state = self.wait_until_settled(name, state, timeout)
+        if state == target:
+            return state
+        if target == SERVICE_RUNNING:
+            self.scm.start(name)
+        else:
+            self.scm.stop(name)
+        # The request is accepted before the state leaves the settled one
+        state = self.scm.query(name)
+        if state != target and state not in PENDING_STATES:
+            state = self.scm.wait_for_change(name, state, max(0.0, deadline - time.monotonic()))
+        return self.wait_until_settled(name, state, max(0.0, deadline - time.monotonic()))
+
+    def start(self, name, timeout):
+        """
+        :return: True if the service is running before the timeout.
+        """
+        return self.change(name, SERVICE_RUNNING, timeout) == SERVICE_RUNNING
+
+    def stop(self, name, timeout):
+        """
+        :return: True if the service is stopped before the timeout.
+        """
+        return self.change(name, SERVICE_STOPPED, timeout) == SERVICE_STOPPED
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    """
+    Get the controller of the Windows services, connected on first use.
+
+    :return: The ServiceController.
+    :raises OSError: If the Service Control Manager cannot be opened.
+    """
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = ServiceController(WindowsServiceControlManager())
+        return _controller
@@ -0,0 +1,250 @@
+"""
+This script is used to record what the machine offers to the application: the flavor of the
+platform (including WSL), whether the application runs with administrator rights, and the
+path and version of the WireGuard tools. They are probed once at start-up on a background
+thread and read afterwards without running any command.
+The directories of the tools are watched with the DirWatcher, installing or removing WireGuard
+probes the tools again. refresh() probes everything again on demand.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import os
+import platform
+import shutil
+import subprocess
+import threading
+from utils import dir_watcher
+from utils.command_runner import runner
+from utils.platform_info import identify_system
+
+TOOL_NAMES = ("wg", "wg-quick")
+# Directories searched in addition to PATH, the application may be started without a login shell
+EXTRA_TOOL_DIRS = {
+    "mac": ("/opt/homebrew/bin", "/usr/local/bin", "/usr/bin", "/bin"),
+    "windows": ("C:\\Program Files\\WireGuard",),
+}
+# Directories where installing WireGuard puts the tools, watched while they are missing
+INSTALL_DIRS = {
+    "linux": ("/usr/bin", "/usr/local/bin"),
+    "wsl": ("/usr/bin", "/usr/local/bin"),
+    "mac": ("/opt/homebrew/bin", "/usr/local/bin"),
+    "windows": ("C:\\Program Files\\WireGuard",),
+}
+VERSION_TIMEOUT = 5
+# The directories are polled when inotify is not available
+POLL_INTERVAL = 5.0
+# Changes are grouped, installing a package writes several files
+REFRESH_DELAY = 0.5
+
+
+class ToolInfo:
+    """
+    A command line tool found on the machine.
+    """
+
+    __slots__ = ("name", "path", "version")
+
+    def __init__(self, name, path, version=None):
+        """
+        Initialize the ToolInfo.
+
+        :param name: The name of the tool, e.g. "wg".
+        :param path: The full path to the executable.
+        :param version: The first line printed by the tool with --version, None if unknown.
+        """
+        self.name = name
+        self.path = path
+        self.version = version
+
+    def __repr__(self):
+        return f"ToolInfo({self.name}, {self.path}, {self.version})"
+
+
+class Capabilities:
+    """
+    The capabilities probed at one time, never modified afterwards.
+    """
+
+    __slots__ = ("system", "release", "machine", "is_admin", "tools")
+
+    def __init__(self, system, release, machine, is_admin, tools):
+        """
+        Initialize the Capabilities.
+
+        :param system: The flavor of the platform, see platform_info.identify_system.
+        :param release: The release of the operating system.
+        :param machine: The machine type, e.g. "x86_64".
+        :param is_admin: True if the application runs with administrator rights.
+        :param tools: A dictionary of ToolInfo by tool name, for the tools found.
+        """
+        self.system = system
+        self.release = release
+        self.machine = machine
+        self.is_admin = is_admin
+        self.tools = tools
+
+
+def check_admin():
+    """
+    :return: True if the application runs as root or as an administrator on Windows.
+    """
+    if platform.system() == "Windows":
+        try:
+            import ctypes
+            return bool(ctypes.windll.shell32.IsUserAnAdmin())
+        except (AttributeError, OSError):
+            return False
+    return os.geteuid() == 0
+
+
+def get_search_path(system):
+    """
+    :param system: The flavor of the platform.
+    :return: The PATH searched for the tools.
+    """
+    directories = os.environ.get("PATH", "").split(os.pathsep)
+    directories.extend(directory for directory in EXTRA_TOOL_DIRS.get(system, ()) if directory not in directories)
+    return os.pathsep.join(directories)
+
+
+def find_tool(name, search_path):
+    """
+    :param name: The name of the tool.
+    :param search_path: The PATH searched.
+    :return: The ToolInfo, or None if the tool is not installed.
+    """
+    path = shutil.which(name, path=search_path)
+    if path is None:
+        return None
+    version = None
+    if name == "wg":
+        try:
+            result = runner.run([path, "--version"], timeout=VERSION_TIMEOUT)
+            version = (result.stdout or result.stderr).strip().splitlines()[0] if result.returncode == 0 else None
+        except (OSError, IndexError, subprocess.TimeoutExpired):
+            pass
+    return ToolInfo(name, path, version)
+
+
+def probe():
+    """
+    Probe the capabilities of the machine, this runs commands.
+
+    :return: The Capabilities.
+    """
+    system = identify_system()
+    uname = platform.uname()
+    search_path = get_search_path(system)
+    tools = {}
+    for name in TOOL_NAMES:
+        tool = find_tool(name, search_path)
+        if tool is not None:
+            tools[name] = tool
+    return Capabilities(system, uname.release, uname.machine, check_admin(), tools)
+
+
+class CapabilityRegistry:
+    """
+    The capabilities of the machine, probed once and refreshed when the tools change.
+    """
+
+    def __init__(self):
+        """
+        Initialize the CapabilityRegistry, nothing is probed before start() or the first read.
+        """
+        self.capabilities = None
+        self.watchers = {}
+        self.rescanned = set()
+        self.refresh_timer = None
+        self.lock = threading.RLock()
+
+    def start(self):
+        """
+        Probe the capabilities on a background thread and watch the directories of the tools.
+        """
+        threading.Thread(target=self.refresh, name="capabilities", daemon=True).start()
+
+    def stop(self):
+        """
+        Stop watching the directories of the tools.
+        """
+        with self.lock:
+            for watcher in self.watchers.values():
+                watcher.stop()
+            self.watchers.clear()
+            if self.refresh_timer is not None:
+                self.refresh_timer.cancel()
+
+    def get(self):
+        """
+        Get the capabilities, they are probed on the calling thread if start() did not finish yet.
+
+        :return: The Capabilities.
+        """
+        capabilities = self.capabilities
+        if capabilities is None:
+            with self.lock:
+                # The background probe may have finished while waiting for the lock
+                capabilities = self.capabilities or self.refresh()
+        return capabilities
+
+    def refresh(self):
+        """
+        Probe the capabilities again and watch the directories of the tools.
+
+        :return: The Capabilities.
+        """
+        with self.lock:
+            capabilities = probe()
+            self.capabilities = capabilities
+            directories = {os.path.dirname(tool.path) for tool in capabilities.tools.values()}
+            if len(capabilities.tools) < len(TOOL_NAMES):
+                directories.update(directory for directory in INSTALL_DIRS.get(capabilities.system, ()) if os.path.isdir(directory))
+            for directory in directories - self.watchers.keys():
+                watcher = dir_watcher.DirWatcher(directory, lambda event, name, directory=directory: self.on_change(directory, event, name), interval=POLL_INTERVAL)
+                self.watchers[directory] = watcher
+                watcher.start()
+        return capabilities
+
+    def on_change(self, directory, event, name):
+        """
+        Probe the tools again after a change of one of them, on the watcher thread.
+
+        :param directory: The watched directory.
+        :param event: The dir_watcher event.
+        :param name: The name of the changed file, None for a rescan.
+        """
+        if event == dir_watcher.RESCAN:
+            # Each watcher lists its directory once when it starts, nothing changed yet
+            if directory not in self.rescanned:
+                self.rescanned.add(directory)
+                return
+        elif os.path.splitext(name)[0] not in TOOL_NAMES:
+            return
+        with self.lock:
+            if self.refresh_timer is not None:
+                self.refresh_timer.cancel()
+            self.refresh_timer = threading.Timer(REFRESH_DELAY, self.refresh)
+            self.refresh_timer.daemon = True
+            self.refresh_timer.start()
+
+    def get_tool_path(self, name):
+        """
+        :param name: The name of the tool, e.g. "wg-quick".
+        :return: The full path to the tool, or None if it is not installed.
+        """
+        tool = self.get().tools.get(name)
+        return tool.path if tool is not None else None
+
+    def has_tools(self, *names):
+        """
+        :param names: The names of the tools.
+        :return: True if every tool is installed.
+        """
+        tools = self.get().tools
+        return all(name in tools for name in names)
+
+
+# Registry shared by the whole application
+registry = CapabilityRegistry()
@@ -0,0 +1,254 @@
+"""
+This script is used to run the external commands of the application, such as wg, sc or ping.
+Every command has a timeout and runs on a bounded pool of worker threads, so a burst of status
+checks cannot start dozens of processes at once. Read-only commands are deduplicated: a caller
+asking for a command that is already running waits for its result instead of starting it
+again, and the result is kept for a short time. Any other command may change what the
+read-only ones return, the kept results are dropped when it finishes. The latency of every command is recorded and
+shown in the Settings screen.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    DEFAULT_TIMEOUT = float(os.environ.get("RESISTINE_COMMAND_TIMEOUT", "30"))
+except ValueError:
+    DEFAULT_TIMEOUT = 30.0
+try:
+    CACHE_TTL = float(os.environ.get("RESISTINE_COMMAND_CACHE_TTL", "1.0"))
+except ValueError:
+    CACHE_TTL = 1.0
+MAX_WORKERS = 4
+
+
+class CommandResult:
+    """
+    The outcome of a command, shared by the callers of a deduplicated command.
+    """
+
+    __slots__ = ("args", "returncode", "stdout", "stderr", "elapsed", "finished_at")
+
+    def __init__(self, args, returncode, stdout, stderr, elapsed):
+        """
+        Initialize the CommandResult.
+
+        :param args: The arguments of the command.
+        :param returncode: The exit code of the command.
+        :param stdout: The standard output, as text.
+        :param stderr: The standard error, as text.
+        :param elapsed: The duration of the command in milliseconds.
+        """
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.elapsed = elapsed
+        self.finished_at = time.monotonic()
+
+    def check_returncode(self):
+        """
+        :raises subprocess.CalledProcessError: If the command failed.
+        """
+        if self.returncode != 0:
+            raise subprocess.CalledProcessError(self.returncode, self.args, self.stdout, self.stderr)
+
+    def __repr__(self):
+        return f"CommandResult({self.args!r}, returncode={self.returncode}, {self.elapsed:.0f} ms)"
+
+
+class CommandStats:
+    """
+    Latency statistics of a command.
+    """
+
+    __slots__ = ("count", "cached", "deduplicated", "failures", "timeouts", "total_time", "max_time")
+
+    def __init__(self):
+        self.count = 0
+        self.cached = 0
+        self.deduplicated = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def average_time(self):
+        """
+        :return: The average duration of the runs in milliseconds.
+        """
+        return self.total_time / self.count if self.count else 0.0
+
+
+def get_command_name(args):
+    """
+    :param args: The arguments of a command.
+    :return: The name used for the statistics, e.g. "wg show" for ["/usr/bin/wg", "show", "all", "dump"].
+    """
+    name = os.path.basename(args[0])
+    for arg in args[1:]:
+        if not arg.startswith("-"):
+            return f"{name} {arg}"
+    return name
+
+
+class CommandRunner:
+    """
+    Runs commands on a bounded pool of threads, with timeouts, deduplication and caching of read-only commands.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, timeout=DEFAULT_TIMEOUT, cache_ttl=CACHE_TTL):
+        """
+        Initialize the CommandRunner, the threads are started on the first command.
+
+        :param max_workers: The maximum number of commands running at the same time.
+        :param timeout: The default timeout of a command in seconds.
+        :param cache_ttl: The default time in seconds the result of a read-only command is kept.
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.executor = None
+        self.in_flight = {}
+        self.results = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        """
+        Get the pool of threads, called with the lock held.
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="command")
+        return self.executor
+
+    def run(self, args, timeout=None, input=None, read_only=False, cache_ttl=None, check=False, cache_key=None):
+        """
+        Run a command and wait for its result.
+
+        :param args: The arguments of the command.
+        :param timeout: Maximum time in seconds to wait for the command, the default timeout if None.
+        :param input: Text written to the standard input of the command.
+        :param read_only: True if the command does not change the system, identical read-only
+            commands are run once and their result is shared and cached.
+        :param cache_ttl: The time in seconds the result is kept, the default time if None, 0 to not cache it.
+        :param check: True to raise subprocess.CalledProcessError if the command failed.
+        :param cache_key: The key identifying a read-only command, the arguments if None, e.g. when
+            the arguments hold a temporary file.
+        :return: The CommandResult.
+        :raises subprocess.TimeoutExpired: If the command did not finish in time.
+        :raises OSError: If the command cannot be started.
+        """
+        args = list(args)
+        timeout = self.timeout if timeout is None else timeout
+        name = get_command_name(args)
+        if not read_only:
+            with self.lock:
+                executor = self.get_executor()
+            try:
+                result = executor.submit(self.execute, args, timeout, input).result()
+            finally:
+                self.invalidate()
+        else:
+            key = cache_key if cache_key is not None else (tuple(args), input)
+            ttl = self.cache_ttl if cache_ttl is None else cache_ttl
+            with self.lock:
+                cached = self.results.get(key)
+                if cached is not None and time.monotonic() - cached.finished_at < ttl:
+                    self.get_stats(name).cached += 1
+                    future = None
+                else:
+                    future = self.in_flight.get(key)
+                    if future is not None:
+                        self.get_stats(name).deduplicated += 1
+                        owner = False
+                    else:
+                        future = self.in_flight[key] = self.get_executor().submit(self.execute, args, timeout, input)
+                        owner = True
+            if future is None:
+                result = cached
+            else:
+                try:
+                    result = future.result()
+                finally:
+                    if owner:
+                        with self.lock:
+                            self.in_flight.pop(key, None)
+                            if future.exception() is None and ttl > 0:
+                                self.results[key] = future.result()
+        if check:
+            result.check_returncode()
+        return result
+
+    def execute(self, args, timeout, input):
+        """
+        Run a command on a thread of the pool and record its latency.
+
+        :return: The CommandResult.
+        """
+        name = get_command_name(args)
+        start = time.perf_counter()
+        try:
+            completed = subprocess.run(args, input=input, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.record(name, start, failed=True, timed_out=True)
+            raise
+        except OSError:
+            self.record(name, start, failed=True)
+            raise
+        elapsed = self.record(name, start, failed=completed.returncode != 0)
+        return CommandResult(args, completed.returncode, completed.stdout, completed.stderr, elapsed)
+
+    def record(self, name, start, failed=False, timed_out=False):
+        """
+        :return: The duration of the command in milliseconds.
+        """
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            stats = self.get_stats(name)
+            stats.count += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            stats.failures += failed
+            stats.timeouts += timed_out
+        return elapsed
+
+    def get_stats(self, name):
+        """
+        Get the statistics of a command, called with the lock held.
+        """
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = CommandStats()
+        return stats
+
+    def invalidate(self):
+        """
+        Forget the cached results, e.g. after a tunnel was brought up or down without a command.
+        """
+        with self.lock:
+            self.results.clear()
+
+    def format(self):
+        """
+        Format the statistics of the commands as a table.
+
+        :return: The statistics as a string.
+        """
+        with self.lock:
+            lines = [f"{'Command':<22}{'runs':>6}{'cached':>8}{'shared':>8}{'failed':>8}{'timeout':>9}{'avg ms':>10}{'max ms':>10}"]
+            for name, stats in sorted(self.stats.items()):
+                lines.append(
+                    f"{name:<22}{stats.count:>6}{stats.cached:>8}{stats.deduplicated:>8}{stats.failures:>8}{stats.timeouts:>9}"
+                    f"{stats.average_time():>10.1f}{stats.max_time:>10.1f}"
+                )
+        return "\n".join(lines)
+
+
+# Runner shared by the whole application
+runner = CommandRunner()
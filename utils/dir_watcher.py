@@ -0,0 +1,207 @@
+"""
+This script is used to watch a directory for files that are added, modified or removed.
+On Linux the changes come from inotify, read through ctypes so no extra package is needed,
+and other systems fall back to comparing the modification times of the files at an interval.
+The callback runs on the watcher thread, callers hand the changes to the Tk thread themselves.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import ctypes
+import ctypes.util
+import os
+import platform
+import select
+import struct
+import threading
+
+# inotify event masks, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o0004000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+# Events passed to the callback
+ADDED = "added"
+MODIFIED = "modified"
+REMOVED = "removed"
+RESCAN = "rescan"
+
+
+def load_inotify():
+    """
+    Load the inotify functions of the C library.
+
+    :return: The C library, or None if inotify is not available.
+    """
+    if platform.system() != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+def scan_directory(path, suffix=None):
+    """
+    Get the modification time and size of the files of a directory.
+
+    :param path: The path to the directory.
+    :param suffix: Only list the files ending with this suffix, None for every file.
+    :return: A dictionary of (mtime, size) by file name.
+    """
+    files = {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if (suffix is None or entry.name.endswith(suffix)) and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        pass
+    return files
+
+
+class DirWatcher(threading.Thread):
+    """
+    Background thread that reports the changes of the files of a directory.
+    """
+
+    def __init__(self, path, callback, suffix=None, interval=1.0, use_inotify=True):
+        """
+        Initialize the DirWatcher.
+
+        :param path: The path to the directory.
+        :param callback: The function called as callback(event, file_name) on the watcher thread,
+            event is ADDED, MODIFIED, REMOVED, or RESCAN with a None file name when changes
+            may have been missed and the directory must be listed again.
+        :param suffix: Only report the files ending with this suffix, None for every file.
+        :param interval: Time in seconds between two scans when polling.
+        :param use_inotify: False to always poll.
+        """
+        super().__init__(name=f"dir-watcher-{os.path.basename(path)}", daemon=True)
+        self.path = path
+        self.callback = callback
+        self.suffix = suffix
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self.stop_event = threading.Event()
+        self.mode = None
+
+    def stop(self):
+        """
+        Stop watching, the thread exits within one interval.
+        """
+        self.stop_event.set()
+
+    def emit(self, event, name):
+        """
+        Call the callback for a file matching the suffix.
+
+        :param event: The event.
+        :param name: The file name, or None.
+        """
+        if name is not None and self.suffix is not None and not name.endswith(self.suffix):
+            return
+        try:
+            self.callback(event, name)
+        except Exception as e:
+            print(f"Error handling change of {name} in {self.path}: {e}")
+
+    def run(self):
+        """
+        Watch the directory with inotify if possible, else poll it.
+        """
+        libc = load_inotify() if self.use_inotify else None
+        if libc is not None and self.watch_inotify(libc):
+            return
+        self.poll()
+
+    def watch_inotify(self, libc):
+        """
+        Watch the directory with inotify until stopped.
+
+        :param libc: The C library.
+        :return: True if the watcher was stopped, False if polling must take over.
+        """
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        try:
+            if libc.inotify_add_watch(fd, os.fsencode(self.path), WATCH_MASK) < 0:
+                return False
+            self.mode = "inotify"
+            # Changes made before the watch was added are found by listing the directory once
+            self.emit(RESCAN, None)
+            while not self.stop_event.is_set():
+                readable, _, _ = select.select([fd], [], [], self.interval)
+                if not readable:
+                    continue
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                if not self.handle_events(data):
+                    # The directory itself is gone, keep watching by polling
+                    self.emit(RESCAN, None)
+                    return False
+            return True
+        finally:
+            os.close(fd)
+
+    def handle_events(self, data):
+        """
+        Report the inotify events read from the file descriptor.
+
+        :param data: The bytes read.
+        :return: False if the watched directory has been removed or moved, True otherwise.
+        """
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0")) if length else None
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self.emit(RESCAN, None)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                return False
+            elif name is None:
+                continue
+            elif mask & IN_MOVED_TO:
+                self.emit(ADDED, name)
+            elif mask & IN_CLOSE_WRITE:
+                self.emit(MODIFIED, name)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.emit(REMOVED, name)
+        return True
+
+    def poll(self):
+        """
+        Compare the files of the directory at each interval until stopped.
+        """
+        self.mode = "polling"
+        files = scan_directory(self.path, self.suffix)
+        self.emit(RESCAN, None)
+        while not self.stop_event.wait(self.interval):
+            current = scan_directory(self.path, self.suffix)
+            for name in files.keys() - current.keys():
+                self.emit(REMOVED, name)
+            for name, signature in current.items():
+                previous = files.get(name)
+                if previous is None:
+                    self.emit(ADDED, name)
+                elif previous != signature:
+                    self.emit(MODIFIED, name)
+            files = current
@@ -10,30 +10,10 @@ Licensed under the Apache License 2.0
 from cryptography.fernet import Fernet
 import keyring
 import os
-import platform
 import json
+from utils.capabilities import registry
 
 
-# Identify the system
-def identify_system():
-    """
-    Identify the operating system and return a string representing the system type.
-    
-    :return: A string representing the system type ('linux', 'windows', 'mac', 'wsl', or 'unknown').
-    """
-    system_platform = platform.system().lower()
-
-    if system_platform == "linux":
-        if "microsoft" in platform.uname().release.lower():
-            return "wsl"  # Windows Subsystem for Linux
-        return "linux"
-    elif system_platform == "windows":
-        return "windows"
-    elif system_platform == "darwin":
-        return "mac"
-    else:
-        return "unknown"
-
 # Determine where to store the key according to the system
 def get_key_storage_path():
     """
@@ -41,7 +21,7 @@ def get_key_storage_path():
     
     :return: A string representing the storage path or 'keyring' if using keyring for storage.
     """
-    system_type = identify_system()
+    system_type = registry.get().system
 
     if system_type == "wsl":
         # Store in the virtual environment directory
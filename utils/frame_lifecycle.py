@@ -0,0 +1,237 @@
+"""
+This script is used to manage the lifecycle of the plugin screens of the main window.
+Every top-level plugin frame is tracked, hidden frames are destroyed when the cache goes
+over its budget (number of frames or number of Tk widgets), and a debug mode reports the
+per-plugin growth of widgets and memory after a number of navigations.
+The memory budget is a debugging aid: it compares the memory traced by tracemalloc for the
+whole process, not the cost of each frame, so it is only enforced in debug mode.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import os
+import tracemalloc
+from collections import OrderedDict
+
+
+def count_widgets(widget):
+    """
+    Count a widget and all of its descendants.
+
+    :param widget: The root widget.
+    :return: The number of widgets in the tree.
+    """
+    count = 0
+    stack = [widget]
+    while stack:
+        current = stack.pop()
+        count += 1
+        stack.extend(current.winfo_children())
+    return count
+
+
+class FrameLifecycleManager:
+    """
+    Cache of the top-level plugin frames with LRU eviction under a budget.
+    """
+
+    def __init__(self, root, max_frames=None, max_widgets=None, max_memory=None, debug=False, report_every=20):
+        """
+        Initialize the FrameLifecycleManager.
+
+        :param root: The window that owns the plugin frames.
+        :param max_frames: Maximum number of cached frames, None for no limit.
+        :param max_widgets: Maximum number of Tk widgets in the cached frames, None for no limit.
+        :param max_memory: Maximum memory in bytes traced for the whole process, only enforced while
+            tracemalloc is tracing, e.g. in debug mode. Once it is exceeded every hidden frame is evicted.
+        :param debug: True to trace memory allocations and report per-plugin growth.
+        :param report_every: Number of navigations between two debug reports.
+        """
+        self.root = root
+        self.max_frames = max_frames
+        self.max_widgets = max_widgets
+        self.max_memory = max_memory
+        self.debug = debug
+        self.report_every = report_every
+        self.frames = OrderedDict()
+        self.widget_counts = {}
+        self.visible = None
+        self.navigations = 0
+        self.baseline = {}
+        self.snapshot = None
+        self.known_widgets = []
+        if self.debug:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.snapshot = tracemalloc.take_snapshot()
+        elif self.max_memory is not None and not tracemalloc.is_tracing():
+            print("The memory budget of the frames is ignored, it is only enforced while tracemalloc is tracing (debug mode)")
+
+    def get(self, name):
+        """
+        Get a cached frame.
+
+        :param name: The name of the frame.
+        :return: The frame, or None if it is not cached or has been destroyed.
+        """
+        frame = self.frames.get(name)
+        if frame is not None and not frame.winfo_exists():
+            self.forget(name)
+            return None
+        return frame
+
+    def track(self, name, frame):
+        """
+        Start tracking a newly built frame.
+
+        :param name: The name of the frame.
+        :param frame: The frame built by the plugin.
+        """
+        old_frame = self.frames.get(name)
+        if old_frame is not None and old_frame is not frame:
+            self.invalidate(name)
+        self.frames[name] = frame
+        self.widget_counts[name] = count_widgets(frame)
+        self.baseline.setdefault(name, self.widget_counts[name])
+
+    def show(self, name):
+        """
+        Record that a frame is now the visible one and enforce the budget.
+
+        :param name: The name of the visible frame.
+        """
+        if self.visible in self.frames and self.visible != name:
+            # Widgets may have been added while the previous frame was displayed
+            self.widget_counts[self.visible] = count_widgets(self.frames[self.visible])
+        self.visible = name
+        if name in self.frames:
+            self.frames.move_to_end(name)
+        self.enforce_budget()
+        self.navigations += 1
+        if self.debug and self.navigations % self.report_every == 0:
+            print(self.report())
+
+    def invalidate(self, name):
+        """
+        Destroy a frame so that it is built again on next use.
+
+        :param name: The name of the frame.
+        :return: True if a frame was destroyed, False otherwise.
+        """
+        frame = self.frames.get(name)
+        self.forget(name)
+        if frame is not None and frame.winfo_exists():
+            frame.destroy()
+            return True
+        return False
+
+    def forget(self, name):
+        """
+        Stop tracking a frame without destroying it.
+
+        :param name: The name of the frame.
+        """
+        self.frames.pop(name, None)
+        self.widget_counts.pop(name, None)
+
+    def destroy_all(self):
+        """
+        Destroy every tracked frame.
+        """
+        for name in list(self.frames):
+            self.invalidate(name)
+        self.visible = None
+
+    def total_widgets(self):
+        """
+        Get the number of widgets in the cached frames, as counted when they were last hidden.
+
+        :return: The number of widgets.
+        """
+        return sum(self.widget_counts.values())
+
+    def is_over_budget(self):
+        """
+        Check if the cached frames exceed the configured budget.
+
+        :return: True if a frame should be evicted, False otherwise.
+        """
+        if self.max_frames is not None and len(self.frames) > self.max_frames:
+            return True
+        if self.max_widgets is not None and self.total_widgets() > self.max_widgets:
+            return True
+        if self.max_memory is not None and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[0] > self.max_memory
+        return False
+
+    def enforce_budget(self):
+        """
+        Evict the least recently used hidden frames until the cache is under budget.
+        """
+        while self.is_over_budget():
+            candidates = [name for name in self.frames if name != self.visible]
+            if not candidates:
+                break
+            print(f"Evicting frame {candidates[0]} to stay under the frame budget")
+            self.invalidate(candidates[0])
+
+    def add_known_widget(self, widget):
+        """
+        Declare a top-level widget that is not a plugin frame, such as the navigation frame.
+
+        :param widget: The widget owned by the application.
+        """
+        self.known_widgets = [known for known in self.known_widgets if known.winfo_exists()]
+        self.known_widgets.append(widget)
+
+    def untracked_frames(self):
+        """
+        List the direct children of the root window that are neither tracked nor known.
+        Plugin screens that show up here have been built outside of the manager and leak.
+
+        :return: A list of widget paths.
+        """
+        tracked = set(str(frame) for frame in self.frames.values())
+        tracked.update(str(widget) for widget in self.known_widgets)
+        return [str(child) for child in self.root.winfo_children() if str(child) not in tracked and child.winfo_class() == "Frame"]
+
+    def report(self):
+        """
+        Build a report of the per-plugin widget and memory growth.
+
+        :return: The report as a string.
+        """
+        lines = [f"Frame report after {self.navigations} navigations:"]
+        for name, frame in self.frames.items():
+            widgets = count_widgets(frame)
+            growth = widgets - self.baseline.get(name, widgets)
+            lines.append(f"  {name}: {widgets} widgets ({growth:+d} since first build)")
+        lines.append(f"  Total Tk widgets in window: {count_widgets(self.root)}")
+        untracked = self.untracked_frames()
+        if untracked:
+            lines.append(f"  Untracked top-level frames (possible leaks): {len(untracked)}")
+        if tracemalloc.is_tracing() and self.snapshot is not None:
+            snapshot = tracemalloc.take_snapshot()
+            growth_by_plugin = {}
+            for stat in snapshot.compare_to(self.snapshot, "filename"):
+                plugin_name = self.plugin_of_file(stat.traceback[0].filename)
+                growth_by_plugin[plugin_name] = growth_by_plugin.get(plugin_name, 0) + stat.size_diff
+            for plugin_name, size_diff in sorted(growth_by_plugin.items(), key=lambda item: -item[1]):
+                lines.append(f"  Memory {plugin_name}: {size_diff / 1024:+.1f} KiB")
+            self.snapshot = snapshot
+        return "\n".join(lines)
+
+    @staticmethod
+    def plugin_of_file(filename):
+        """
+        Attribute a source file to a plugin for the memory report.
+
+        :param filename: The path of the source file.
+        :return: The plugin directory name, or "other".
+        """
+        parts = os.path.normpath(filename).split(os.sep)
+        if "plugins" in parts:
+            index = len(parts) - 1 - parts[::-1].index("plugins")
+            if index + 2 < len(parts):
+                return parts[index + 1]
+        return "other"
@@ -1,5 +1,7 @@
 import customtkinter
 import math
+import os
+import platform
 
 def create_option(row, column, container_frame, plugin):
     """
@@ -35,7 +37,7 @@ def create_option(row, column, container_frame, plugin):
     title_label.grid(row=1, column=0, padx=0, pady=5)
 
     # Status label
-    status_label = customtkinter.CTkLabel(icon_title_frame, text=f'Status: {plugin.get_status()}', font=customtkinter.CTkFont(size=12, weight="normal"))
+    status_label = customtkinter.CTkLabel(icon_title_frame, text=get_status_text(plugin), font=customtkinter.CTkFont(size=12, weight="normal"))
     status_label.grid(row=2, column=0, padx=0, pady=5)
 
     # Status icon
@@ -43,10 +45,30 @@ def create_option(row, column, container_frame, plugin):
     icon_status_label = customtkinter.CTkLabel(icon_title_frame, image=icon_status_image, text="")
     icon_status_label.grid(row=3, column=0, padx=(10, 10), pady=(5, 5))
 
-    # Make the entire frame clickable to open the URL
-    frame.bind("<Button-1>", lambda event: plugin.create_main_screen().grid(row=0, column=1, sticky="nsew"))
-    main_icon_label.bind("<Button-1>", lambda event: plugin.create_main_screen().grid(row=0, column=1, sticky="nsew"))
-    title_label.bind("<Button-1>", lambda event: plugin.create_main_screen().grid(row=0, column=1, sticky="nsew"))
+    # Update the status in place when the plugin publishes a new one
+    def update_status(plugin):
+        status_label.configure(text=get_status_text(plugin))
+        icon_status_label.configure(image=plugin.get_icon_alert())
+    plugin.add_status_listener(update_status)
+
+    # Make the entire frame clickable to open the plugin screen
+    def open_plugin(event):
+        frame.winfo_toplevel().select_frame_by_name(f'frame_{plugin.get_name()}')
+    frame.bind("<Button-1>", open_plugin)
+    main_icon_label.bind("<Button-1>", open_plugin)
+    title_label.bind("<Button-1>", open_plugin)
+
+def get_status_text(plugin):
+    """
+    Get the status text displayed on the tile of a plugin.
+    A last known status restored from the status snapshot is marked until it is confirmed.
+    
+    :param plugin: The plugin object.
+    :return: The status text.
+    """
+    if plugin.is_stale():
+        return f'Status: {plugin.get_status()} (last known)'
+    return f'Status: {plugin.get_status()}'
 
 def create_tab_button(frame, name, icon, command=None, row=0, col=0):
     """
@@ -103,4 +125,19 @@ def calculate_rows_cols(num_plugins):
     """
     cols = math.ceil(math.sqrt(num_plugins))
     rows = math.ceil(num_plugins / cols)
-    return tuple(range(rows)), tuple(range(cols))
\ No newline at end of file
+    return tuple(range(rows)), tuple(range(cols))
+
+def get_app_data_dir():
+    """
+    Get the writable directory where the application stores its data, creating it if needed.
+    
+    :return: The path to the application data directory.
+    """
+    if platform.system() == "Darwin":
+        data_dir = os.path.join(os.path.expanduser("~"), "Library", "Application Support", "Resistine AI")
+    elif platform.system() == "Windows":
+        data_dir = os.path.join(os.environ.get('APPDATA', os.path.expanduser("~")), "Resistine AI")
+    else:
+        data_dir = os.path.join(os.path.expanduser("~"), ".config", "resistine-ai")
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
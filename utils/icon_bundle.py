@@ -0,0 +1,202 @@
+"""
+This script is used to pack the icons of the application into a single bundle file and to
+load them back without PNG decoding. The bundle stores pre-decoded RGBA pixels and is
+memory-mapped at runtime, so an icon is created from a slice of the mapping.
+
+Bundle layout:
+    8 bytes   magic "RSTICON1"
+    4 bytes   little-endian length of the JSON index
+    N bytes   JSON index {"relative/path.png": [offset, width, height]}
+    padding   up to a multiple of 16 bytes
+    data      RGBA pixels, offsets are relative to the start of the data
+
+Run this script to build resources/icons/icons.bundle before packaging the application.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+
+MAGIC = b"RSTICON1"
+BUNDLE_FILENAME = "icons.bundle"
+ICON_DIRECTORIES = ("plugins", os.path.join("resources", "icons"))
+
+
+def get_root_path():
+    """
+    Get the root directory of the application, inside the PyInstaller bundle when frozen.
+
+    :return: The path to the application root directory.
+    """
+    if getattr(sys, 'frozen', False):
+        return sys._MEIPASS
+    return os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def get_bundle_path():
+    """
+    Get the path of the icon bundle file.
+
+    :return: The path to the bundle file.
+    """
+    return os.path.join(get_root_path(), "resources", "icons", BUNDLE_FILENAME)
+
+
+def find_icons(root_path):
+    """
+    Find the PNG icons shipped with the application.
+
+    :param root_path: The application root directory.
+    :return: A sorted list of paths relative to the root directory.
+    """
+    icons = []
+    for directory in ICON_DIRECTORIES:
+        for current_dir, _, files in os.walk(os.path.join(root_path, directory)):
+            for filename in files:
+                if filename.lower().endswith(".png"):
+                    icons.append(os.path.relpath(os.path.join(current_dir, filename), root_path).replace(os.sep, "/"))
+    return sorted(icons)
+
+
+def build_bundle(root_path=None, bundle_path=None):
+    """
+    Decode every icon and write the bundle file.
+
+    :param root_path: The application root directory.
+    :param bundle_path: The path of the bundle file to write.
+    :return: The number of icons packed.
+    """
+    from PIL import Image
+
+    root_path = root_path or get_root_path()
+    bundle_path = bundle_path or get_bundle_path()
+    index = {}
+    chunks = []
+    offset = 0
+    for relative_path in find_icons(root_path):
+        with Image.open(os.path.join(root_path, relative_path)) as image:
+            rgba = image.convert("RGBA")
+        pixels = rgba.tobytes()
+        index[relative_path] = [offset, rgba.width, rgba.height]
+        chunks.append(pixels)
+        offset += len(pixels)
+
+    index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    header = MAGIC + struct.pack("<I", len(index_bytes)) + index_bytes
+    header += b"\0" * (-len(header) % 16)
+    with open(bundle_path, "wb") as bundle_file:
+        bundle_file.write(header)
+        for chunk in chunks:
+            bundle_file.write(chunk)
+    return len(index)
+
+
+class IconBundle:
+    """
+    Read-only view of a memory-mapped icon bundle.
+    """
+
+    def __init__(self, bundle_path, root_path):
+        """
+        Open and map the bundle file.
+
+        :param bundle_path: The path to the bundle file.
+        :param root_path: The directory that the paths of the index are relative to.
+        :raises ValueError: If the file is not an icon bundle.
+        """
+        self.root_path = os.path.realpath(root_path)
+        self.mtime = os.path.getmtime(bundle_path)
+        self.check_sources = not getattr(sys, 'frozen', False)
+        with open(bundle_path, "rb") as bundle_file:
+            self.mapping = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mapping[:len(MAGIC)] != MAGIC:
+            self.mapping.close()
+            raise ValueError(f"Not an icon bundle: {bundle_path}")
+        index_length = struct.unpack_from("<I", self.mapping, len(MAGIC))[0]
+        index_start = len(MAGIC) + 4
+        self.index = json.loads(self.mapping[index_start:index_start + index_length].decode("utf-8"))
+        self.data_start = index_start + index_length + (-(index_start + index_length) % 16)
+
+    def relative_path(self, path):
+        """
+        Get the index key of an icon path.
+
+        :param path: The path to the icon file.
+        :return: The path relative to the root directory, or None if it is outside of it.
+        """
+        try:
+            relative_path = os.path.relpath(os.path.realpath(path), self.root_path)
+        except ValueError:
+            # Different drive on Windows
+            return None
+        if relative_path.startswith(".."):
+            return None
+        return relative_path.replace(os.sep, "/")
+
+    def load(self, path):
+        """
+        Create an RGBA image backed by the bundle mapping.
+
+        :param path: The path to the icon file.
+        :return: A read-only PIL image, or None if the icon is not in the bundle.
+        """
+        from PIL import Image
+
+        entry = self.index.get(self.relative_path(path))
+        if entry is None:
+            return None
+        if self.check_sources and os.path.getmtime(path) > self.mtime:
+            # The icon changed since the bundle was built, use the file
+            return None
+        offset, width, height = entry
+        start = self.data_start + offset
+        pixels = memoryview(self.mapping)[start:start + width * height * 4]
+        return Image.frombuffer("RGBA", (width, height), pixels, "raw", "RGBA", 0, 1)
+
+
+_bundle = None
+_bundle_lock = threading.Lock()
+_bundle_checked = False
+
+
+def get_bundle():
+    """
+    Get the icon bundle of the application, mapped on first use.
+
+    :return: The IconBundle, or None if no bundle has been built.
+    """
+    global _bundle, _bundle_checked
+    with _bundle_lock:
+        if not _bundle_checked:
+            _bundle_checked = True
+            bundle_path = get_bundle_path()
+            if os.path.isfile(bundle_path):
+                try:
+                    _bundle = IconBundle(bundle_path, get_root_path())
+                except (OSError, ValueError) as e:
+                    print(f"Ignoring icon bundle {bundle_path}: {e}")
+        return _bundle
+
+
+def load_icon(path):
+    """
+    Load an icon from the bundle, for icons shipped with the application.
+    Third-party plugins are not in the bundle and are loaded from their files by the caller.
+
+    :param path: The path to the icon file.
+    :return: A PIL image, or None if the icon is not in the bundle.
+    """
+    bundle = get_bundle()
+    if bundle is None:
+        return None
+    return bundle.load(path)
+
+
+if __name__ == "__main__":
+    count = build_bundle()
+    print(f"Packed {count} icons into {get_bundle_path()}")
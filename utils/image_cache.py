@@ -0,0 +1,166 @@
+"""
+This script is used to share decoded images and CTkImage objects across the application.
+Each asset is decoded once, pre-scaled to the sizes used by the navigation bar, the dashboard
+tiles and the status icons, and kept in a process-wide LRU cache keyed by (path, size, mode).
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import threading
+from collections import OrderedDict
+from PIL import Image
+import customtkinter
+from utils import icon_bundle
+
+# Sizes used across the application
+NAV_ICON_SIZE = (20, 20)
+TILE_ICON_SIZE = (30, 30)
+STATUS_ICON_SIZE = (16, 16)
+PRESCALED_SIZES = (NAV_ICON_SIZE, TILE_ICON_SIZE, STATUS_ICON_SIZE)
+
+# Variants are scaled at twice their logical size so that they stay sharp on HiDPI screens,
+# CTkImage only has to downscale them to the window scaling.
+PRESCALE_FACTOR = 2
+
+
+class ImageCache:
+    """
+    LRU cache of decoded PIL images and shared CTkImage objects.
+    """
+
+    def __init__(self, max_entries=256):
+        """
+        Initialize the ImageCache.
+
+        :param max_entries: Maximum number of entries kept in each cache level.
+        """
+        self.max_entries = max_entries
+        self.images = OrderedDict()
+        self.ctk_images = OrderedDict()
+        self.decode_count = 0
+        self.lock = threading.RLock()
+
+    def _remember(self, cache, key, value):
+        """
+        Store a value in a cache level and evict the least recently used entries.
+
+        :param cache: The OrderedDict of the cache level.
+        :param key: The key of the entry.
+        :param value: The value of the entry.
+        """
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def decode(self, path, mode="RGBA"):
+        """
+        Decode an image and store it with its pre-scaled variants.
+        Icons shipped with the application come from the memory-mapped icon bundle when it
+        has been built, other images are decoded from their files.
+
+        :param path: The path to the image file.
+        :param mode: The PIL mode of the decoded image.
+        :return: The decoded image at its original size.
+        """
+        source = icon_bundle.load_icon(path)
+        if source is None:
+            with Image.open(path) as image:
+                source = image.convert(mode)
+        elif source.mode != mode:
+            source = source.convert(mode)
+        self.decode_count += 1
+        self._remember(self.images, (path, None, mode), source)
+        for size in PRESCALED_SIZES:
+            scaled_size = (size[0] * PRESCALE_FACTOR, size[1] * PRESCALE_FACTOR)
+            self._remember(self.images, (path, size, mode), source.resize(scaled_size, Image.Resampling.LANCZOS))
+        return source
+
+    def get_image(self, path, size=None, mode="RGBA"):
+        """
+        Get a decoded image, resized if a size is given.
+
+        :param path: The path to the image file.
+        :param size: The logical size of the image, or None for the original size.
+        :param mode: The PIL mode of the image.
+        :return: The PIL image, shared between callers and not to be modified.
+        """
+        with self.lock:
+            key = (path, size, mode)
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+                return image
+            source = self.images.get((path, None, mode))
+            if source is None:
+                source = self.decode(path, mode)
+                image = self.images.get(key)
+                if image is not None:
+                    return image
+            if size is None:
+                return source
+            scaled_size = (size[0] * PRESCALE_FACTOR, size[1] * PRESCALE_FACTOR)
+            image = source.resize(scaled_size, Image.Resampling.LANCZOS)
+            self._remember(self.images, key, image)
+            return image
+
+    def get_ctk_image(self, light_path, dark_path=None, size=NAV_ICON_SIZE, mode="RGBA"):
+        """
+        Get a shared CTkImage for a light and a dark image.
+
+        :param light_path: The path to the image displayed in light mode.
+        :param dark_path: The path to the image displayed in dark mode, defaults to light_path.
+        :param size: The logical size of the CTkImage.
+        :param mode: The PIL mode of the images.
+        :return: The CTkImage, shared between callers.
+        """
+        dark_path = dark_path or light_path
+        with self.lock:
+            key = (light_path, dark_path, size, mode)
+            ctk_image = self.ctk_images.get(key)
+            if ctk_image is not None:
+                self.ctk_images.move_to_end(key)
+                return ctk_image
+            ctk_image = customtkinter.CTkImage(
+                light_image=self.get_image(light_path, size, mode),
+                dark_image=self.get_image(dark_path, size, mode),
+                size=size
+            )
+            self._remember(self.ctk_images, key, ctk_image)
+            return ctk_image
+
+    def clear(self):
+        """
+        Remove every cached image.
+        """
+        with self.lock:
+            self.images.clear()
+            self.ctk_images.clear()
+
+
+_cache = ImageCache()
+
+
+def get_image(path, size=None, mode="RGBA"):
+    """
+    Get a decoded image from the process-wide cache.
+
+    :param path: The path to the image file.
+    :param size: The logical size of the image, or None for the original size.
+    :param mode: The PIL mode of the image.
+    :return: The PIL image.
+    """
+    return _cache.get_image(path, size, mode)
+
+
+def get_ctk_image(light_path, dark_path=None, size=NAV_ICON_SIZE, mode="RGBA"):
+    """
+    Get a shared CTkImage from the process-wide cache.
+
+    :param light_path: The path to the image displayed in light mode.
+    :param dark_path: The path to the image displayed in dark mode, defaults to light_path.
+    :param size: The logical size of the CTkImage.
+    :param mode: The PIL mode of the images.
+    :return: The CTkImage.
+    """
+    return _cache.get_ctk_image(light_path, dark_path, size, mode)
@@ -0,0 +1,49 @@
+"""
+This script is used to identify the platform the application runs on.
+It only depends on the standard library so that it can be used before any plugin is imported.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import os
+import platform
+
+# Names used by the supported_systems field of the plugin manifests
+SUPPORTED_SYSTEM_NAMES = {
+    "linux": "Linux",
+    "wsl": "Linux",
+    "windows": "Windows",
+    "mac": "Mac",
+}
+
+
+# Identify the system
+def identify_system():
+    """
+    Identify the operating system and return a string representing the system type.
+    The result is recorded by utils/capabilities.py, read it from there instead of calling this again.
+    
+    :return: A string representing the system type ('linux', 'windows', 'mac', 'wsl', or 'unknown').
+    """
+    system_platform = platform.system().lower()
+
+    if system_platform == "linux":
+        # Windows Subsystem for Linux, WSL_DISTRO_NAME is also set when a custom kernel is used
+        if "microsoft" in platform.uname().release.lower() or "WSL_DISTRO_NAME" in os.environ or os.path.exists("/proc/sys/fs/binfmt_misc/WSLInterop"):
+            return "wsl"
+        return "linux"
+    elif system_platform == "windows":
+        return "windows"
+    elif system_platform == "darwin":
+        return "mac"
+    else:
+        return "unknown"
+
+
+def get_supported_system_name():
+    """
+    Get the name of the current system as used in the plugin manifests.
+    
+    :return: "Windows", "Linux", "Mac", or None if the system is unknown.
+    """
+    return SUPPORTED_SYSTEM_NAMES.get(identify_system())
@@ -0,0 +1,92 @@
+"""
+This script is used to record the start-up timeline of the application.
+For each plugin it keeps the time spent importing the module, running the constructor and
+building the first screen, so slow plugins can be spotted in the log or in the Settings screen.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import os
+import threading
+import time
+
+PHASES = ("import", "init", "first_render")
+
+
+class StartupTimeline:
+    """
+    Thread-safe record of the per-plugin start-up phases.
+    """
+
+    def __init__(self):
+        """
+        Initialize the StartupTimeline, the application start is the current time.
+        """
+        self.start_time = time.perf_counter()
+        self.entries = {}
+        self.events = []
+        self.lock = threading.Lock()
+
+    def record(self, name, phase, milliseconds):
+        """
+        Record the duration of a start-up phase of a plugin.
+
+        :param name: The name of the plugin.
+        :param phase: The phase, one of "import", "init" or "first_render".
+        :param milliseconds: The duration of the phase in milliseconds.
+        """
+        with self.lock:
+            self.entries.setdefault(name, {})[phase] = milliseconds
+
+    def has(self, name, phase):
+        """
+        Check if a phase has already been recorded for a plugin.
+
+        :param name: The name of the plugin.
+        :param phase: The phase.
+        :return: True if the phase has been recorded, False otherwise.
+        """
+        with self.lock:
+            return phase in self.entries.get(name, {})
+
+    def event(self, name, message):
+        """
+        Record an event, such as a plugin that missed its start-up deadline.
+
+        :param name: The name of the plugin.
+        :param message: The description of the event.
+        """
+        elapsed = (time.perf_counter() - self.start_time) * 1000
+        with self.lock:
+            self.events.append((elapsed, name, message))
+
+    def format(self):
+        """
+        Format the timeline as a table.
+
+        :return: The timeline as a string.
+        """
+        with self.lock:
+            lines = [f"{'Plugin':<16}{'import ms':>12}{'init ms':>12}{'first render ms':>18}"]
+            for name, phases in sorted(self.entries.items()):
+                values = [f"{phases[phase]:.1f}" if phase in phases else "-" for phase in PHASES]
+                lines.append(f"{name:<16}{values[0]:>12}{values[1]:>12}{values[2]:>18}")
+            for elapsed, name, message in self.events:
+                lines.append(f"[{elapsed:9.1f} ms] {name}: {message}")
+        return "\n".join(lines)
+
+    def write(self, path):
+        """
+        Write the timeline to a log file.
+
+        :param path: The path of the log file.
+        """
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as log_file:
+                log_file.write(self.format() + "\n")
+        except OSError as e:
+            print(f"Error writing start-up timeline to {path}: {e}")
+
+
+timeline = StartupTimeline()
@@ -0,0 +1,142 @@
+"""
+This script is used to keep the last known status of the plugins on disk.
+The snapshot is written when a status changes and when the application closes, and is read
+at start-up so the dashboard can be drawn right away with the previous statuses, marked as
+stale until the background probes publish fresh ones.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import json
+import os
+import time
+
+SNAPSHOT_VERSION = 1
+
+
+class StatusSnapshot:
+    """
+    Last known statuses of the plugins and values such as the VPN state, saved as JSON.
+    """
+
+    def __init__(self, path, max_age=7 * 24 * 3600, save_delay=1000):
+        """
+        Initialize the StatusSnapshot.
+
+        :param path: The path of the snapshot file.
+        :param max_age: Maximum age in seconds of a snapshot restored at start-up.
+        :param save_delay: Delay in milliseconds used to group several changes into one write.
+        """
+        self.path = path
+        self.max_age = max_age
+        self.save_delay = save_delay
+        self.statuses = {}
+        self.values = {}
+        self.saved_at = None
+        self.root = None
+        self.save_scheduled = False
+
+    def load(self):
+        """
+        Read the snapshot file. A missing, unreadable or outdated snapshot is ignored.
+
+        :return: True if a snapshot was restored, False otherwise.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as snapshot_file:
+                data = json.load(snapshot_file)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"Ignoring status snapshot {self.path}: {e}")
+            return False
+        if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+            return False
+        saved_at = data.get("saved_at", 0)
+        if time.time() - saved_at > self.max_age:
+            return False
+        self.statuses = dict(data.get("plugins", {}))
+        self.values = dict(data.get("values", {}))
+        self.saved_at = saved_at
+        return True
+
+    def attach(self, root):
+        """
+        Use the Tk event loop of a window to delay the writes of the snapshot.
+
+        :param root: The Tk window.
+        """
+        self.root = root
+
+    def get_status(self, name):
+        """
+        Get the last known status of a plugin.
+
+        :param name: The name of the plugin.
+        :return: The status, or None if the plugin is not in the snapshot.
+        """
+        return self.statuses.get(name)
+
+    def set_status(self, name, status):
+        """
+        Remember the status of a plugin and schedule a write if it changed.
+
+        :param name: The name of the plugin.
+        :param status: The new status of the plugin.
+        """
+        if self.statuses.get(name) != status:
+            self.statuses[name] = status
+            self.schedule_save()
+
+    def get_value(self, key, default=None):
+        """
+        Get a value saved in the snapshot, such as the VPN state.
+
+        :param key: The key of the value.
+        :param default: The value returned when the key is not in the snapshot.
+        :return: The saved value.
+        """
+        return self.values.get(key, default)
+
+    def set_value(self, key, value):
+        """
+        Remember a JSON serializable value and schedule a write if it changed.
+
+        :param key: The key of the value.
+        :param value: The value.
+        """
+        if self.values.get(key) != value:
+            self.values[key] = value
+            self.schedule_save()
+
+    def schedule_save(self):
+        """
+        Write the snapshot after the save delay, or right away if no window is attached.
+        """
+        if self.root is None:
+            self.save()
+        elif not self.save_scheduled:
+            self.save_scheduled = True
+            self.root.after(self.save_delay, self.save)
+
+    def save(self):
+        """
+        Write the snapshot file. The file is replaced atomically so that a crash while
+        writing never leaves a truncated snapshot behind.
+        """
+        self.save_scheduled = False
+        self.saved_at = time.time()
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": self.saved_at,
+            "plugins": self.statuses,
+            "values": self.values,
+        }
+        temp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as snapshot_file:
+                json.dump(data, snapshot_file, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Error writing status snapshot to {self.path}: {e}")
@@ -0,0 +1,55 @@
+"""
+This script is used to hand results from background threads back to the Tk main loop.
+Tkinter widgets must only be touched from the thread that runs mainloop, so worker threads
+post callbacks to a queue that is pumped with after() on the Tk thread.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import queue
+
+
+class TkDispatcher:
+    """
+    Queue of callbacks posted from any thread and executed on the Tk thread.
+    """
+
+    def __init__(self, root, interval=50):
+        """
+        Initialize the dispatcher and start pumping the queue.
+
+        :param root: The Tk root window that owns the main loop.
+        :param interval: Time in milliseconds between two pumps of the queue.
+        """
+        self.root = root
+        self.interval = interval
+        self.queue = queue.Queue()
+        self.root.after(self.interval, self.pump)
+
+    def post(self, callback, *args):
+        """
+        Schedule a callback to run on the Tk thread. Safe to call from any thread.
+
+        :param callback: The function to call.
+        :param args: The arguments passed to the function.
+        """
+        self.queue.put((callback, args))
+
+    def pump(self):
+        """
+        Run every pending callback and schedule the next pump.
+        """
+        while True:
+            try:
+                callback, args = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error running dispatched callback {callback}: {e}")
+        try:
+            self.root.after(self.interval, self.pump)
+        except Exception:
+            # The window has been destroyed, stop pumping.
+            pass
@@ -0,0 +1,146 @@
+"""
+This script is used to run long operations, such as bringing a VPN tunnel up, on worker threads.
+Progress reports and the final result are handed back to the Tk thread through the TkDispatcher
+queue, and a task can be cancelled while it runs: the worker checks the cancellation between
+its steps and undoes what it has already done.
+Copyright (c) Resistine 2025
+Licensed under the Apache License 2.0
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskCancelled(Exception):
+    """
+    Raised by Task.check_cancelled in the worker when the task has been cancelled.
+    """
+
+
+class Task:
+    """
+    Handle of an operation submitted to a TkExecutor, shared by the worker and the Tk thread.
+    """
+
+    def __init__(self, dispatcher, name, on_progress=None, on_finished=None):
+        """
+        Initialize the Task.
+
+        :param dispatcher: The TkDispatcher used to run the callbacks on the Tk thread.
+        :param name: The name of the task, used in the log messages.
+        :param on_progress: The function called as on_progress(task, state) on the Tk thread.
+        :param on_finished: The function called as on_finished(task) on the Tk thread.
+        """
+        self.dispatcher = dispatcher
+        self.name = name
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.state = None
+        self.result = None
+        self.error = None
+        self.done = False
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """
+        Ask the worker to stop. Safe to call from any thread.
+        """
+        self.cancel_event.set()
+
+    def is_cancelled(self):
+        """
+        :return: True if the task has been cancelled, False otherwise.
+        """
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """
+        Stop the worker if the task has been cancelled. Called by the worker between two steps.
+
+        :raises TaskCancelled: If the task has been cancelled.
+        """
+        if self.cancel_event.is_set():
+            raise TaskCancelled(self.name)
+
+    def wait(self, seconds):
+        """
+        Sleep in the worker, waking up early if the task is cancelled.
+
+        :param seconds: The time to sleep in seconds.
+        :raises TaskCancelled: If the task has been cancelled.
+        """
+        self.cancel_event.wait(seconds)
+        self.check_cancelled()
+
+    def report(self, state):
+        """
+        Report the progress of the task from the worker.
+
+        :param state: A short description of the current step, e.g. "Bringing up".
+        """
+        self.state = state
+        if self.on_progress is not None:
+            self.dispatcher.post(self.on_progress, self, state)
+
+    def run(self, function, args):
+        """
+        Run the operation in the worker and post the completion to the Tk thread.
+
+        :param function: The function called as function(task, *args).
+        :param args: The arguments of the function.
+        """
+        try:
+            self.result = function(self, *args)
+        except TaskCancelled:
+            self.cancel_event.set()
+        except Exception as e:
+            print(f"Error running task {self.name}: {e}")
+            self.error = e
+        self.dispatcher.post(self.finish)
+
+    def finish(self):
+        """
+        Mark the task as done and call the completion callback, on the Tk thread.
+        """
+        self.done = True
+        if self.on_finished is not None:
+            self.on_finished(self)
+
+
+class TkExecutor:
+    """
+    Thread pool whose tasks report their progress and results on the Tk thread.
+    """
+
+    def __init__(self, dispatcher, max_workers=2):
+        """
+        Initialize the TkExecutor.
+
+        :param dispatcher: The TkDispatcher of the application.
+        :param max_workers: The maximum number of operations running at the same time.
+        """
+        self.dispatcher = dispatcher
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tk-executor")
+
+    def submit(self, name, function, *args, on_progress=None, on_finished=None):
+        """
+        Run an operation on a worker thread.
+
+        :param name: The name of the task, used in the log messages.
+        :param function: The function called as function(task, *args) on the worker thread.
+            It reports its steps with task.report and calls task.check_cancelled between them.
+        :param args: The arguments of the function.
+        :param on_progress: The function called as on_progress(task, state) on the Tk thread.
+        :param on_finished: The function called as on_finished(task) on the Tk thread,
+            with task.result, task.error or task.is_cancelled() set.
+        :return: The Task.
+        """
+        task = Task(self.dispatcher, name, on_progress, on_finished)
+        self.pool.submit(task.run, function, args)
+        return task
+
+    def shutdown(self):
+        """
+        Cancel the queued operations and let the running ones finish in the background.
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)